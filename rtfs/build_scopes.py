@@ -1,6 +1,8 @@
 from typing import Dict, Optional, List
 from collections import defaultdict
 
+from tree_sitter import Tree
+
 from rtfs.scope_resolution import LocalScope, LocalDef, Reference, Scoping, LocalCall
 from rtfs.scope_resolution.imports import (
     LocalImportStmt,
@@ -26,9 +28,18 @@ from rtfs.config import PYTHON_SCM
 namespaces = ["class", "function", "parameter", "variable"]
 
 
-def build_scope_graph(src_bytes: bytearray, language: str = "python") -> ScopeGraph:
+def build_scope_graph(
+    src_bytes: bytearray, language: str = "python", tree: Optional[Tree] = None
+) -> ScopeGraph:
+    """
+    Builds the ScopeGraph for a file. Pass in an already parsed tree to avoid
+    parsing src_bytes again
+    """
     parser = LANG_PARSER[language]
-    query, root_node = parser._build_query(src_bytes, PYTHON_SCM)
+    if tree is None:
+        tree = parser.parse(src_bytes)
+    root_node = tree.root_node
+    query = parser.query(PYTHON_SCM)
 
     local_def_captures: List[LocalDefCapture] = []
     local_ref_captures: List[LocalRefCapture] = []
@@ -0,0 +1,89 @@
+import hashlib
+import importlib.metadata
+import logging
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from rtfs.config import LANG_MODULE
+
+logger = logging.getLogger(__name__)
+
+# bump when the layout of cached values changes
+CACHE_FORMAT = 1
+
+QUERY_FILES = [
+    *sorted(Path(str(LANG_MODULE)).glob("*.scm")),
+    *sorted((Path(__file__).parent / "moatless" / "parser" / "queries").glob("*.scm")),
+]
+
+
+def _rtfs_version() -> str:
+    try:
+        return importlib.metadata.version("rtfs")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class ParseCache:
+    """
+    Content addressed on-disk cache for per-file analysis results (scope graphs,
+    captured refs, chunks). Keys hash the file content together with the rtfs
+    version and the tree-sitter query files, so editing a file or upgrading rtfs
+    invalidates its entries. Values are pickled to cache_dir/<xx>/<key>.pkl
+    """
+
+    def __init__(self, cache_dir: Path, query_files: Iterable[Path] = QUERY_FILES):
+        self.cache_dir = Path(cache_dir)
+
+        salt = hashlib.sha256()
+        salt.update(f"{CACHE_FORMAT}:{_rtfs_version()}".encode())
+        for query_file in query_files:
+            salt.update(Path(query_file).read_bytes())
+        self._salt = salt.hexdigest()
+
+    def key(self, namespace: str, content: bytes, *extra: str) -> str:
+        """
+        Key for the namespace ("scopes", "refs", "chunks" ...) result over content.
+        extra is anything else the result depends on, ie. settings or file paths
+        """
+        h = hashlib.sha256()
+        for part in (self._salt, namespace, *extra):
+            h.update(part.encode())
+            h.update(b"\0")
+        h.update(content)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pkl"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except Exception as e:
+            # a corrupt or stale entry is just a miss
+            logger.debug(f"Dropping unreadable cache entry {path}: {e}")
+            return default
+
+    def put(self, key: str, value: Any):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write then rename so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
@@ -0,0 +1,182 @@
+from bisect import bisect_left
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from rtfs.cache import ParseCache
+from rtfs.ingest import ParsedFile
+from rtfs.repo_resolution.repo_graph import RepoGraph, RepoNodeID, repo_node_id
+from rtfs.repo_resolution.graph import ExportScope
+from rtfs.scope_resolution.capture_refs import capture_refs
+from rtfs.scope_resolution.reference import Reference
+from rtfs.scope_resolution.scope_graph import ScopeGraph
+from rtfs.utils import TextRange
+
+from .chunk_index import ChunkIndex
+from .graph import ChunkEdgeKind, ChunkEdgeRow, ChunkNode, ChunkNodeID
+
+
+class ChunkEdgeResolver:
+    """
+    Resolves the refs of a chunk to the chunks that export them. Only reads the
+    RepoGraph lookup tables and the chunk index, so it can be sent to worker
+    processes and the chunks of different files resolved independently
+    """
+
+    def __init__(
+        self,
+        scopes_map: Dict[Path, ScopeGraph],
+        export_lookup: Dict[Tuple[RepoNodeID, str], ExportScope],
+        chunk_index: ChunkIndex,
+        parsed_files: Dict[Path, ParsedFile],
+        sources: Optional[Dict[Path, bytes]] = None,
+        cache: Optional[ParseCache] = None,
+    ):
+        self.scopes_map = scopes_map
+        self.export_lookup = export_lookup
+        self.chunk_index = chunk_index
+        self.parsed_files = parsed_files
+        # contents of the files that are not parsed yet
+        self._sources: Dict[Path, bytes] = sources or {}
+        # with a cache, refs are captured (or loaded) once per file and sliced
+        # by chunk: (ref start bytes, refs)
+        self.cache = cache
+        self._file_refs: Dict[Path, Tuple[List[int], List[Reference]]] = {}
+
+    @classmethod
+    def from_repo_graph(
+        cls, repo_graph: RepoGraph, chunk_index: ChunkIndex
+    ) -> "ChunkEdgeResolver":
+        return cls(
+            repo_graph.scopes_map,
+            repo_graph._export_lookup,
+            chunk_index,
+            repo_graph.parsed_files,
+            repo_graph._sources,
+            repo_graph._cache,
+        )
+
+    def __getstate__(self):
+        # trees cannot be pickled, workers reparse the files they are given
+        state = self.__dict__.copy()
+        state["parsed_files"] = {}
+        state["_sources"] = {
+            **self._sources,
+            **{path: pf.src for path, pf in self.parsed_files.items()},
+        }
+        return state
+
+    def _parsed_file(self, path: Path) -> ParsedFile:
+        parsed_file = self.parsed_files.get(path)
+        if parsed_file is None:
+            parsed_file = ParsedFile.from_bytes(path, self._sources[path])
+            self.parsed_files[path] = parsed_file
+        return parsed_file
+
+    def _refs(self, path: Path, byte_range: Tuple[int, int]) -> List[Reference]:
+        """
+        Refs starting inside byte_range of the file
+        """
+        parsed_file = self._parsed_file(path)
+        if self.cache is None:
+            return capture_refs(
+                parsed_file.src, tree=parsed_file.tree, byte_range=byte_range
+            )
+
+        if path not in self._file_refs:
+            key = self.cache.key("refs", parsed_file.src)
+            refs = self.cache.get(key)
+            if refs is None:
+                refs = capture_refs(parsed_file.src, tree=parsed_file.tree)
+                self.cache.put(key, refs)
+            self._file_refs[path] = ([ref.range.start_byte for ref in refs], refs)
+
+        starts, refs = self._file_refs[path]
+        start, end = byte_range
+        return refs[bisect_left(starts, start) : bisect_left(starts, end)]
+
+    def edge_rows(self, chunk_node: ChunkNode) -> List[ChunkEdgeRow]:
+        """
+        Build the import to export mapping for a chunk
+        need to do: import (chunk -> range -> scope) -> export (scope -> range -> chunk)
+        """
+        src_path = Path(chunk_node.metadata.file_path)
+        scope_graph = self.scopes_map[src_path]
+        parsed_file = self._parsed_file(src_path)
+
+        # query the already parsed file restricted to the chunk's lines, so refs
+        # come back with file positions and the chunk text is never reparsed
+        start_line, end_line = chunk_node.range.line_range()
+        chunk_refs = self._refs(
+            src_path, parsed_file.line_range_to_bytes(start_line, end_line)
+        )
+
+        exports = []
+        for ref in chunk_refs:
+            # range -> scope
+            ref_scope = scope_graph.scope_by_range(ref.range)
+            # scope (import) -> scope (export)
+            export = self.export_lookup.get(
+                (repo_node_id(src_path, ref_scope), ref.name), []
+            )
+            # TODO: this would be alot better if we could search using
+            # existing ts queries cuz we can narrow to import refs
+            if not export:
+                continue
+
+            exports.append((ref, export))
+
+        # scope (export) -> range -> chunk, looked up in one batch per export file
+        export_ranges: Dict[Path, List[TextRange]] = defaultdict(list)
+        for _, export in exports:
+            export_path = Path(export.file_path)
+            export_sg = self.scopes_map[export_path]
+            export_ranges[export_path].append(export_sg.range_by_scope(export.scope))
+
+        dst_chunks = {
+            export_path: iter(self.chunk_index.find_chunks(export_path, ranges))
+            for export_path, ranges in export_ranges.items()
+        }
+
+        rows = []
+        for ref, export in exports:
+            dst_chunk = next(dst_chunks[Path(export.file_path)])
+            if dst_chunk:
+                if scope_graph.is_call_ref(ref.range):
+                    rows.append(
+                        (chunk_node.id, dst_chunk.id, ChunkEdgeKind.CallTo, ref.name)
+                    )
+
+                # differentiate between ImportToExport chunks and CallToExport chunks
+                # so in the future we can use this for file level edges
+                rows.append(
+                    (chunk_node.id, dst_chunk.id, ChunkEdgeKind.ImportFrom, ref.name)
+                )
+
+        return rows
+
+    def file_edge_rows(
+        self, path: Path
+    ) -> List[Tuple[ChunkNodeID, List[ChunkEdgeRow]]]:
+        """
+        Edge rows of every chunk of a file, in chunk order
+        """
+        return [
+            (chunk_node.id, self.edge_rows(chunk_node))
+            for chunk_node in self.chunk_index.chunks(path)
+        ]
+
+
+# per-process resolver used by the chunk edge pool
+_edge_resolver: Optional[ChunkEdgeResolver] = None
+
+
+def _init_edge_resolver(resolver: ChunkEdgeResolver):
+    global _edge_resolver
+    _edge_resolver = resolver
+
+
+def _file_edge_rows_worker(
+    path: Path,
+) -> List[Tuple[ChunkNodeID, List[ChunkEdgeRow]]]:
+    return _edge_resolver.file_edge_rows(path)
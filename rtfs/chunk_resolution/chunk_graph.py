@@ -1,19 +1,23 @@
 from networkx import MultiDiGraph, node_link_graph, node_link_data
 from pathlib import Path
 from llama_index.core.schema import BaseNode
-from typing import List, Tuple, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Tuple, Dict, Optional, Set
 import os
-from collections import deque
+from collections import Counter, deque
+from functools import cached_property
+from itertools import count
 import json
 import yaml
 
 from rtfs.utils import dfs_json
-from rtfs.scope_resolution.capture_refs import capture_refs
 from rtfs.scope_resolution.graph_types import ScopeID
 from rtfs.repo_resolution.repo_graph import RepoGraph, RepoNodeID, repo_node_id
 from rtfs.fs import RepoFs
+from rtfs.ingest import ParsedFile
+from rtfs.cache import ParseCache
 from rtfs.utils import TextRange
-from rtfs.graph import Node, CodeGraph
+from rtfs.graph import Node, Edge, CodeGraph
 
 from rtfs.models import OpenAIModel, BaseModel
 
@@ -21,14 +25,20 @@ from .graph import (
     ChunkMetadata,
     ClusterNode,
     ChunkNode,
-    ImportEdge,
-    CallEdge,
     ClusterEdgeKind,
     ChunkEdgeKind,
+    ChunkEdgeRow,
     ClusterEdge,
     NodeKind,
     ChunkNodeID,
 )
+from .chunk_index import ChunkIndex
+from .persist import chunk_content, read_graph, write_graph
+from .chunk_edges import (
+    ChunkEdgeResolver,
+    _init_edge_resolver,
+    _file_edge_rows_worker,
+)
 from .cluster import cluster_infomap
 
 import logging
@@ -46,75 +56,225 @@ class ChunkGraph(CodeGraph):
         g: MultiDiGraph,
         cluster_roots=[],
         cluster_depth=None,
+        parsed_files: Optional[Dict[Path, ParsedFile]] = None,
+        workers: int = 1,
+        cache: Optional[ParseCache] = None,
     ):
         super().__init__(node_types=[ChunkNode, ClusterNode])
 
-        self.fs = RepoFs(repo_path)
+        self.repo_path = repo_path
         self._graph = g
-        self._repo_graph = RepoGraph(repo_path)
+        # inputs for the lazily built RepoGraph
+        self._parsed_files = parsed_files
+        self._cache = cache
         self._file2scope = defaultdict(set)
         self._chunkmap: Dict[Path, List[ChunkNode]] = defaultdict(list)
-        self._lm: BaseModel = OpenAIModel()
+        self._chunk_index = ChunkIndex(self._chunkmap)
+        self._edge_resolver: Optional[ChunkEdgeResolver] = None
+        self._workers = workers
 
         self._cluster_roots = cluster_roots
         self._cluster_depth = cluster_depth
 
+        # node ids partitioned by kind (in graph order) and cluster lookup tables,
+        # kept up to date by add_node, add_edge and remove_node
+        self._node_order: Dict[str, int] = {}
+        self._order_counter = count()
+        self._chunk_ids: Dict[ChunkNodeID, None] = {}
+        self._cluster_ids: Dict[str, None] = {}
+        self._cluster_titles: Dict[str, str] = {}
+        self._title_to_clusters: Dict[str, Set[str]] = defaultdict(set)
+        self._root_clusters: Set[str] = set()
+        for node_id, node_data in self._graph.nodes(data=True):
+            self._index_node(node_id, node_data)
+
+    # the repo graph, fs and model are only built when a method needs them, so
+    # loading a saved graph does not reparse the repo
+    @cached_property
+    def _repo_graph(self) -> RepoGraph:
+        repo_graph = RepoGraph(
+            self.repo_path,
+            parsed_files=self._parsed_files,
+            workers=self._workers,
+            cache=self._cache,
+        )
+        self._parsed_files = None
+        return repo_graph
+
+    @cached_property
+    def fs(self) -> RepoFs:
+        return RepoFs(self.repo_path)
+
+    @cached_property
+    def _lm(self) -> BaseModel:
+        return OpenAIModel()
+
     # TODO: design decisions
     # turn import => export mapping into a function
     # implement tqdm for chunk by chunk processing
     @classmethod
-    def from_chunks(cls, repo_path: Path, chunks: List[BaseNode], skip_tests=True):
+    def from_chunks(
+        cls,
+        repo_path: Path,
+        chunks: List[BaseNode],
+        skip_tests=True,
+        parsed_files: Optional[Dict[Path, ParsedFile]] = None,
+        workers: int = 1,
+        cache: Optional[ParseCache] = None,
+    ):
         """
         Build chunk (import) to chunk (export) mapping by associating a chunk with
         the list of scopes, and then using the scope -> scope mapping provided in RepoGraph
         to resolve the exports
         """
         g = MultiDiGraph()
-        cg: ChunkGraph = cls(repo_path, g)
+        cg: ChunkGraph = cls(
+            repo_path, g, parsed_files=parsed_files, workers=workers, cache=cache
+        )
         cg._file2scope = defaultdict(set)
 
         # used to map range to chunks
-        chunk_names = set()
-        skipped_chunks = 0
+        cg._add_chunk_nodes(chunks, skip_tests=skip_tests)
+        cg._chunk_index = ChunkIndex(cg._chunkmap)
+
+        print(len(cg._graph.nodes))
 
-        for i, chunk in enumerate(chunks, start=1):
+        # main loop to build graph, the edges of all chunks are loaded in one go
+        cg.add_edge_rows(cg._build_edge_rows())
+
+        for f, scopes in cg._file2scope.items():
+            all_scopes = cg._repo_graph.scopes_map[f].scopes()
+            all_scopes = set(all_scopes)
+
+            unresolved = all_scopes - scopes
+
+        return cg
+
+    def _add_chunk_nodes(
+        self, chunks: List[BaseNode], skip_tests=True, start: int = 1
+    ) -> List[ChunkNode]:
+        """
+        Adds a node for each chunk, numbering their ids from start, and appends
+        them to the chunk map
+        """
+        chunk_nodes = []
+        for i, chunk in enumerate(chunks, start=start):
             metadata = ChunkMetadata(**chunk.metadata)
             if skip_tests and metadata.file_name.startswith("test_"):
-                skipped_chunks += 1
                 continue
 
-            short_name = cg._chunk_short_name(chunk, i)
-            chunk_names.add(short_name)
+            short_name = self._chunk_short_name(chunk, i)
+            # shouldnt really happen but ...
+            if short_name in self._graph:
+                raise ValueError("Collision has occurred in chunk names")
+
             chunk_node = ChunkNode(
                 id=short_name,
                 og_id=chunk.node_id,
                 metadata=metadata,
                 content=chunk.get_content(),
             )
-            cg.add_node(chunk_node)
-            cg._chunkmap[Path(metadata.file_path)].append(chunk_node)
+            self.add_node(chunk_node)
+            self._chunkmap[Path(metadata.file_path)].append(chunk_node)
+            chunk_nodes.append(chunk_node)
 
-        # shouldnt really happen but ...
-        if len(chunk_names) != len(chunks) - skipped_chunks:
-            raise ValueError("Collision has occurred in chunk names")
-
-        print(len(cg.get_all_nodes()))
-
-        # main loop to build graph
-        for chunk_node in cg.get_all_nodes():
-            # chunk -> range -> scope
-            cg.build_import_exports_chunks(chunk_node)
+        return chunk_nodes
 
-        for f, scopes in cg._file2scope.items():
-            all_scopes = cg._repo_graph.scopes_map[f].scopes()
-            all_scopes = set(all_scopes)
+    def update(
+        self,
+        changed: List[Path],
+        deleted: List[Path] = [],
+        chunks: Optional[List[BaseNode]] = None,
+    ) -> Set[Path]:
+        """
+        Incrementally updates the graph after the files in changed were modified
+        or created and the files in deleted were removed. The chunks of touched
+        files are replaced, and only the chunks of files whose imports were
+        re-resolved by RepoGraph.update get their edges rebuilt. chunks are the
+        new chunks of the changed files, which are chunked here if not given.
+
+        Replaced chunks lose their cluster membership, so cluster() should be
+        re-run for the clusters to cover them. Returns the re-resolved files
+        """
+        from rtfs.chunker import chunk_files
+
+        repo_graph = self._repo_graph
+        resolved = repo_graph.update(changed, deleted)
+
+        touched = {
+            path
+            for path in map(repo_graph._normalize_path, [*changed, *deleted])
+            if path
+        }
+        chunk_paths = {Path(path).resolve(): path for path in self._chunkmap}
+
+        # drop the chunks of touched files and the outgoing chunk edges of the
+        # files that are re-resolved
+        for path in touched:
+            chunk_path = chunk_paths.get(path)
+            if chunk_path is None:
+                continue
 
-            unresolved = all_scopes - scopes
+            for chunk_node in self._chunkmap.pop(chunk_path):
+                self.remove_node(chunk_node.id)
+            self._chunk_index.set_chunks(chunk_path, [])
+
+        stale_edges = []
+        for path in resolved - touched:
+            for chunk_node in self._chunkmap.get(chunk_paths.get(path), []):
+                stale_edges.extend(
+                    (u, v, key)
+                    for u, v, key, kind in self._graph.out_edges(
+                        chunk_node.id, keys=True, data="kind"
+                    )
+                    if kind in (ChunkEdgeKind.ImportFrom, ChunkEdgeKind.CallTo)
+                )
+        self._graph.remove_edges_from(stale_edges)
+
+        if chunks is None:
+            chunks = chunk_files(
+                str(self.repo_path),
+                sorted(path for path in touched if path in repo_graph.scopes_map),
+                parsed_files=repo_graph.parsed_files,
+                cache=self._cache,
+            )
 
-        return cg
+        # continue numbering after the existing chunks so ids stay unique
+        start = 1 + max(
+            (
+                int(chunk_id.rsplit("#", 1)[1].split(".")[0])
+                for chunk_id in self._chunk_ids
+            ),
+            default=0,
+        )
+        new_paths = set()
+        for chunk_node in self._add_chunk_nodes(chunks, start=start):
+            new_paths.add(Path(chunk_node.metadata.file_path))
+        for chunk_path in new_paths:
+            self._chunk_index.set_chunks(chunk_path, self._chunkmap[chunk_path])
+
+        # the resolver holds refs captured from the old file contents
+        self._edge_resolver = None
+        self.__dict__.pop("fs", None)
+
+        resolver = self._resolver()
+        chunk_paths = {Path(path).resolve(): path for path in self._chunkmap}
+        rows = []
+        for path in resolved:
+            for chunk_node in self._chunkmap.get(chunk_paths.get(path), []):
+                rows.extend(resolver.edge_rows(chunk_node))
+        self.add_edge_rows(rows)
+
+        return resolved
 
     @classmethod
-    def from_json(cls, repo_path: Path, json_data: Dict):
+    def from_json(
+        cls, repo_path: Path, json_data: Dict, repo_graph_path: Optional[Path] = None
+    ):
+        """
+        Load a graph saved with to_json. If the RepoGraph was saved alongside it,
+        it is loaded from repo_graph_path instead of being rebuilt on first use
+        """
         cg = node_link_graph(json_data["link_data"])
 
         for node_id, node_data in cg.nodes(data=True):
@@ -123,16 +283,78 @@ class ChunkGraph(CodeGraph):
                 # not sure why this is converted to string ...
                 node_data["metadata"] = ChunkMetadata(**node_data["metadata"])
 
-        return cls(
+        return cls._from_saved_graph(
             repo_path,
             cg,
-            cluster_roots=json_data["cluster_roots"],
-            cluster_depth=json_data["cluster_depth"],
+            json_data["cluster_roots"],
+            json_data["cluster_depth"],
+            repo_graph_path,
         )
 
-    def to_json(self, file_path: Path):
+    @classmethod
+    def load(
+        cls, repo_path: Path, graph_dir: Path, repo_graph_path: Optional[Path] = None
+    ):
         """
-        Special custom node_link_data class to handle ChunkMetadata
+        Load a graph saved with save. Chunk contents are not read here: each chunk
+        keeps a reference into its source file (or the saved content blob), which
+        is read through mmap and checked against the saved hash on get_content
+        """
+        cg, meta = read_graph(Path(graph_dir), Path(repo_path))
+        return cls._from_saved_graph(
+            repo_path,
+            cg,
+            meta["cluster_roots"],
+            meta["cluster_depth"],
+            repo_graph_path,
+        )
+
+    @classmethod
+    def _from_saved_graph(
+        cls,
+        repo_path: Path,
+        g: MultiDiGraph,
+        cluster_roots,
+        cluster_depth,
+        repo_graph_path: Optional[Path] = None,
+    ):
+        chunk_graph = cls(
+            repo_path,
+            g,
+            cluster_roots=cluster_roots,
+            cluster_depth=cluster_depth,
+        )
+        for chunk_node in chunk_graph.iter_nodes(kind=NodeKind.Chunk, view=False):
+            chunk_graph._chunkmap[Path(chunk_node.metadata.file_path)].append(
+                chunk_node
+            )
+        chunk_graph._chunk_index = ChunkIndex(chunk_graph._chunkmap)
+
+        if repo_graph_path:
+            chunk_graph._repo_graph = RepoGraph.load(repo_graph_path)
+
+        return chunk_graph
+
+    def save(self, graph_dir: Path, repo_graph_path: Optional[Path] = None):
+        """
+        Streams the graph to graph_dir in the compact directory format of
+        persist.py. If repo_graph_path is given the RepoGraph is saved there as well
+        """
+        write_graph(
+            Path(graph_dir),
+            self._graph,
+            Path(self.repo_path),
+            cluster_roots=self._cluster_roots,
+            cluster_depth=self._cluster_depth,
+        )
+
+        if repo_graph_path:
+            self._repo_graph.save(repo_graph_path)
+
+    def to_json(self, file_path: Path, repo_graph_path: Optional[Path] = None):
+        """
+        Special custom node_link_data class to handle ChunkMetadata. If
+        repo_graph_path is given the RepoGraph is saved there as well
         """
 
         def custom_node_link_data(G: MultiDiGraph):
@@ -150,6 +372,9 @@ class ChunkGraph(CodeGraph):
                     node_dict["metadata"], ChunkMetadata
                 ):
                     node_dict["metadata"] = node_dict["metadata"].to_json()
+                if "content_ref" in node_dict:
+                    node_dict["content"] = chunk_content(node_dict)
+                    del node_dict["content_ref"]
 
                 node_dict["id"] = n
                 data["nodes"].append(node_dict)
@@ -173,6 +398,9 @@ class ChunkGraph(CodeGraph):
             graph_json = json.dumps(graph_dict)
             f.write(graph_json)
 
+        if repo_graph_path:
+            self._repo_graph.save(repo_graph_path)
+
     # def get_node(self, node_id: str) -> ChunkNode:
     #     data = self._graph._node.get(node_id, None)
     #     if not data:
@@ -190,6 +418,16 @@ class ChunkGraph(CodeGraph):
 
     #     return node
 
+    def add_node(self, node: Node):
+        super().add_node(node)
+        self._index_node(node.id, self._graph.nodes[node.id])
+        return node.id
+
+    def add_edge(self, edge: Edge):
+        super().add_edge(edge)
+        # a cluster with a parent is no longer a root
+        self._root_clusters.discard(edge.src)
+
     def remove_node(self, node_id: str):
         """
         Remove a node from the graph by its ID.
@@ -198,12 +436,49 @@ class ChunkGraph(CodeGraph):
         node_id (str): The ID of the node to be removed.
         """
         if node_id in self._graph:
+            children = self.children(node_id)
             self._graph.remove_node(node_id)
+            self._unindex_node(node_id)
+
+            for child in children:
+                if child in self._cluster_ids and not self.parent(child):
+                    self._root_clusters.add(child)
         else:
             raise ValueError(f"Node with ID {node_id} does not exist in the graph.")
 
-    def get_all_nodes(self) -> List[ChunkNode]:
-        return [self.get_node(n) for n in self._graph.nodes]
+    def _index_node(self, node_id: str, node_data: Dict):
+        if node_id not in self._node_order:
+            self._node_order[node_id] = next(self._order_counter)
+
+        kind = node_data.get("kind")
+        if kind == NodeKind.Chunk:
+            self._chunk_ids[node_id] = None
+        elif kind == NodeKind.Cluster:
+            self._cluster_ids[node_id] = None
+            if not self.parent(node_id):
+                self._root_clusters.add(node_id)
+
+            # titles change when clusters are summarized
+            title = node_data.get("title", "")
+            old_title = self._cluster_titles.get(node_id)
+            if old_title != title:
+                if old_title is not None:
+                    self._title_to_clusters[old_title].discard(node_id)
+                self._cluster_titles[node_id] = title
+                self._title_to_clusters[title].add(node_id)
+
+    def _unindex_node(self, node_id: str):
+        # a re-added node goes to the end of the graph's node order
+        self._node_order.pop(node_id, None)
+        self._chunk_ids.pop(node_id, None)
+        self._cluster_ids.pop(node_id, None)
+        self._root_clusters.discard(node_id)
+        title = self._cluster_titles.pop(node_id, None)
+        if title is not None:
+            self._title_to_clusters[title].discard(node_id)
+
+    def get_all_nodes(self, view: bool = False) -> List[ChunkNode]:
+        return list(self.iter_nodes(view=view))
 
     def update_node(self, chunk_node: ChunkNode):
         self.add_node(chunk_node)
@@ -218,65 +493,94 @@ class ChunkGraph(CodeGraph):
         Build the import to export mapping for a chunk
         need to do: import (chunk -> range -> scope) -> export (scope -> range -> chunk)
         """
-        src_path = Path(chunk_node.metadata.file_path)
-        scope_graph = self._repo_graph.scopes_map[src_path]
-        chunk_refs = capture_refs(chunk_node.content.encode())
+        self.add_edge_rows(self._chunk_edge_rows(chunk_node))
 
-        for ref in chunk_refs:
-            # align ref with chunks offset
-            ref.range = ref.range.add_offset(
-                chunk_node.metadata.start_line, chunk_node.metadata.start_line
+    def add_edge_rows(self, rows: Iterable[ChunkEdgeRow]):
+        """
+        Bulk load (src, dst, kind, ref) chunk edges. Repeated rows are collapsed
+        into a single edge whose weight is the number of times the row occurred
+        """
+        weights = Counter(rows)
+        self._graph.add_edges_from(
+            (
+                src,
+                dst,
+                {"src": src, "dst": dst, "kind": kind, "ref": ref, "weight": weight},
             )
-            # range -> scope
-            ref_scope = scope_graph.scope_by_range(ref.range)
-            # scope (import) -> scope (export)
-            export = self._repo_graph.import_to_export_scope(
-                repo_node_id(src_path, ref_scope), ref.name
+            for (src, dst, kind, ref), weight in weights.items()
+        )
+        for src, _, _, _ in weights:
+            self._root_clusters.discard(src)
+
+    def _chunk_edge_rows(self, chunk_node: ChunkNode) -> List[ChunkEdgeRow]:
+        """
+        Resolves the refs of a chunk to the chunks that export them, returning
+        the edges as rows
+        """
+        return self._resolver().edge_rows(chunk_node)
+
+    def _resolver(self) -> ChunkEdgeResolver:
+        # the resolver reads the chunk index, so follow it when it is rebuilt
+        if (
+            self._edge_resolver is None
+            or self._edge_resolver.chunk_index is not self._chunk_index
+        ):
+            self._edge_resolver = ChunkEdgeResolver.from_repo_graph(
+                self._repo_graph, self._chunk_index
             )
-            # TODO: this would be alot better if we could search using
-            # existing ts queries cuz we can narrow to import refs
-            if not export:
-                # print(f"Unmatched ref: {ref.name} in {src_path}")
-                continue
+        return self._edge_resolver
 
-            export_sg = self._repo_graph.scopes_map[Path(export.file_path)]
-            export_range = export_sg.range_by_scope(export.scope)
-            dst_chunk = self.find_chunk(Path(export.file_path), export_range)
-            if dst_chunk:
-                if scope_graph.is_call_ref(ref.range):
-                    call_edge = CallEdge(
-                        src=chunk_node.id, dst=dst_chunk.id, ref=ref.name
+    def _build_edge_rows(self) -> List[ChunkEdgeRow]:
+        """
+        Edge rows of every chunk in graph order. With workers > 1 the files are
+        sharded over a process pool, each worker holding a read-only copy of the
+        resolver, and the per chunk rows are merged back in graph order
+        """
+        paths = self._chunk_index.paths()
+        if self._workers > 1 and len(paths) > 1:
+            chunksize = max(1, len(paths) // (self._workers * 4))
+            with ProcessPoolExecutor(
+                max_workers=self._workers,
+                initializer=_init_edge_resolver,
+                initargs=(self._resolver(),),
+            ) as executor:
+                chunk_rows = {
+                    chunk_id: rows
+                    for file_rows in executor.map(
+                        _file_edge_rows_worker, paths, chunksize=chunksize
                     )
-                    # print("adding call edge: ", call_edge.dict())
-                    self.add_edge(call_edge)
+                    for chunk_id, rows in file_rows
+                }
+
+            return [
+                row
+                for chunk_id in self._chunk_ids
+                for row in chunk_rows.get(chunk_id, ())
+            ]
+
+        edge_rows = []
+        for chunk_node in self.iter_nodes(kind=NodeKind.Chunk):
+            # chunk -> range -> scope
+            edge_rows.extend(self._chunk_edge_rows(chunk_node))
 
-                # differentiate between ImportToExport chunks and CallToExport chunks
-                # so in the future we can use this for file level edges
-                ref_edge = ImportEdge(src=chunk_node.id, dst=dst_chunk.id, ref=ref.name)
-                # print(f"Adding edge: {chunk_node.id} -> {dst_chunk.id}")
-                self.add_edge(ref_edge)
+        return edge_rows
 
-    # TODO: should really use IntervalGraph here but chunks are small enough
     def find_chunk(self, file_path: Path, range: TextRange):
         """
         Find a chunk given a range
         """
-        chunks = self._chunkmap[file_path]
-        for chunk in chunks:
-            if chunk.range.contains_line(range, overlap=True):
-                return chunk
-
-        return None
+        return self._chunk_index.find_chunk(file_path, range)
 
     def find_cluster_node_by_title(self, title: str):
         """
         Find a cluster node by its ID
         """
-        for node in self._graph.nodes:
-            cluster_node = self.get_node(node)
-            if isinstance(cluster_node, ClusterNode) and cluster_node.title == title:
-                return cluster_node
-        return None
+        cluster_ids = self._title_to_clusters.get(title)
+        if not cluster_ids:
+            return None
+
+        # first matching cluster in graph order
+        return self.get_node(min(cluster_ids, key=self._node_order.get))
 
     def children(self, node_id: str):
         return [child for child, _ in self._graph.in_edges(node_id)]
@@ -313,13 +617,7 @@ class ChunkGraph(CodeGraph):
         """
         Gets the multiple root cluster nodes generated from Infomap
         """
-        roots = []
-        for node in self._graph.nodes:
-            if isinstance(self.get_node(node), ClusterNode):
-                if not self.parent(node):
-                    roots.append(node)
-
-        return roots
+        return sorted(self._root_clusters, key=self._node_order.get)
 
     def cluster(self, alg: str = "infomap") -> Dict[ChunkNodeID, Tuple]:
         """
@@ -349,15 +647,9 @@ class ChunkGraph(CodeGraph):
         chunks_attached_to_clusters = {}
         clusters = defaultdict(int)
 
-        total_chunks = len(
-            [
-                node
-                for node, attrs in self._graph.nodes(data=True)
-                if attrs["kind"] == "Chunk"
-            ]
-        )
+        total_chunks = len(self._chunk_ids)
         total_leaves = 0
-        for u, v, attrs in self._graph.edges(data=True):
+        for u, v, attrs in self._graph.out_edges(self._chunk_ids, data=True):
             if attrs.get("kind") == ClusterEdgeKind.ChunkToCluster:
                 chunk_node = self.get_node(u)
                 cluster_node = self.get_node(v)
@@ -440,38 +732,33 @@ class ChunkGraph(CodeGraph):
     ##### FOR testing prompt #####
     def get_chunk_imports(self):
         shared_refs = {}
-        for cluster_id, node_data in self._graph.nodes(data=True):
-            if node_data["kind"] == "Cluster":
-                ref_edges = defaultdict(int)
-                for child in self.children(cluster_id):
-                    child_node = self.get_node(child)
-                    if child_node.kind == NodeKind.Chunk:
-                        try:
-                            for _, _, attrs in self._graph.edges(child, data=True):
-                                if attrs["kind"] == ChunkEdgeKind.ImportFrom:
-                                    ref = attrs["ref"]
-                                    ref_edges[ref] += 1
-                        except Exception:
-                            continue
-                shared_refs[cluster_id] = ref_edges
+        for cluster_id in self._cluster_ids:
+            ref_edges = defaultdict(int)
+            for child in self.children(cluster_id):
+                if child in self._chunk_ids:
+                    try:
+                        for _, _, attrs in self._graph.edges(child, data=True):
+                            if attrs["kind"] == ChunkEdgeKind.ImportFrom:
+                                ref = attrs["ref"]
+                                ref_edges[ref] += attrs.get("weight", 1)
+                    except Exception:
+                        continue
+            shared_refs[cluster_id] = ref_edges
 
         return shared_refs
 
     def get_chunks(self):
         cluster_dict = {}
-        for cluster_id, node_data in self._graph.nodes(data=True):
-            if node_data["kind"] == "Cluster":
-                concatenated_content = []
-                for child in self.children(cluster_id):
-                    child_node = self.get_node(child)
-                    if child_node.kind == NodeKind.Chunk:
-                        # print("CHunk: ", child_node.id)
-                        try:
-                            chunk_node = self.get_node(child)
-                            concatenated_content.append(chunk_node.get_content())
-                        except Exception:
-                            continue
-                cluster_dict[cluster_id] = concatenated_content
+        for cluster_id in self._cluster_ids:
+            concatenated_content = []
+            for child in self.children(cluster_id):
+                if child in self._chunk_ids:
+                    try:
+                        chunk_node = self.get_node(child)
+                        concatenated_content.append(chunk_node.get_content())
+                    except Exception:
+                        continue
+            cluster_dict[cluster_id] = concatenated_content
 
         return cluster_dict
 
@@ -492,17 +779,15 @@ class ChunkGraph(CodeGraph):
 
     def to_str_cluster(self):
         repr = ""
-        for node_id, node_data in self._graph.nodes(data=True):
-            # print(node_data)
-            if node_data["kind"] == "Cluster":
-                repr += f"ClusterNode: {node_id}\n"
-                for child, _, edge_data in self._graph.in_edges(node_id, data=True):
-                    if edge_data["kind"] == ClusterEdgeKind.ChunkToCluster:
-                        chunk_node = self.get_node(child)
-                        repr += f"  ChunkNode: {chunk_node.id}\n"
-                    elif edge_data["kind"] == ClusterEdgeKind.ClusterToCluster:
-                        cluster_node = self.get_node(child)
-                        repr += f"  ClusterNode: {cluster_node.id}\n"
+        for node_id in self._cluster_ids:
+            repr += f"ClusterNode: {node_id}\n"
+            for child, _, edge_data in self._graph.in_edges(node_id, data=True):
+                if edge_data["kind"] == ClusterEdgeKind.ChunkToCluster:
+                    chunk_node = self.get_node(child)
+                    repr += f"  ChunkNode: {chunk_node.id}\n"
+                elif edge_data["kind"] == ClusterEdgeKind.ClusterToCluster:
+                    cluster_node = self.get_node(child)
+                    repr += f"  ClusterNode: {cluster_node.id}\n"
         return repr
 
     def clusters_to_json(self):
@@ -523,7 +808,7 @@ class ChunkGraph(CodeGraph):
 
             for child, _, edge_data in self._graph.in_edges(cluster_id, data=True):
                 if edge_data["kind"] == ClusterEdgeKind.ChunkToCluster:
-                    chunk_node = self.get_node(child)
+                    chunk_node = self.get_node(child, view=True)
                     # TODO: change to include file name
                     chunk_info = {
                         "id": chunk_node.id,
@@ -537,12 +822,7 @@ class ChunkGraph(CodeGraph):
 
             return graph_json
 
-        graph_jsons = []
-        for node_id, node_data in self._graph.nodes(data=True):
-            if node_data["kind"] == "Cluster" and not self.parent(node_id):
-                graph_jsons.append(dfs_cluster(node_id))
-
-        return graph_jsons
+        return [dfs_cluster(root) for root in self._get_cluster_roots()]
 
     def clusters_to_str(self):
         INDENT_SYM = lambda d: "-" * d + " " if d > 0 else ""
@@ -0,0 +1,103 @@
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from rtfs.utils import TextRange
+
+from .graph import ChunkNode
+
+
+class _FileChunks:
+    """
+    Chunks of a single file sorted by start line, with the running max of their
+    end lines so a backwards scan can stop once no earlier chunk reaches a line
+    """
+
+    def __init__(self, chunks: List[ChunkNode]):
+        self.chunks = chunks
+
+        # (start, end, insertion order) sorted by start
+        self.lines = sorted(
+            (*chunk.range.line_range(), i) for i, chunk in enumerate(chunks)
+        )
+        self.starts = [start for start, _, _ in self.lines]
+        self.max_ends = []
+        max_end = None
+        for _, end, _ in self.lines:
+            max_end = end if max_end is None else max(max_end, end)
+            self.max_ends.append(max_end)
+
+    def first_containing(self, line: int) -> Optional[int]:
+        """
+        Returns the insertion order of the first chunk whose lines contain line
+        """
+        first = None
+        i = bisect_right(self.starts, line) - 1
+        while i >= 0 and self.max_ends[i] >= line:
+            _, end, order = self.lines[i]
+            if end >= line and (first is None or order < first):
+                first = order
+            i -= 1
+
+        return first
+
+
+class ChunkIndex:
+    """
+    Per file line index over chunks, answering the same queries as a linear scan
+    of the file's chunks for the first chunk where
+    chunk.range.contains_line(range, overlap=True)
+    """
+
+    def __init__(self, chunkmap: Dict[Path, List[ChunkNode]]):
+        self._files = {
+            path: _FileChunks(list(chunks)) for path, chunks in chunkmap.items()
+        }
+
+    def set_chunks(self, file_path: Path, chunks: List[ChunkNode]):
+        """
+        Replaces the chunks of a file, dropping it from the index if chunks is empty
+        """
+        if chunks:
+            self._files[file_path] = _FileChunks(list(chunks))
+        else:
+            self._files.pop(file_path, None)
+
+    def paths(self) -> List[Path]:
+        return list(self._files)
+
+    def chunks(self, file_path: Path) -> List[ChunkNode]:
+        file_chunks = self._files.get(file_path)
+        return file_chunks.chunks if file_chunks else []
+
+    def find_chunk(self, file_path: Path, range: TextRange) -> Optional[ChunkNode]:
+        return self.find_chunks(file_path, [range])[0]
+
+    def find_chunks(
+        self, file_path: Path, ranges: List[TextRange]
+    ) -> List[Optional[ChunkNode]]:
+        """
+        Batched find_chunk for all the ranges in a file
+        """
+        file_chunks = self._files.get(file_path)
+        if not file_chunks:
+            return [None] * len(ranges)
+
+        found = []
+        for range in ranges:
+            if range is None:
+                found.append(None)
+                continue
+
+            # overlap: the chunk contains either the start or the end line
+            orders = [
+                order
+                for order in (
+                    file_chunks.first_containing(range.start_point.row),
+                    file_chunks.first_containing(range.end_point.row),
+                )
+                if order is not None
+            ]
+            found.append(file_chunks.chunks[min(orders)] if orders else None)
+
+        return found
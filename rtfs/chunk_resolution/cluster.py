@@ -15,9 +15,10 @@ def cluster_infomap(digraph: nx.DiGraph) -> Dict[str, int]:
     node_id_map = {node: idx for idx, node in enumerate(digraph.nodes())}
     reverse_node_id_map = {idx: node for node, idx in node_id_map.items()}
 
-    # Add nodes and edges to Infomap using integer IDs
-    for edge in digraph.edges():
-        infomap.addLink(node_id_map[edge[0]], node_id_map[edge[1]])
+    # Add nodes and edges to Infomap using integer IDs, edges bulk loaded from
+    # rows carry the number of times they occurred as their weight
+    for src, dst, weight in digraph.edges(data="weight", default=1):
+        infomap.addLink(node_id_map[src], node_id_map[dst], weight)
 
     # Run Infomap clustering
     infomap.run()
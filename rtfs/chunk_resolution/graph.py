@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Optional, NewType, Literal
+from typing import Any, List, Optional, NewType, Literal, Tuple
 from dataclasses import dataclass, field
 import random
 
@@ -76,7 +76,9 @@ class ChunkNode(Node):
     kind: str = "ChunkNode"
     og_id: str  # original ID on the BaseNode
     metadata: ChunkMetadata
-    content: str
+    content: Optional[str] = None
+    # chunks loaded with ChunkGraph.load read their content through a ContentRef
+    content_ref: Optional[Any] = None
 
     @property
     def range(self):
@@ -91,6 +93,12 @@ class ChunkNode(Node):
     def set_community(self, community: int):
         self.metadata.community = community
 
+    def dict(self):
+        d = super().dict()
+        if self.content_ref is None:
+            del d["content_ref"]
+        return d
+
     def __hash__(self):
         return hash(self.id + "".join(self.metadata.span_ids))
 
@@ -100,12 +108,14 @@ class ChunkNode(Node):
     def to_node(self):
         return CodeNode(
             id=self.id,
-            text=self.content,
+            text=self.get_content(),
             metadata=self.metadata.__dict__,
-            content=self.content,
+            content=self.get_content(),
         )
 
     def get_content(self):
+        if self.content_ref is not None:
+            return self.content_ref.read()
         return self.content
 
 
@@ -142,6 +152,10 @@ class ChunkEdgeKind(str, Enum):
     CallTo = "CallTo"
 
 
+# (src, dst, kind, ref) row for bulk loading chunk edges
+ChunkEdgeRow = Tuple[ChunkNodeID, ChunkNodeID, ChunkEdgeKind, str]
+
+
 @dataclass(kw_only=True)
 class ImportEdge(Edge):
     kind: ChunkEdgeKind = ChunkEdgeKind.ImportFrom
@@ -0,0 +1,405 @@
+"""
+Streaming directory format for ChunkGraph:
+
+    meta.json      format version, cluster info, table columns and string table
+    nodes.jsonl    one row per node, in graph order
+    edges.jsonl    one row per edge, endpoints given as node row numbers
+    content.bin    chunk contents that are not a verbatim slice of their file
+
+Rows are JSON arrays whose columns are listed in meta.json. Repeated strings
+(kinds, refs, file paths ...) are written as indices into the string table.
+Chunk content is stored as a (file, byte range, hash) reference when the chunk
+is a slice of its source file, and as a range of content.bin otherwise. Loaded
+chunks keep the reference as a ContentRef and only read it, through mmap, when
+their content is asked for
+"""
+import hashlib
+from itertools import accumulate
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from networkx import MultiDiGraph
+
+from .graph import ChunkMetadata, NodeKind
+
+
+FORMAT_VERSION = 1
+
+CHUNK_COLUMNS = [
+    "kind",
+    "id",
+    "og_id",
+    "file_path",
+    "file_name",
+    "file_type",
+    "category",
+    "tokens",
+    "span_ids",
+    "start_line",
+    "end_line",
+    "community",
+    "content",
+]
+CLUSTER_COLUMNS = ["kind", "id", "title", "summary", "key_variables"]
+EDGE_COLUMNS = ["src", "dst", "kind", "ref", "weight", "attrs"]
+
+# chunk content references
+CONTENT_FILE = "f"
+CONTENT_BLOB = "b"
+
+
+def _content_hash(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def _source_path(repo_path: Path, file_path: str) -> Path:
+    path = Path(file_path)
+    return path if path.is_absolute() else repo_path / path
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def intern(self, s: Optional[str]) -> Optional[int]:
+        if s is None:
+            return None
+
+        i = self._index.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.strings.append(s)
+            self._index[s] = i
+        return i
+
+
+class _ContentWriter:
+    """
+    Stores chunk contents as references into their source files where possible,
+    appending everything else to content.bin
+    """
+
+    def __init__(self, repo_path: Path, blob, strings: _StringTable):
+        self.repo_path = repo_path
+        self.blob = blob
+        self.strings = strings
+        self.offset = 0
+        # chunks come grouped by file, so only the current file is kept around
+        self._source_key: Optional[str] = None
+        self._source: Optional[_SourceLines] = None
+
+    def _parsed_source(self, file_path: str) -> Optional["_SourceLines"]:
+        if file_path != self._source_key:
+            try:
+                src = _source_path(self.repo_path, file_path).read_bytes()
+                self._source = _SourceLines(src)
+            except OSError:
+                self._source = None
+            self._source_key = file_path
+
+        return self._source
+
+    def write(self, content: str, metadata: ChunkMetadata) -> List[Any]:
+        data = content.encode()
+        source = self._parsed_source(metadata.file_path)
+        if source is not None and data:
+            src = source.src
+            # chunks usually start at the beginning of their first line
+            start = source.line_start(metadata.start_line - 1)
+            if not src.startswith(data, start):
+                start = src.find(data)
+            if start != -1:
+                return [
+                    CONTENT_FILE,
+                    self.strings.intern(metadata.file_path),
+                    start,
+                    start + len(data),
+                    _content_hash(data),
+                ]
+
+        self.blob.write(data)
+        ref = [CONTENT_BLOB, self.offset, len(data)]
+        self.offset += len(data)
+        return ref
+
+
+class _SourceLines:
+    """
+    Source file contents with the byte offset of each line
+    """
+
+    def __init__(self, src: bytes):
+        self.src = src
+        self.line_index = [0, *accumulate(len(line) + 1 for line in src.split(b"\n"))]
+
+    def line_start(self, line: int) -> int:
+        if line >= len(self.line_index):
+            return len(self.src)
+        return self.line_index[max(line, 0)]
+
+
+class _ContentReader:
+    """
+    Maps content.bin and the source files referenced by chunks. The maps stay
+    open for as long as a ContentRef into them is alive
+    """
+
+    def __init__(self, repo_path: Path, blob_path: Path, strings: List[str]):
+        self.repo_path = repo_path
+        self.strings = strings
+        # file path -> (stat of the mapped file, map)
+        self._maps: Dict[str, Tuple[Tuple[int, int, int], Optional[mmap.mmap]]] = {}
+        self._blob = self._map(blob_path)
+
+    def _map(self, path: Path) -> Optional[mmap.mmap]:
+        with open(path, "rb") as f:
+            if f.seek(0, 2) == 0:
+                # empty files cannot be mapped
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _source(self, file_path: str) -> Optional[mmap.mmap]:
+        path = _source_path(self.repo_path, file_path)
+        st = os.stat(path)
+        key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        mapped = self._maps.get(file_path)
+        if mapped is None or mapped[0] != key:
+            # the file was replaced or rewritten since it was mapped
+            if mapped is not None and mapped[1] is not None:
+                mapped[1].close()
+            mapped = (key, self._map(path))
+            self._maps[file_path] = mapped
+
+        return mapped[1]
+
+    def read(self, ref: List[Any]) -> str:
+        if ref[0] == CONTENT_BLOB:
+            _, offset, length = ref
+            return self._blob[offset : offset + length].decode() if length else ""
+
+        _, file_idx, start, end, content_hash = ref
+        file_path = self.strings[file_idx]
+        source = self._source(file_path)
+        data = source[start:end] if source is not None else b""
+        if _content_hash(data) != content_hash:
+            raise ValueError(
+                f"{file_path} has changed since the graph was saved, "
+                "cannot restore the contents of its chunks"
+            )
+        return data.decode()
+
+
+class ContentRef:
+    """
+    The saved location of a chunk's content, which is read and checked against
+    its hash every time it is asked for
+    """
+
+    __slots__ = ("_reader", "_ref")
+
+    def __init__(self, reader: _ContentReader, ref: List[Any]):
+        self._reader = reader
+        self._ref = ref
+
+    def read(self) -> str:
+        return self._reader.read(self._ref)
+
+    def __repr__(self):
+        return f"ContentRef({self._ref!r})"
+
+
+def chunk_content(data: Dict) -> str:
+    """
+    Content of a chunk from its node attributes, reading it if it was loaded
+    lazily
+    """
+    if "content_ref" in data:
+        return data["content_ref"].read()
+    return data["content"]
+
+
+def _write_row(f, row: List[Any]):
+    f.write(json.dumps(row, separators=(",", ":")))
+    f.write("\n")
+
+
+def write_graph(
+    out_dir: Path,
+    g: MultiDiGraph,
+    repo_path: Path,
+    cluster_roots: List = [],
+    cluster_depth: Optional[int] = None,
+):
+    """
+    Writes g to out_dir row by row, without building an in memory copy of it
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    strings = _StringTable()
+    node_rows: Dict[str, int] = {}
+
+    with open(out_dir / "nodes.jsonl", "w") as nodes_f, open(
+        out_dir / "content.bin", "wb"
+    ) as blob_f:
+        content = _ContentWriter(repo_path, blob_f, strings)
+        for i, (node_id, data) in enumerate(g.nodes(data=True)):
+            node_rows[node_id] = i
+            kind = data.get("kind")
+            if kind == NodeKind.Chunk:
+                metadata = data["metadata"]
+                if isinstance(metadata, dict):
+                    metadata = ChunkMetadata(**metadata)
+                row = [
+                    strings.intern(kind),
+                    node_id,
+                    data["og_id"],
+                    strings.intern(metadata.file_path),
+                    strings.intern(metadata.file_name),
+                    strings.intern(metadata.file_type),
+                    strings.intern(metadata.category),
+                    metadata.tokens,
+                    metadata.span_ids,
+                    metadata.start_line,
+                    metadata.end_line,
+                    metadata.community,
+                    content.write(chunk_content(data), metadata),
+                ]
+            elif kind == NodeKind.Cluster:
+                row = [
+                    strings.intern(kind),
+                    node_id,
+                    data.get("title", ""),
+                    data.get("summary", ""),
+                    data.get("key_variables", []),
+                ]
+            else:
+                raise ValueError(f"Cannot persist node {node_id} of kind {kind}")
+
+            _write_row(nodes_f, row)
+
+    with open(out_dir / "edges.jsonl", "w") as edges_f:
+        for u, v, data in g.edges(data=True):
+            attrs = {
+                k: val
+                for k, val in data.items()
+                if k not in ("src", "dst", "kind", "ref", "weight")
+            }
+            _write_row(
+                edges_f,
+                [
+                    node_rows[u],
+                    node_rows[v],
+                    strings.intern(data.get("kind")),
+                    strings.intern(data.get("ref")),
+                    data.get("weight"),
+                    attrs or None,
+                ],
+            )
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "cluster_roots": cluster_roots,
+        "cluster_depth": cluster_depth,
+        "columns": {
+            NodeKind.Chunk.value: CHUNK_COLUMNS,
+            NodeKind.Cluster.value: CLUSTER_COLUMNS,
+            "edge": EDGE_COLUMNS,
+        },
+        "strings": strings.strings,
+    }
+    with open(out_dir / "meta.json", "w") as f:
+        json.dump(meta, f)
+
+
+def _read_rows(path: Path) -> Iterator[List[Any]]:
+    with open(path, "r") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def read_graph(out_dir: Path, repo_path: Path) -> Tuple[MultiDiGraph, Dict]:
+    """
+    Reads a graph written by write_graph, returning it with its meta data.
+    Chunk contents are left as ContentRefs in the content_ref attribute
+    """
+    with open(out_dir / "meta.json", "r") as f:
+        meta = json.load(f)
+    if meta.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported chunk graph format: {meta.get('version')}")
+
+    strings = meta["strings"]
+
+    def string(i: Optional[int]) -> Optional[str]:
+        return strings[i] if i is not None else None
+
+    g = MultiDiGraph()
+    node_ids = []
+
+    reader = _ContentReader(repo_path, out_dir / "content.bin", strings)
+    for row in _read_rows(out_dir / "nodes.jsonl"):
+        kind = strings[row[0]]
+        node_id = row[1]
+        node_ids.append(node_id)
+        if kind == NodeKind.Chunk:
+            (
+                _,
+                _,
+                og_id,
+                file_path,
+                file_name,
+                file_type,
+                category,
+                tokens,
+                span_ids,
+                start_line,
+                end_line,
+                community,
+                content_ref,
+            ) = row
+            metadata = ChunkMetadata(
+                file_path=string(file_path),
+                file_name=string(file_name),
+                file_type=string(file_type),
+                category=string(category),
+                tokens=tokens,
+                span_ids=span_ids,
+                start_line=start_line,
+                end_line=end_line,
+                community=community,
+            )
+            g.add_node(
+                node_id,
+                kind=kind,
+                og_id=og_id,
+                metadata=metadata,
+                content_ref=ContentRef(reader, content_ref),
+            )
+        else:
+            _, _, title, summary, key_variables = row
+            g.add_node(
+                node_id,
+                kind=kind,
+                title=title,
+                summary=summary,
+                key_variables=key_variables,
+            )
+
+    def edges():
+        for src, dst, kind, ref, weight, attrs in _read_rows(out_dir / "edges.jsonl"):
+            u, v = node_ids[src], node_ids[dst]
+            data = {"src": u, "dst": v}
+            if kind is not None:
+                data["kind"] = string(kind)
+            if ref is not None:
+                data["ref"] = string(ref)
+            if weight is not None:
+                data["weight"] = weight
+            if attrs:
+                data.update(attrs)
+            yield u, v, data
+
+    g.add_edges_from(edges())
+    return g, meta
@@ -1,38 +1,91 @@
 from pathlib import Path
 import os
-from typing import Dict, List
+from typing import Dict, List, Optional
 import mimetypes
 import fnmatch
 from pathlib import Path
 import json
 
 from llama_index.core import SimpleDirectoryReader
+from llama_index.core.schema import BaseNode
 from rtfs.moatless.epic_split import EpicSplitter
 from rtfs.moatless.settings import IndexSettings
 from rtfs.chunk_resolution.chunk_graph import ChunkGraph
+from rtfs.fs import RepoFs
+from rtfs.ingest import ParsedFile, ingest
+from rtfs.cache import ParseCache
 
 
-def chunk(repo_path: str, persist_dir: str = "") -> ChunkGraph:
-    def file_metadata_func(file_path: str) -> Dict:
-        test_patterns = [
-            "**/test/**",
-            "**/tests/**",
-            "**/test_*.py",
-            "**/*_test.py",
-        ]
-        category = (
-            "test"
-            if any(fnmatch.fnmatch(file_path, pattern) for pattern in test_patterns)
-            else "implementation"
-        )
-
-        return {
-            "file_path": file_path,
-            "file_name": os.path.basename(file_path),
-            "file_type": mimetypes.guess_type(file_path)[0],
-            "category": category,
-        }
+def file_metadata_func(file_path: str) -> Dict:
+    test_patterns = [
+        "**/test/**",
+        "**/tests/**",
+        "**/test_*.py",
+        "**/*_test.py",
+    ]
+    category = (
+        "test"
+        if any(fnmatch.fnmatch(file_path, pattern) for pattern in test_patterns)
+        else "implementation"
+    )
+
+    return {
+        "file_path": file_path,
+        "file_name": os.path.basename(file_path),
+        "file_type": mimetypes.guess_type(file_path)[0],
+        "category": category,
+    }
+
+
+def _splitter(repo_path: str, workers: int = 1) -> EpicSplitter:
+    settings = IndexSettings()
+    return EpicSplitter(
+        min_chunk_size=settings.min_chunk_size,
+        chunk_size=settings.chunk_size,
+        hard_token_limit=settings.hard_token_limit,
+        max_chunks=settings.max_chunks,
+        comment_strategy=settings.comment_strategy,
+        repo_path=repo_path,
+        workers=workers,
+        token_count_mode=settings.token_count_mode,
+    )
+
+
+def chunk_files(
+    repo_path: str,
+    paths: List[Path],
+    parsed_files: Optional[Dict[Path, ParsedFile]] = None,
+    cache: Optional[ParseCache] = None,
+) -> List[BaseNode]:
+    """
+    Chunks only the given files of the repo, producing the same chunks chunk()
+    does for them. Used to update a ChunkGraph after files change
+    """
+    if not paths:
+        return []
 
+    reader = SimpleDirectoryReader(
+        # same (full) file paths as reading the whole repo directory
+        input_files=[str(Path(path).resolve()) for path in paths],
+        file_metadata=file_metadata_func,
+        filename_as_id=True,
+    )
+    return _splitter(repo_path).get_nodes_from_documents(
+        reader.load_data(), parsed_files=parsed_files, cache=cache
+    )
+
+
+def chunk(
+    repo_path: str,
+    persist_dir: str = "",
+    workers: int = 1,
+    cache_dir: Optional[str] = None,
+) -> ChunkGraph:
+    """
+    Chunks the repo and builds its ChunkGraph. With cache_dir, the chunks, scope
+    graphs and refs of files that did not change since the last run are loaded
+    from the cache instead of being recomputed
+    """
     reader = SimpleDirectoryReader(
         input_dir=repo_path,
         file_metadata=file_metadata_func,
@@ -41,20 +94,23 @@ def chunk(repo_path: str, persist_dir: str = "") -> ChunkGraph:
         recursive=True,
     )
 
-    settings = IndexSettings()
     docs = reader.load_data()
+    splitter = _splitter(repo_path, workers=workers)
 
-    splitter = EpicSplitter(
-        min_chunk_size=settings.min_chunk_size,
-        chunk_size=settings.chunk_size,
-        hard_token_limit=settings.hard_token_limit,
-        max_chunks=settings.max_chunks,
-        comment_strategy=settings.comment_strategy,
-        repo_path=repo_path,
-    )
+    # parse every file once and share the trees between chunking and graph building
+    parsed_files = ingest(RepoFs(Path(repo_path)))
+    cache = ParseCache(Path(cache_dir)) if cache_dir else None
 
-    prepared_nodes = splitter.get_nodes_from_documents(docs, show_progress=True)
-    chunk_graph = ChunkGraph.from_chunks(Path(repo_path), prepared_nodes)
+    prepared_nodes = splitter.get_nodes_from_documents(
+        docs, show_progress=True, parsed_files=parsed_files, cache=cache
+    )
+    chunk_graph = ChunkGraph.from_chunks(
+        Path(repo_path),
+        prepared_nodes,
+        parsed_files=parsed_files,
+        workers=workers,
+        cache=cache,
+    )
 
     if persist_dir:
         node_dict = [node.dict() for node in prepared_nodes]
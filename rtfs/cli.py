@@ -128,9 +128,12 @@ def cli():
     "repo_path", type=click.Path(exists=True, file_okay=False, dir_okay=True)
 )
 @click.option("--saved-graph-path", type=click.Path(), default=None)
-def file_graph(repo_path, saved_graph_path):
+@click.option(
+    "--jobs", "-j", type=int, default=1, help="Processes used to build scope graphs"
+)
+def file_graph(repo_path, saved_graph_path, jobs):
     """Generate a FileGraph from the repository."""
-    fg = FileGraph.from_repo(Path(repo_path))
+    fg = FileGraph.from_repo(Path(repo_path), workers=jobs)
     click.echo("FileGraph generated successfully.")
 
 
@@ -143,7 +146,22 @@ def file_graph(repo_path, saved_graph_path):
 @click.option("--test-run", is_flag=True)
 @click.option("--output-format", type=click.Choice(["str", "json"]), default="str")
 @click.option("--output-file", type=click.Path(), default=None)
-def chunk_graph(repo_path, test_run, output_format, output_file):  # Modified line
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    default=1,
+    help="Processes used to split files, build scope graphs and chunk edges",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Reuse the chunks, scopes and refs of unchanged files across runs",
+)
+def chunk_graph(
+    repo_path, test_run, output_format, output_file, jobs, cache_dir
+):  # Modified line
     """Generate and manipulate ChunkGraph."""
     # saved_graph_path = Path(GRAPH_FOLDER, Path(repo_path).name + ".jsonffff")
     # if saved_graph_path.exists():
@@ -153,7 +171,7 @@ def chunk_graph(repo_path, test_run, output_format, output_file):  # Modified li
     #     print("Loading graph from saved file")
     #     cg = ChunkGraph.from_json(Path(repo_path), graph_dict)
     # else:
-    cg = chunk(repo_path)
+    cg = chunk(repo_path, workers=jobs, cache_dir=cache_dir)
     cg.cluster()
     # cg.to_json(saved_graph_path)
 
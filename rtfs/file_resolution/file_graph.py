@@ -25,17 +25,17 @@ class CallEdge(FileEdge):
     pass
 
 class FileGraph:
-    def __init__(self, repo_path: Path):
+    def __init__(self, repo_path: Path, workers: int = 1):
         self.repo_path = repo_path
         self.fs = RepoFs(repo_path)
         self._graph = MultiDiGraph()
-        self._repo_graph = RepoGraph(repo_path)
+        self._repo_graph = RepoGraph(repo_path, workers=workers)
         self._file2scope = defaultdict(set)
         self._lm: BaseModel = OpenAIModel()
 
     @classmethod
-    def from_repo(cls, repo_path: Path):
-        fg = cls(repo_path)
+    def from_repo(cls, repo_path: Path, workers: int = 1):
+        fg = cls(repo_path, workers=workers)
         fg._build_graph()
         return fg
 
@@ -54,7 +54,8 @@ class FileGraph:
     def _build_file_connections(self, file_node: FileNode):
         src_path = file_node.path
         scope_graph = self._repo_graph.scopes_map[src_path]
-        file_refs = capture_refs(file_node.content)
+        parsed_file = self._repo_graph.parsed_file(src_path)
+        file_refs = capture_refs(parsed_file.src, tree=parsed_file.tree)
 
         for ref in file_refs:
             ref_scope = scope_graph.scope_by_range(ref.range)
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Iterator, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from rtfs.utils import TextRange
 from rtfs.config import FILE_GLOB_ENDING, LANGUAGE
@@ -12,6 +12,56 @@ logger = logging.getLogger(__name__)
 SRC_EXT = FILE_GLOB_ENDING[LANGUAGE]
 
 
+class ModuleIndex:
+    """
+    Suffix trie over the path parts of every importable module, keyed on the parts
+    in reverse order with the source extension stripped from the last one. Each
+    trie node holds the first module (in path order) whose path ends with the parts
+    leading to it, so a namespace can be resolved in O(depth) even when it is not
+    aligned with the root of the repo
+    """
+
+    # key under which a trie node stores its module; path parts are never None
+    _MODULE = None
+
+    def __init__(self, paths: List[Path], skip_tests: bool = True):
+        self._root: Dict = {}
+
+        for path in paths:
+            if skip_tests and path.name.startswith("test_"):
+                continue
+
+            # a package is only importable if it has an __init__.py
+            if path.suffix != SRC_EXT and not (
+                path.is_dir() and (path / "__init__.py").exists()
+            ):
+                continue
+
+            node = self._root
+            for part in self._key(path):
+                node = node.setdefault(part, {})
+                node.setdefault(self._MODULE, path)
+
+    @staticmethod
+    def _key(path: Path) -> List[str]:
+        return [path.name.replace(SRC_EXT, "")] + list(reversed(path.parts[:-1]))
+
+    def lookup(self, ns_path: Path) -> Optional[Path]:
+        if not ns_path.parts:
+            return None
+
+        node = self._root
+        for part in reversed(ns_path.parts):
+            node = node.get(part)
+            if node is None:
+                return None
+
+        path = node[self._MODULE]
+        if path.suffix == SRC_EXT:
+            return path.resolve()
+        return (path / "__init__.py").resolve()
+
+
 # TODO: replace with the lama implementation or something
 class RepoFs:
     """
@@ -22,6 +72,7 @@ class RepoFs:
         self.repo_path = repo_path
         self._all_paths = self._get_all_paths()
         self._skip_tests = skip_tests
+        self._module_index = ModuleIndex(self._all_paths, skip_tests)
 
         # TODO: fix this later to actually parse the Paths
 
@@ -46,39 +97,12 @@ class RepoFs:
     # can do for absolute imports
     # we miss the following case:
     # - import a => will match any file in the repo that ends with "a"
-    def match_file(self, ns_path: Path) -> Path:
+    def match_file(self, ns_path: Path) -> Optional[Path]:
         """
         Given a file abc/xyz, check if it exists in all_paths
         even if the abc is not aligned with the root of the path
         """
-        # import_path = self.repo_path / ns_path
-
-        # if import_path.is_dir():
-        #     init_path = (import_path / "__init__.py").resolve()
-        #     # print("MF: ", init_path)
-        #     if init_path.exists():
-        #         print("Helo?: ", init_path)
-        #         return init_path
-
-        # if import_path.with_suffix(SRC_EXT).exists():
-        #     return import_path.with_suffix(SRC_EXT).resolve()
-
-        for path in self._all_paths:
-            if self._skip_tests and path.name.startswith("test_"):
-                continue
-
-            path_name = path.name.replace(SRC_EXT, "")
-            match_path = list(path.parts[-len(ns_path.parts) : -1]) + [path_name]
-
-            if match_path == list(ns_path.parts):
-                if path.suffix == SRC_EXT:
-                    return path.resolve()
-                elif path.is_dir():
-                    init_path = (path / "__init__.py").resolve()
-                    if init_path.exists():
-                        return init_path
-
-        return None
+        return self._module_index.lookup(ns_path)
 
     def _get_all_paths(self):
         """
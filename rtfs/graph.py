@@ -1,6 +1,9 @@
 from dataclasses import dataclass, field
+from functools import lru_cache
+from inspect import getattr_static
 from networkx import DiGraph
-from typing import List, Type, Dict
+from types import MethodType
+from typing import Any, Iterator, List, Optional, Type, Dict, Union
 import uuid
 
 
@@ -21,6 +24,67 @@ class Edge(DictMixin):
     dst: str
 
 
+@lru_cache(maxsize=None)
+def _class_attr(node_class: Type[Node], name: str):
+    return getattr_static(node_class, name)
+
+
+class NodeView:
+    """
+    Read-only proxy over the attribute dict of a node in the graph. Fields are
+    read straight from the dict and the properties and methods of the node class
+    are bound to the view, so no node object is constructed
+    """
+
+    __slots__ = ("id", "_attrs", "_node_class")
+
+    def __init__(self, node_id: str, attrs: Dict, node_class: Type[Node]):
+        object.__setattr__(self, "id", node_id)
+        object.__setattr__(self, "_attrs", attrs)
+        object.__setattr__(self, "_node_class", node_class)
+
+    def __getattr__(self, name: str) -> Any:
+        attrs = self._attrs
+        if name in attrs:
+            return attrs[name]
+
+        try:
+            attr = _class_attr(self._node_class, name)
+        except AttributeError:
+            raise AttributeError(
+                f"{self._node_class.__name__} view has no attribute {name}"
+            ) from None
+
+        if isinstance(attr, property):
+            return attr.fget(self)
+        elif isinstance(attr, staticmethod):
+            return attr.__func__
+        elif isinstance(attr, classmethod):
+            return MethodType(attr.__func__, self._node_class)
+        elif callable(attr):
+            return MethodType(attr, self)
+
+        return attr
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("NodeView is read-only, use get_node to modify a node")
+
+    def dict(self) -> Dict:
+        return dict(self._attrs)
+
+    def node(self) -> Node:
+        """
+        Materializes the node object
+        """
+        return self._node_class(id=self.id, **self._attrs)
+
+    def __str__(self):
+        return self._node_class.__str__(self)
+
+    def __repr__(self):
+        return f"NodeView({self._node_class.__name__}, id={self.id!r})"
+
+
 class CodeGraph(DiGraph):
     def __init__(self, *, node_types: List[Type[Node]]):
         super().__init__()
@@ -37,15 +101,41 @@ class CodeGraph(DiGraph):
     def add_edge(self, edge: Edge):
         self._graph.add_edge(edge.src, edge.dst, **edge.dict())
 
-    def get_node(self, node_id: str) -> Node:
+    def get_node(self, node_id: str, view: bool = False) -> Union[Node, NodeView]:
+        """
+        Returns the node with node_id, or a read-only NodeView over its attributes
+        if view is set
+        """
         if not self._graph.has_node(node_id):
             return None
 
         node_data = self._graph.nodes[node_id]
-        node_kind = node_data.get("kind")
+        node_class = self._node_class(node_data)
+        if view:
+            return NodeView(node_id, node_data, node_class)
 
+        return node_class(id=node_id, **node_data)
+
+    def iter_nodes(
+        self, kind: Optional[str] = None, view: bool = True
+    ) -> Iterator[Union[Node, NodeView]]:
+        """
+        Iterates over the nodes in the graph, optionally only those of kind. Yields
+        NodeViews unless view is unset
+        """
+        for node_id, node_data in self._graph.nodes(data=True):
+            if kind is not None and node_data.get("kind") != kind:
+                continue
+
+            node_class = self._node_class(node_data)
+            if view:
+                yield NodeView(node_id, node_data, node_class)
+            else:
+                yield node_class(id=node_id, **node_data)
+
+    def _node_class(self, node_data: Dict) -> Type[Node]:
+        node_kind = node_data.get("kind")
         if node_kind not in self.node_types:
             raise ValueError(f"Unknown node kind: {node_kind}")
 
-        node_class = self.node_types[node_kind]
-        return node_class(id=node_id, **node_data)
+        return self.node_types[node_kind]
@@ -0,0 +1,68 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from tree_sitter import Tree
+
+from rtfs.config import LANGUAGE
+from rtfs.fs import RepoFs
+from rtfs.languages import LANG_PARSER
+
+
+@dataclass
+class ParsedFile:
+    """
+    A source file parsed exactly once, shared by chunking, scope building and
+    ref capture so that none of them has to reparse the file
+    """
+
+    path: Path
+    src: bytes
+    tree: Tree
+    # byte offset of the start of each (0-based) line
+    line_index: List[int]
+
+    @classmethod
+    def from_bytes(
+        cls, path: Path, src: bytes, language: str = LANGUAGE
+    ) -> "ParsedFile":
+        src = bytes(src)
+        tree = LANG_PARSER[language].parse(src)
+
+        line_index = [0]
+        pos = src.find(b"\n")
+        while pos != -1:
+            line_index.append(pos + 1)
+            pos = src.find(b"\n", pos + 1)
+
+        return cls(path=path, src=src, tree=tree, line_index=line_index)
+
+    def line_to_byte(self, line: int) -> int:
+        """
+        Returns the byte offset of the start of a 0-based line
+        """
+        if line >= len(self.line_index):
+            return len(self.src)
+        return self.line_index[max(line, 0)]
+
+    def byte_to_line(self, byte: int) -> int:
+        return bisect_right(self.line_index, byte) - 1
+
+    def line_range_to_bytes(self, start_line: int, end_line: int) -> Tuple[int, int]:
+        """
+        Converts an inclusive, 0-based line range into a [start, end) byte range
+        """
+        return self.line_to_byte(start_line), self.line_to_byte(end_line + 1)
+
+
+def ingest(fs: RepoFs, language: str = LANGUAGE) -> Dict[Path, ParsedFile]:
+    """
+    Ingestion stage: parse every source file in the repo once, indexed by full path
+    """
+    parsed_files = {}
+    for path, file_content in fs.get_files_content():
+        path = path.resolve()
+        parsed_files[path] = ParsedFile.from_bytes(path, file_content, language)
+
+    return parsed_files
@@ -1,20 +1,69 @@
+import threading
+from pathlib import Path
+from typing import Dict, Union
+
 import tree_sitter_python as tspython
-from tree_sitter import Language, Parser
+from tree_sitter import Language, Parser, Query, Tree
 from rtfs.config import PYTHON_SCM, PYTHONTS_LIB
 
 
 class PythonParse:
+    """
+    Process-wide registry for the python tree-sitter language. The Language and
+    every compiled query are built once and shared; Parser objects are not
+    thread-safe so each thread gets its own
+    """
+
+    _language: Language = None
+    _queries: Dict[str, Query] = {}
+    _lock = threading.RLock()
+    _local = threading.local()
+
+    @classmethod
+    def language(cls) -> Language:
+        if cls._language is None:
+            with cls._lock:
+                if cls._language is None:
+                    cls._language = Language(tspython.language())
+
+        return cls._language
 
     @classmethod
-    def _build_query(cls, file_content: bytearray, query_file: str):
-        query_file = open(PYTHON_SCM, "rb").read()
+    def parser(cls) -> Parser:
+        """
+        Returns the parser owned by the calling thread
+        """
+        parser = getattr(cls._local, "parser", None)
+        if parser is None:
+            parser = Parser(cls.language())
+            cls._local.parser = parser
 
-        PY_LANGUAGE = Language(tspython.language())
+        return parser
 
-        parser = Parser()
-        parser.set_language(PY_LANGUAGE)
+    @classmethod
+    def parse(cls, src: Union[bytes, bytearray]) -> Tree:
+        return cls.parser().parse(bytes(src))
+
+    @classmethod
+    def query(cls, query_file: Union[str, Path]) -> Query:
+        """
+        Returns the compiled query for query_file, compiling it on first use
+        """
+        key = str(query_file)
+        query = cls._queries.get(key)
+        if query is None:
+            with cls._lock:
+                query = cls._queries.get(key)
+                if query is None:
+                    with open(query_file, "rb") as f:
+                        query = cls.language().query(f.read())
+                    cls._queries[key] = query
 
-        root = parser.parse(file_content).root_node
-        query = PY_LANGUAGE.query(query_file)
+        return query
+
+    @classmethod
+    def _build_query(cls, file_content: bytearray, query_file: str = PYTHON_SCM):
+        root = cls.parse(file_content).root_node
+        query = cls.query(query_file)
 
         return query, root
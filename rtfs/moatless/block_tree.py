@@ -0,0 +1,166 @@
+from array import array
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional
+
+from rtfs.moatless.codeblocks import CodeBlock, CodeBlockType
+
+
+class BlockTree:
+    """
+    The code blocks of a parsed file stored as flat arrays instead of a tree of
+    CodeBlocks. Blocks are numbered in document order with the module at 0, so
+    the descendants of block i are the blocks i + 1 to ends[i] - 1. Code is kept
+    as byte offsets into the file and only decoded when asked for
+    """
+
+    def __init__(
+        self, src: bytes, file_path: Optional[str] = None, encoding: str = "utf8"
+    ):
+        self.src = src
+        self.file_path = file_path
+        self.encoding = encoding
+
+        self.types: List[CodeBlockType] = []
+        self.identifiers: List[Optional[str]] = []
+        self.span_ids: List[Optional[str]] = []
+        self.parents = array("i")
+        # one past the last descendant of each block
+        self.ends = array("i")
+        # pre_code is src[pre_starts[i]:starts[i]], content src[starts[i]:stops[i]]
+        self.pre_starts = array("q")
+        self.starts = array("q")
+        self.stops = array("q")
+        self.start_lines = array("i")
+        self.end_lines = array("i")
+        self.tokens = array("i")
+
+        # content lines edited by the parser, which no longer match the content
+        self._content_lines: Dict[int, List[str]] = {}
+        self._token_sums: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def add(
+        self,
+        block: CodeBlock,
+        parent: int,
+        pre_start: int,
+        start: int,
+        stop: int,
+    ) -> int:
+        """
+        Appends block, whose subtree is closed later with close(), and returns
+        its index
+        """
+        index = len(self.types)
+        self.types.append(block.type)
+        self.identifiers.append(block.identifier)
+        self.span_ids.append(None)
+        self.parents.append(parent)
+        self.ends.append(index + 1)
+        self.pre_starts.append(pre_start)
+        self.starts.append(start)
+        self.stops.append(stop)
+        self.start_lines.append(block.start_line)
+        self.end_lines.append(block.end_line)
+        self.tokens.append(block.tokens)
+
+        if "\n".join(block.content_lines) != block.content:
+            self._content_lines[index] = list(block.content_lines)
+        return index
+
+    def close(self, index: int, block: CodeBlock):
+        """
+        Records the final type and span of block once the parser is done with it,
+        and ends its subtree at the last block added
+        """
+        self.types[index] = block.type
+        self.span_ids[index] = (
+            block.belongs_to_span.span_id if block.belongs_to_span else None
+        )
+        self.ends[index] = len(self.types)
+        self._token_sums = None
+
+    def children(self, index: int) -> Iterator[int]:
+        child = index + 1
+        end = self.ends[index]
+        while child < end:
+            yield child
+            child = self.ends[child]
+
+    def descendants(self, index: int) -> range:
+        return range(index + 1, self.ends[index])
+
+    def parent(self, index: int) -> Optional[int]:
+        parent = self.parents[index]
+        return parent if parent >= 0 else None
+
+    def content(self, index: int) -> str:
+        return self.src[self.starts[index] : self.stops[index]].decode(self.encoding)
+
+    def pre_code(self, index: int) -> str:
+        return self.src[self.pre_starts[index] : self.starts[index]].decode(
+            self.encoding
+        )
+
+    def content_lines(self, index: int) -> List[str]:
+        lines = self._content_lines.get(index)
+        if lines is None:
+            lines = self.content(index).split("\n")
+        return lines
+
+    def pre_lines(self, index: int) -> int:
+        return self.pre_code(index).count("\n")
+
+    def indentation(self, index: int) -> str:
+        # as set by CodeBlock from the pre_code
+        return self.pre_code(index).rsplit("\n", 1)[-1]
+
+    def full_path(self, index: int) -> List[str]:
+        path = []
+        while index >= 0:
+            if self.identifiers[index]:
+                path.append(self.identifiers[index])
+            index = self.parents[index]
+        path.reverse()
+        return path
+
+    def path_string(self, index: int) -> str:
+        return ".".join(self.full_path(index))
+
+    def sum_tokens(self, index: int) -> int:
+        """
+        Tokens of the block and all of its descendants, see CodeBlock.sum_tokens
+        """
+        if self._token_sums is None:
+            self._token_sums = [0, *accumulate(self.tokens)]
+        return self._token_sums[self.ends[index]] - self._token_sums[index]
+
+    def find_errors(self, index: int = 0) -> List[int]:
+        return [
+            i
+            for i in range(index, self.ends[index])
+            if self.types[i] == CodeBlockType.ERROR
+        ]
+
+    def block_string(self, index: int) -> str:
+        """
+        The code of the block without its children, as CodeBlock.to_string
+        renders it
+        """
+        pre_code = self.pre_code(index)
+        pre_lines = pre_code.count("\n")
+        if not pre_lines:
+            return pre_code + self.content(index)
+
+        indentation = pre_code.rsplit("\n", 1)[-1]
+        contents = "\n" * (pre_lines - 1)
+        for i, line in enumerate(self.content_lines(index)):
+            if i == 0 and line:
+                contents += "\n" + indentation + line
+            elif line:
+                contents += "\n" + line
+            else:
+                contents += "\n"
+        return contents
@@ -1,23 +1,33 @@
+import json
+import pickle
 import re
 import time
-from typing import Sequence, List, Optional, Any, Callable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Sequence, List, Optional, Any, Callable
 from hashlib import sha256
 from enum import Enum
 
-from llama_index.core.bridge.pydantic import Field
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
 from llama_index.core.callbacks import CallbackManager
 from llama_index.core.node_parser import NodeParser, TextSplitter, TokenTextSplitter
 from llama_index.core.node_parser.node_utils import logger
 from llama_index.core.schema import BaseNode, TextNode
-from llama_index.core.utils import get_tqdm_iterable, get_tokenizer
+from llama_index.core.utils import get_tqdm_iterable
+from tree_sitter import Tree
 
+from rtfs.moatless.block_tree import BlockTree
 from rtfs.moatless.codeblocks import (
     PathTree,
     CodeBlock,
     CodeBlockType,
+    get_comment_symbol,
 )
 from rtfs.moatless.parser.python import PythonParser
 from rtfs.moatless.settings import CommentStrategy
+from rtfs.cache import ParseCache
+from rtfs.tokens import TokenCounter, TokenCountMode, token_counter, tokenizer_id
+from rtfs.ingest import ParsedFile
 
 
 class CodeNode(TextNode):
@@ -32,17 +42,48 @@ class CodeNode(TextNode):
         return str(sha256(doc_identity.encode("utf-8", "surrogatepass")).hexdigest())
 
 
-CodeBlockChunk = List[CodeBlock]
+# indices of the blocks of a BlockTree
+CodeBlockChunk = List[int]
 
 
-def count_chunk_tokens(chunk: CodeBlockChunk) -> int:
-    return sum([block.tokens for block in chunk])
+class TokenChunk(list):
+    """
+    Block indices carrying the running total of their tokens, so the token
+    count of a chunk is read instead of summed on every check
+    """
 
+    def __init__(self, blocks: BlockTree, indices: Iterable[int] = ()):
+        super().__init__(indices)
+        self.blocks = blocks
+        self.tokens = sum(blocks.tokens[index] for index in self)
 
-def count_parent_tokens(codeblock: CodeBlock) -> int:
-    tokens = codeblock.tokens
-    if codeblock.parent:
-        tokens += codeblock.parent.tokens
+    def append(self, index: int):
+        super().append(index)
+        self.tokens += self.blocks.tokens[index]
+
+    def extend(self, indices: Iterable[int]):
+        if not isinstance(indices, TokenChunk):
+            indices = TokenChunk(self.blocks, indices)
+        super().extend(indices)
+        self.tokens += indices.tokens
+
+    def __add__(self, other: Iterable[int]) -> "TokenChunk":
+        merged = TokenChunk(self.blocks, self)
+        merged.extend(other)
+        return merged
+
+
+def count_chunk_tokens(blocks: BlockTree, chunk: CodeBlockChunk) -> int:
+    if isinstance(chunk, TokenChunk):
+        return chunk.tokens
+    return sum([blocks.tokens[index] for index in chunk])
+
+
+def count_parent_tokens(blocks: BlockTree, index: int) -> int:
+    tokens = blocks.tokens[index]
+    parent = blocks.parent(index)
+    if parent is not None:
+        tokens += blocks.tokens[parent]
     return tokens
 
 
@@ -96,6 +137,19 @@ class EpicSplitter(NodeParser):
         default=None, description="Callback to call when indexing a code block."
     )
 
+    workers: int = Field(
+        default=1,
+        description="Processes used to split documents, ignored with an index callback.",
+    )
+
+    token_count_mode: TokenCountMode = Field(
+        default=TokenCountMode.EXACT,
+        description="How block and chunk tokens are counted.",
+    )
+
+    _tokenizer: Optional[Callable] = PrivateAttr()
+    _token_counter: TokenCounter = PrivateAttr()
+
     # _fallback_code_splitter: Optional[TextSplitter] = PrivateAttr() TODO: Implement fallback when tree sitter fails
 
     def __init__(
@@ -116,6 +170,8 @@ class EpicSplitter(NodeParser):
         tokenizer: Optional[Callable] = None,
         non_code_file_extensions: Optional[List[str]] = ["md", "txt"],
         callback_manager: Optional[CallbackManager] = None,
+        workers: int = 1,
+        token_count_mode: TokenCountMode = TokenCountMode.EXACT,
     ) -> None:
         callback_manager = callback_manager or CallbackManager([])
 
@@ -137,7 +193,11 @@ class EpicSplitter(NodeParser):
             include_metadata=include_metadata,
             include_prev_next_rel=include_prev_next_rel,
             callback_manager=callback_manager,
+            workers=workers,
+            token_count_mode=token_count_mode,
         )
+        self._tokenizer = tokenizer
+        self._token_counter = token_counter(token_count_mode, tokenizer)
 
     @classmethod
     def class_name(cls):
@@ -147,81 +207,222 @@ class EpicSplitter(NodeParser):
         self,
         nodes: Sequence[BaseNode],
         show_progress: bool = False,
+        parsed_files: Optional[Dict[Path, ParsedFile]] = None,
+        cache: Optional[ParseCache] = None,
         **kwargs: Any,
     ) -> List[BaseNode]:
-        nodes_with_progress = get_tqdm_iterable(nodes, show_progress, "Parsing nodes")
-
-        all_nodes: List[BaseNode] = []
+        """
+        parsed_files are the trees produced by the ingestion stage, reused here
+        when they match the document content instead of parsing the file again.
+        If a cache is given, the chunks of unchanged documents are loaded from it.
+        With workers > 1 the documents are split over a process pool, each worker
+        reusing one parser; the chunks come back in document order
+        """
+        documents = list(nodes)
+        parsed_files = parsed_files or {}
+        # the index callback has to see every code block, so nothing is cached
+        # and the documents are split in this process
+        if self.index_callback:
+            cache = None
+        # chunk boundaries depend on the token counts, so the chunks of a
+        # tokenizer that cannot be told apart in the cache key are not cached
+        if tokenizer_id(self._tokenizer) is None:
+            cache = None
+
+        # chunks per document, None for the documents that still need splitting
+        file_nodes: List[Optional[List[BaseNode]]] = [None] * len(documents)
+        cache_keys: Dict[int, str] = {}
+        if cache is not None:
+            for i, node in enumerate(documents):
+                cache_keys[i] = self._cache_key(cache, node, node.get_content())
+                file_nodes[i] = cache.get(cache_keys[i])
+
+        missing = [i for i, chunks in enumerate(file_nodes) if chunks is None]
+        worker_settings = None
+        if self.workers > 1 and not self.index_callback and len(missing) > 1:
+            worker_settings = self._worker_settings()
+
+        if worker_settings is not None:
+            chunksize = max(1, len(missing) // (self.workers * 4))
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_split_worker,
+                initargs=(worker_settings,),
+            ) as executor:
+                # trees cannot be pickled, so workers parse the documents again
+                split = executor.map(
+                    _split_document_worker,
+                    [documents[i] for i in missing],
+                    chunksize=chunksize,
+                )
+                for i, chunks in zip(
+                    missing, get_tqdm_iterable(split, show_progress, "Parsing nodes")
+                ):
+                    file_nodes[i] = chunks
+        else:
+            # parsers reset their state on every parse, so one is enough
+            parser = PythonParser(
+                index_callback=self.index_callback, token_counter=self._token_counter
+            )
+            for i in get_tqdm_iterable(missing, show_progress, "Parsing nodes"):
+                node = documents[i]
+                file_path = node.metadata.get("file_path")
 
-        for node in nodes_with_progress:
-            file_path = node.metadata.get("file_path")
-            content = node.get_content()
+                tree = None
+                parsed_file = (
+                    parsed_files.get(Path(file_path).resolve()) if file_path else None
+                )
+                if parsed_file and parsed_file.src == node.get_content().encode(
+                    "utf-8"
+                ):
+                    tree = parsed_file.tree
 
-            try:
-                # TODO: Derive language from file extension
-                starttime = time.time_ns()
+                file_nodes[i] = self._split_document(parser, node, tree=tree)
 
-                parser = PythonParser(index_callback=self.index_callback)
-                codeblock = parser.parse(content, file_path=file_path)
+        for i in missing:
+            if i in cache_keys and file_nodes[i] is not None:
+                cache.put(cache_keys[i], file_nodes[i])
 
-                parse_time = time.time_ns() - starttime
-                if parse_time > 1e9:
-                    print(
-                        f"Parsing file {file_path} took {parse_time / 1e9:.2f} seconds."
-                    )
+        return [chunk for chunks in file_nodes if chunks for chunk in chunks]
 
-            except Exception as e:
-                logger.error(
-                    f"Failed to use epic splitter to split {file_path}. Fallback to treesitter_split(). Error: {e}",
-                    exc_info=True,
-                )
-                # TODO: Fall back to treesitter or text split
-                continue
+    def _split_document(
+        self, parser: PythonParser, node: BaseNode, tree: Optional[Tree] = None
+    ) -> Optional[List[BaseNode]]:
+        """
+        Parses a document and splits it into chunk nodes, returns None if the
+        document could not be parsed
+        """
+        file_path = node.metadata.get("file_path")
+        content = node.get_content()
 
+        try:
+            # TODO: Derive language from file extension
             starttime = time.time_ns()
-            chunks = self._chunk_contents(codeblock=codeblock, file_path=file_path)
-            parse_time = time.time_ns() - starttime
-            if parse_time > 1e8:
-                print(
-                    f"Splitting file {file_path} took {parse_time / 1e9:.2f} seconds."
-                )
-            if len(chunks) > 100:
-                logger.info(f"Splitting file {file_path} in {len(chunks)} chunks")
 
-            starttime = time.time_ns()
-            for chunk in chunks:
-                path_tree = self._create_path_tree(chunk)
-                content = self._to_context_string(codeblock, path_tree)
-                chunk_node = self._create_node(content, node, chunk=chunk)
-                if chunk_node:
-                    all_nodes.append(chunk_node)
+            # the index callback is given complete CodeBlocks, otherwise only
+            # the lean block tree is built
+            blocks = parser.parse_blocks(
+                content, file_path=file_path, tree=tree, lean=not self.index_callback
+            )
+
             parse_time = time.time_ns() - starttime
             if parse_time > 1e9:
-                print(
-                    f"Create nodes for file {file_path} took {parse_time / 1e9:.2f} seconds."
-                )
-        return all_nodes
+                print(f"Parsing file {file_path} took {parse_time / 1e9:.2f} seconds.")
+
+        except Exception as e:
+            logger.error(
+                f"Failed to use epic splitter to split {file_path}. Fallback to treesitter_split(). Error: {e}",
+                exc_info=True,
+            )
+            # TODO: Fall back to treesitter or text split
+            return None
+
+        starttime = time.time_ns()
+        chunks = self._chunk_contents(blocks, file_path=file_path)
+        parse_time = time.time_ns() - starttime
+        if parse_time > 1e8:
+            print(f"Splitting file {file_path} took {parse_time / 1e9:.2f} seconds.")
+        if len(chunks) > 100:
+            logger.info(f"Splitting file {file_path} in {len(chunks)} chunks")
+
+        starttime = time.time_ns()
+        file_nodes = []
+        for chunk in chunks:
+            path_tree = self._create_path_tree(blocks, chunk)
+            content = self._to_context_string(blocks, 0, path_tree)
+            chunk_node = self._create_node(content, node, blocks, chunk=chunk)
+            if chunk_node:
+                file_nodes.append(chunk_node)
+
+        parse_time = time.time_ns() - starttime
+        if parse_time > 1e9:
+            print(
+                f"Create nodes for file {file_path} took {parse_time / 1e9:.2f} seconds."
+            )
+        return file_nodes
+
+    def _worker_settings(self) -> Optional[Dict[str, Any]]:
+        """
+        Constructor arguments for the copies of the splitter in pool workers, or
+        None if they cannot be sent to other processes, ie. the tokenizer cannot
+        be pickled, in which case the documents are split in this process
+        """
+        try:
+            pickle.dumps(self._tokenizer)
+        except Exception as e:
+            logger.debug(f"Splitting in one process, cannot pickle tokenizer: {e}")
+            return None
+
+        return {
+            "chunk_size": self.chunk_size,
+            "min_chunk_size": self.min_chunk_size,
+            "max_chunk_size": self.max_chunk_size,
+            "hard_token_limit": self.hard_token_limit,
+            "max_chunks": self.max_chunks,
+            "include_metadata": self.include_metadata,
+            "include_prev_next_rel": self.include_prev_next_rel,
+            "repo_path": self.repo_path,
+            "comment_strategy": self.comment_strategy,
+            "include_non_code_files": self.include_non_code_files,
+            "non_code_file_extensions": self.non_code_file_extensions,
+            "token_count_mode": self.token_count_mode,
+            "tokenizer": self._tokenizer,
+        }
+
+    def _cache_key(self, cache: ParseCache, node: BaseNode, content: str) -> str:
+        """
+        The chunks of a document depend on its content, its id and metadata (which
+        are copied into the chunks) and the splitter settings
+        """
+        document = json.dumps(
+            [
+                node.id_,
+                node.metadata,
+                node.excluded_embed_metadata_keys,
+                node.excluded_llm_metadata_keys,
+                node.metadata_seperator,
+                node.metadata_template,
+                node.text_template,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        settings = json.dumps(
+            [
+                self.chunk_size,
+                self.min_chunk_size,
+                self.max_chunk_size,
+                self.hard_token_limit,
+                self.max_chunks,
+                self.comment_strategy,
+                self.token_count_mode,
+                tokenizer_id(self._tokenizer),
+            ],
+            default=str,
+        )
+        return cache.key("chunks", content.encode("utf-8"), document, settings)
 
     def _chunk_contents(
-        self, codeblock: Optional[CodeBlock] = None, file_path: Optional[str] = None
+        self, blocks: BlockTree, file_path: Optional[str] = None
     ) -> List[CodeBlockChunk]:
-        tokens = codeblock.sum_tokens()
+        tokens = blocks.sum_tokens(0)
         if tokens == 0:
             logger.debug(f"Skipping file {file_path} because it has no tokens.")
             return []
 
-        if codeblock.find_errors():
+        errors = blocks.find_errors()
+        if errors:
             print(
-                f"Failed to use spic splitter to split {file_path}. {len(codeblock.find_errors())} codeblocks with type ERROR. Fallback to treesitter_split()"
+                f"Failed to use spic splitter to split {file_path}. {len(errors)} codeblocks with type ERROR. Fallback to treesitter_split()"
             )
             # TODO: Fall back to treesitter or text split
             return []
 
         if tokens > self.hard_token_limit:
-            for child in codeblock.children:
+            for child in blocks.children(0):
                 if (
-                    child.type == CodeBlockType.COMMENT
-                    and "generated" in child.content.lower()
+                    blocks.types[child] == CodeBlockType.COMMENT
+                    and "generated" in blocks.content(child).lower()
                 ):  # TODO: Make a generic solution to detect files that shouldn't be indexed. Maybe ask an LLM?
                     logger.info(
                         f"File {file_path} has {tokens} tokens and the word 'generated' in the first comments,"
@@ -232,42 +433,48 @@ class EpicSplitter(NodeParser):
                     break
 
         if tokens < self.min_chunk_size:
-            child_blocks = codeblock.get_all_child_blocks()
-            return [[codeblock] + child_blocks]
+            return [TokenChunk(blocks, range(blocks.ends[0]))]
 
-        return self._chunk_block(codeblock, file_path)
+        return self._chunk_block(blocks, 0, file_path)
 
     # TODO: attempt rewrite
     # get start and end line from codeblock
     def _chunk_block(
-        self, codeblock: CodeBlock, file_path: Optional[str] = None
-    ) -> list[CodeBlockChunk]:
-        chunks: List[CodeBlockChunk] = []
-        current_chunk = []
-        comment_chunk = []
-
-        parent_tokens = count_parent_tokens(codeblock)
+        self,
+        blocks: BlockTree,
+        codeblock: int,
+        file_path: Optional[str] = None,
+    ) -> list[TokenChunk]:
+        """
+        Chunks the children of the block at index codeblock
+        """
+        chunks: List[TokenChunk] = []
+        current_chunk = TokenChunk(blocks)
+        comment_chunk = TokenChunk(blocks)
+
+        parent_tokens = count_parent_tokens(blocks, codeblock)
+        is_root = blocks.parent(codeblock) is None
+        split_block = blocks.types[codeblock] in SPLIT_BLOCK_TYPES
 
         ignoring_comment = False
 
-        for child in codeblock.children:
-            if child.type == CodeBlockType.COMMENT:
+        for child in blocks.children(codeblock):
+            child_type = blocks.types[child]
+            child_tokens = blocks.tokens[child]
+            if child_type == CodeBlockType.COMMENT:
                 if self.comment_strategy == CommentStrategy.EXCLUDE:
                     continue
-                elif self._ignore_comment(child) or ignoring_comment:
+                elif self._ignore_comment(blocks, child) or ignoring_comment:
                     ignoring_comment = True
                     continue
-                elif (
-                    self.comment_strategy == CommentStrategy.ASSOCIATE
-                    and not codeblock.parent
-                ):
+                elif self.comment_strategy == CommentStrategy.ASSOCIATE and is_root:
                     comment_chunk.append(child)
                     continue
             else:
-                if child.tokens > self.max_chunk_size:
-                    start_content = child.content[:100]
+                if child_tokens > self.max_chunk_size:
+                    start_content = blocks.content(child)[:100]
                     print(
-                        f"Skipping code block {child.path_string()} in {file_path} as it has {child.tokens} tokens which is"
+                        f"Skipping code block {blocks.path_string(child)} in {file_path} as it has {child_tokens} tokens which is"
                         f" more than chunk size {self.chunk_size}. Content: {start_content}..."
                     )
                     continue
@@ -282,44 +489,42 @@ class EpicSplitter(NodeParser):
                 #   CodeBlockType.TEST_CASE,
                 #   CodeBlockType.MODULE,
                 # ]
-                child.type in SPLIT_BLOCK_TYPES
-                and child.sum_tokens() > self.min_chunk_size
-            ) or parent_tokens + child.sum_tokens() > self.max_chunk_size:
+                child_type in SPLIT_BLOCK_TYPES
+                and blocks.sum_tokens(child) > self.min_chunk_size
+            ) or parent_tokens + blocks.sum_tokens(child) > self.max_chunk_size:
                 if current_chunk:
                     chunks.append(current_chunk)
-                    current_chunk = []
+                    current_chunk = TokenChunk(blocks)
 
                 current_chunk.extend(comment_chunk)
-                comment_chunk = []
+                comment_chunk = TokenChunk(blocks)
                 current_chunk.append(child)
 
-                child_chunks = self._chunk_block(child, file_path=file_path)
+                child_chunks = self._chunk_block(blocks, child, file_path=file_path)
 
                 if child_chunks:
                     first_child_chunk = child_chunks[0]
 
                     if (
-                        parent_tokens
-                        + child.tokens
-                        + count_chunk_tokens(first_child_chunk)
+                        parent_tokens + child_tokens + first_child_chunk.tokens
                         < self.max_chunk_size
                     ):
                         current_chunk.extend(first_child_chunk)
                         chunks.append(current_chunk)
                         chunks.extend(child_chunks[1:])
-                        current_chunk = []
+                        current_chunk = TokenChunk(blocks)
                     else:
                         chunks.append(current_chunk)
                         chunks.extend(child_chunks)
-                        current_chunk = []
+                        current_chunk = TokenChunk(blocks)
 
                 continue
 
             new_token_count = (
-                parent_tokens + count_chunk_tokens(current_chunk) + child.sum_tokens()
+                parent_tokens + current_chunk.tokens + blocks.sum_tokens(child)
             )
             if (
-                codeblock.type not in SPLIT_BLOCK_TYPES
+                not split_block
                 and new_token_count < self.max_chunk_size
                 or new_token_count < self.chunk_size
             ):
@@ -330,35 +535,33 @@ class EpicSplitter(NodeParser):
                 if current_chunk:
                     current_chunk.extend(comment_chunk)
                     chunks.append(current_chunk)
-                current_chunk = [child]
+                current_chunk = TokenChunk(blocks, [child])
 
-            comment_chunk = []
-            child_blocks = child.get_all_child_blocks()
-            current_chunk.extend(child_blocks)
+            comment_chunk = TokenChunk(blocks)
+            current_chunk.extend(blocks.descendants(child))
 
-        if chunks and count_chunk_tokens(current_chunk) < self.min_chunk_size:
+        if chunks and current_chunk.tokens < self.min_chunk_size:
             chunks[-1].extend(current_chunk)
         else:
             chunks.append(current_chunk)
 
         return self._merge_chunks(chunks)
 
-    def _merge_chunks(self, chunks: List[CodeBlockChunk]) -> List[CodeBlockChunk]:
+    def _merge_chunks(self, chunks: List[TokenChunk]) -> List[TokenChunk]:
+        """
+        Merges chunks below min_chunk_size into their smaller neighbour. Each pass
+        is linear since chunks carry their token counts; passes only repeat while
+        there are more than max_chunks chunks
+        """
         while True:
             merged_chunks = []
             should_continue = False
 
             for i, chunk in enumerate(chunks):
-                if (
-                    count_chunk_tokens(chunk) < self.min_chunk_size
-                    or len(chunks) > self.max_chunks
-                ):
+                if chunk.tokens < self.min_chunk_size or len(chunks) > self.max_chunks:
 
                     if i == 0 and len(chunks) > 1:
-                        if (
-                            count_chunk_tokens(chunks[1]) + count_chunk_tokens(chunk)
-                            <= self.hard_token_limit
-                        ):
+                        if chunks[1].tokens + chunk.tokens <= self.hard_token_limit:
                             chunks[1] = chunk + chunks[1]
                             should_continue = True
                         else:
@@ -367,8 +570,7 @@ class EpicSplitter(NodeParser):
                     elif i == len(chunks) - 1:
                         if (
                             merged_chunks
-                            and count_chunk_tokens(merged_chunks[-1])
-                            + count_chunk_tokens(chunk)
+                            and merged_chunks[-1].tokens + chunk.tokens
                             <= self.hard_token_limit
                         ):
                             merged_chunks[-1] = merged_chunks[-1] + chunk
@@ -377,13 +579,10 @@ class EpicSplitter(NodeParser):
                             merged_chunks.append(chunk)
 
                     else:
-                        if count_chunk_tokens(chunks[i - 1]) < count_chunk_tokens(
-                            chunks[i + 1]
-                        ):
+                        if chunks[i - 1].tokens < chunks[i + 1].tokens:
                             if (
                                 merged_chunks
-                                and count_chunk_tokens(merged_chunks[-1])
-                                + count_chunk_tokens(chunk)
+                                and merged_chunks[-1].tokens + chunk.tokens
                                 <= self.hard_token_limit
                             ):
                                 merged_chunks[-1] = merged_chunks[-1] + chunk
@@ -392,8 +591,7 @@ class EpicSplitter(NodeParser):
                                 merged_chunks.append(chunk)
                         else:
                             if (
-                                count_chunk_tokens(chunks[i + 1])
-                                + count_chunk_tokens(chunk)
+                                chunks[i + 1].tokens + chunk.tokens
                                 <= self.hard_token_limit
                             ):
                                 chunks[i + 1] = chunk + chunks[i + 1]
@@ -410,70 +608,59 @@ class EpicSplitter(NodeParser):
 
         return chunks
 
-    def _create_path_tree(cls, blocks: List[CodeBlock]) -> PathTree:
+    def _create_path_tree(cls, blocks: BlockTree, chunk: CodeBlockChunk) -> PathTree:
         path_tree = PathTree()
-        for block in blocks:
-            path_tree.add_to_tree(block.full_path())
+        for index in chunk:
+            path_tree.add_to_tree(blocks.full_path(index))
         return path_tree
 
-    def _ignore_comment(self, codeblock: CodeBlock) -> bool:
-        return (
-            re.search(r"(?i)copyright|license|author", codeblock.content)
-            or not codeblock.content
-        )
+    def _ignore_comment(self, blocks: BlockTree, index: int) -> bool:
+        content = blocks.content(index)
+        return re.search(r"(?i)copyright|license|author", content) or not content
 
-    def _to_context_string(self, codeblock: CodeBlock, path_tree: PathTree) -> str:
-        contents = ""
+    def _commented_out_string(self, blocks: BlockTree, index: int) -> str:
+        # create_commented_out_block("... other code").to_string() of the block
+        symbol = get_comment_symbol("python")  # FIXME: Derive language from Module
+        return f"\n{blocks.indentation(index)}{symbol} ... other code"
 
-        if codeblock.pre_lines:
-            contents += "\n" * (codeblock.pre_lines - 1)
-            for i, line in enumerate(codeblock.content_lines):
-                if i == 0 and line:
-                    contents += "\n" + codeblock.indentation + line
-                elif line:
-                    contents += "\n" + line
-                else:
-                    contents += "\n"
-        else:
-            contents += codeblock.pre_code + codeblock.content
+    def _to_context_string(
+        self, blocks: BlockTree, codeblock: int, path_tree: PathTree
+    ) -> str:
+        contents = blocks.block_string(codeblock)
+        block_type = blocks.types[codeblock]
 
         has_outcommented_code = False
-        for i, child in enumerate(codeblock.children):
-            child_tree = path_tree.child_tree(child.identifier)
+        for child in blocks.children(codeblock):
+            child_type = blocks.types[child]
+            child_tree = path_tree.child_tree(blocks.identifiers[child])
             if child_tree and child_tree.show:
-                if has_outcommented_code and child.type not in [
+                if has_outcommented_code and child_type not in [
                     CodeBlockType.COMMENT,
                     CodeBlockType.COMMENTED_OUT_CODE,
                 ]:
-                    if codeblock.type not in [
+                    if block_type not in [
                         CodeBlockType.CLASS,
                         CodeBlockType.MODULE,
                         CodeBlockType.TEST_SUITE,
                     ]:
-                        contents += child.create_commented_out_block(
-                            "... other code"
-                        ).to_string()
-                contents += self._to_context_string(
-                    codeblock=child, path_tree=child_tree
-                )
+                        contents += self._commented_out_string(blocks, child)
+                contents += self._to_context_string(blocks, child, child_tree)
                 has_outcommented_code = False
             elif child_tree:
-                contents += self._to_context_string(
-                    codeblock=child, path_tree=child_tree
-                )
+                contents += self._to_context_string(blocks, child, child_tree)
                 has_outcommented_code = False
-            elif child.type not in [
+            elif child_type not in [
                 CodeBlockType.COMMENT,
                 CodeBlockType.COMMENTED_OUT_CODE,
             ]:
                 has_outcommented_code = True
 
-        if has_outcommented_code and codeblock.type not in [
+        if has_outcommented_code and block_type not in [
             CodeBlockType.CLASS,
             CodeBlockType.MODULE,
             CodeBlockType.TEST_SUITE,
         ]:
-            contents += child.create_commented_out_block("... other code").to_string()
+            contents += self._commented_out_string(blocks, child)
 
         return contents
 
@@ -485,7 +672,11 @@ class EpicSplitter(NodeParser):
         ]
 
     def _create_node(
-        self, content: str, node: BaseNode, chunk: Optional[CodeBlockChunk] = None
+        self,
+        content: str,
+        node: BaseNode,
+        blocks: Optional[BlockTree] = None,
+        chunk: Optional[CodeBlockChunk] = None,
     ) -> Optional[TextNode]:
         metadata = {}
         metadata.update(node.metadata)
@@ -493,25 +684,22 @@ class EpicSplitter(NodeParser):
         node_id = node.id_
 
         if chunk:
-            metadata["start_line"] = chunk[0].start_line
-            metadata["end_line"] = chunk[-1].end_line
+            metadata["start_line"] = blocks.start_lines[chunk[0]]
+            metadata["end_line"] = blocks.end_lines[chunk[-1]]
 
             # TODO: Change this when EpicSplitter is adjusted to use the span concept natively
             span_ids = set(
-                [
-                    block.belongs_to_span.span_id
-                    for block in chunk
-                    if block.belongs_to_span
-                ]
+                [blocks.span_ids[index] for index in chunk if blocks.span_ids[index]]
             )
             metadata["span_ids"] = list(span_ids)
 
-            node_id += f"_{chunk[0].path_string()}_{chunk[-1].path_string()}"
+            first_path = blocks.path_string(chunk[0])
+            last_path = blocks.path_string(chunk[-1])
+            node_id += f"_{first_path}_{last_path}"
 
         content = content.strip("\n")
 
-        tokens = get_tokenizer()(content)
-        metadata["tokens"] = len(tokens)
+        metadata["tokens"] = self._token_counter(content)
 
         excluded_embed_metadata_keys = node.excluded_embed_metadata_keys.copy()
         excluded_embed_metadata_keys.extend(["start_line", "end_line", "tokens"])
@@ -529,5 +717,19 @@ class EpicSplitter(NodeParser):
         )
 
     def _count_tokens(self, text: str):
-        tokenizer = get_tokenizer()
-        return len(tokenizer(text))
+        return self._token_counter(text)
+
+
+# per-process splitter and parser used by the splitter pool
+_split_worker: Optional[EpicSplitter] = None
+_split_parser: Optional[PythonParser] = None
+
+
+def _init_split_worker(settings: Dict[str, Any]):
+    global _split_worker, _split_parser
+    _split_worker = EpicSplitter(**settings)
+    _split_parser = PythonParser(token_counter=_split_worker._token_counter)
+
+
+def _split_document_worker(node: BaseNode) -> Optional[List[BaseNode]]:
+    return _split_worker._split_document(_split_parser, node)
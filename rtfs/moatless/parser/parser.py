@@ -2,12 +2,13 @@ import logging
 import re
 from dataclasses import dataclass, field
 from importlib import resources
-from typing import List, Tuple, Optional, Callable
+from typing import Dict, List, Tuple, Optional, Callable
 
 import networkx as nx
 from llama_index.core import get_tokenizer
-from tree_sitter import Node, Language, Parser
+from tree_sitter import Node, Language, Parser, Query, Tree
 
+from rtfs.moatless.block_tree import BlockTree
 from rtfs.moatless.codeblocks import (
     CodeBlock,
     CodeBlockType,
@@ -28,6 +29,9 @@ module_types = ["program", "module"]
 
 logger = logging.getLogger(__name__)
 
+# (language, query_file) -> compiled queries
+_QUERY_CACHE: Dict[Tuple[str, str], List[Tuple[str, str, Query]]] = {}
+
 
 @dataclass
 class NodeMatch:
@@ -77,6 +81,7 @@ class CodeParser:
         min_tokens_for_docs_span: int = 100,
         index_callback: Optional[Callable[[CodeBlock], None]] = None,
         tokenizer: Optional[Callable[[str], List]] = None,
+        token_counter: Optional[Callable[[str], int]] = None,
         apply_gpt_tweaks: bool = False,
         debug: bool = False,
     ):
@@ -93,6 +98,10 @@ class CodeParser:
         self.encoding = encoding
         self.gpt_queries = []
         self.queries = []
+        # node type -> queries that can match it, built lazily from the queries
+        # above, which are fixed once the parser is constructed
+        self._queries_by_type: Dict[str, List[Tuple[str, str, Query]]] = {}
+        self._gpt_queries_by_type: Dict[str, List[Tuple[str, str, Query]]] = {}
 
         # TODO: How to handle these in a thread safe way?
         self.spans_by_id = {}
@@ -103,7 +112,14 @@ class CodeParser:
         # TODO: Move this to CodeGraph
         self._graph = None
 
+        # set while parse_blocks() runs, see there
+        self._blocks: Optional[BlockTree] = None
+        self._block_indices: Dict[int, int] = {}
+        self._lean = False
+
         self.tokenizer = tokenizer or get_tokenizer()
+        # counts block tokens instead of the tokenizer when given
+        self.token_counter = token_counter
         self._max_tokens_in_span = max_tokens_in_span
         self._min_tokens_for_docs_span = min_tokens_for_docs_span
 
@@ -120,6 +136,13 @@ class CodeParser:
             return None
 
     def _build_queries(self, query_file: str):
+        # compiled queries are immutable, so they are shared by every parser
+        # instance of the same language instead of being recompiled each time
+        cache_key = (self.language, query_file)
+        cached = _QUERY_CACHE.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
         with resources.open_text("rtfs.moatless.parser.queries", query_file) as file:
             query_list = file.read().strip().split("\n\n")
             parsed_queries = []
@@ -136,7 +159,9 @@ class CodeParser:
                 except Exception as e:
                     logging.error(f"Could not parse query {query}:{i+1}")
                     raise e
-            return parsed_queries
+
+            _QUERY_CACHE[cache_key] = parsed_queries
+            return list(parsed_queries)
 
     def parse_code(
         self,
@@ -152,7 +177,8 @@ class CodeParser:
             child.type == "ERROR" for child in node.children
         ):
             node_match = NodeMatch(block_type=CodeBlockType.ERROR)
-            self.debug_log(f"Found error node {node.type}")
+            if self.debug:
+                self.debug_log(f"Found error node {node.type}")
         else:
             node_match = self.find_in_tree(node)
 
@@ -173,17 +199,24 @@ class CodeParser:
         else:
             identifier = None
 
-        relationships = self.create_references(
-            code, content_bytes, identifier, node_match
-        )
-        parameters = self.create_parameters(content_bytes, node_match, relationships)
+        if self._lean:
+            relationships = []
+            parameters = []
+        else:
+            relationships = self.create_references(
+                code, content_bytes, identifier, node_match
+            )
+            parameters = self.create_parameters(
+                content_bytes, node_match, relationships
+            )
 
         if parent_block:
             code_block = CodeBlock(
                 type=node_match.block_type,
                 identifier=identifier,
                 parent=parent_block,
-                previous=self._previous_block,
+                # lean blocks are not linked, so parsed blocks can be released
+                previous=None if self._lean else self._previous_block,
                 parameters=parameters,
                 relationships=relationships,
                 span_ids=set(),
@@ -200,7 +233,8 @@ class CodeParser:
                 },
             )
 
-            self._previous_block.next = code_block
+            if not self._lean:
+                self._previous_block.next = code_block
             self._previous_block = code_block
 
             self.pre_process(code_block, node_match)
@@ -226,6 +260,10 @@ class CodeParser:
             else:
                 code_block.identifier = identifier
 
+            block_index = self._add_block(
+                code_block, parent_block, start_byte, node.start_byte, end_byte
+            )
+
             if (
                 code_block.type == CodeBlockType.COMMENT
                 and current_span
@@ -258,12 +296,13 @@ class CodeParser:
 
                 self.comments_with_no_span = []
 
-            self._graph.add_node(code_block.path_string(), block=code_block)
+            if self._graph is not None:
+                self._graph.add_node(code_block.path_string(), block=code_block)
 
-            for relationship in relationships:
-                self._graph.add_edge(
-                    code_block.path_string(), ".".join(relationship.path)
-                )
+                for relationship in relationships:
+                    self._graph.add_edge(
+                        code_block.path_string(), ".".join(relationship.path)
+                    )
 
         else:
             current_span = None
@@ -283,11 +322,13 @@ class CodeParser:
                 },
             )
             self._previous_block = code_block
+            block_index = self._add_block(code_block, None, 0, 0, 0)
 
         next_node = node_match.first_child
 
-        self.debug_log(
-            f"""Created code block
+        if self.debug:
+            self.debug_log(
+                f"""Created code block
     content: {code_block.content[:50]} 
     block_type: {code_block.type} 
     node_type: {node.type}
@@ -297,7 +338,7 @@ class CodeParser:
     start_byte: {start_byte}
     node.start_byte: {node.start_byte}
     node.end_byte: {node.end_byte}"""
-        )
+            )
 
         index = 0
 
@@ -307,9 +348,10 @@ class CodeParser:
             ):  # TODO: This should be handled in get_block_definition
                 next_node = next_node.children[0]
 
-            self.debug_log(
-                f"next  [{level}]: -> {next_node.type} - {next_node.start_byte}"
-            )
+            if self.debug:
+                self.debug_log(
+                    f"next  [{level}]: -> {next_node.type} - {next_node.start_byte}"
+                )
 
             child_block, child_last_node, child_span = self.parse_code(
                 content_bytes,
@@ -328,19 +370,23 @@ class CodeParser:
             index += 1
 
             if child_last_node:
-                self.debug_log(f"next  [{level}]: child_last_node -> {child_last_node}")
+                if self.debug:
+                    self.debug_log(
+                        f"next  [{level}]: child_last_node -> {child_last_node}"
+                    )
                 next_node = child_last_node
 
             end_byte = next_node.end_byte
 
-            self.debug_log(
-                f"""next  [{level}]
+            if self.debug:
+                self.debug_log(
+                    f"""next  [{level}]
     last_child -> {node_match.last_child}
     next_node -> {next_node}
     next_node.next_sibling -> {next_node.next_sibling}
     end_byte -> {end_byte}
 """
-            )
+                )
             if next_node == node_match.last_child:
                 break
             elif next_node.next_sibling:
@@ -354,7 +400,8 @@ class CodeParser:
                 else:
                     next_node = next_parent_node
 
-        self.debug_log(f"end   [{level}]: {code_block.content}")
+        if self.debug:
+            self.debug_log(f"end   [{level}]: {code_block.content}")
 
         for comment_block in self.comments_with_no_span:
             comment_block.belongs_to_span = current_span
@@ -380,6 +427,14 @@ class CodeParser:
                 content="",
             )
             code_block.append_child(space_block)
+            self._close_block(
+                space_block,
+                self._add_block(
+                    space_block, code_block, end_byte, node.end_byte, node.end_byte
+                ),
+            )
+
+        self._close_block(code_block, block_index)
 
         return code_block, next_node, current_span
 
@@ -393,32 +448,54 @@ class CodeParser:
         if self.apply_gpt_tweaks:
             match = self.find_match_with_gpt_tweaks(node)
             if match:
-                self.debug_log(
-                    f"find_in_tree() GPT match: {match.block_type} on {node}"
-                )
+                if self.debug:
+                    self.debug_log(
+                        f"find_in_tree() GPT match: {match.block_type} on {node}"
+                    )
                 return match
 
         match = self.find_match(node)
         if match:
-            self.debug_log(
-                f"find_in_tree() Found match on node type {node.type} with block type {match.block_type}"
-            )
+            if self.debug:
+                self.debug_log(
+                    f"find_in_tree() Found match on node type {node.type} with block type {match.block_type}"
+                )
             return match
         else:
-            self.debug_log(
-                f"find_in_tree() Found no match on node type {node.type} set block type {CodeBlockType.CODE}"
-            )
+            if self.debug:
+                self.debug_log(
+                    f"find_in_tree() Found no match on node type {node.type} set block type {CodeBlockType.CODE}"
+                )
             return NodeMatch(block_type=CodeBlockType.CODE)
 
+    def _queries_for(
+        self, node_type: str, gpt_queries: bool = False
+    ) -> List[Tuple[str, str, Query]]:
+        """
+        The queries to try on a node of node_type, in query order: those whose
+        first pattern has that type, plus the "_" and untyped ones
+        """
+        table = self._gpt_queries_by_type if gpt_queries else self._queries_by_type
+        queries = table.get(node_type)
+        if queries is None:
+            queries = [
+                (label, query_type, query)
+                for label, query_type, query in (
+                    self.gpt_queries if gpt_queries else self.queries
+                )
+                if not query_type or query_type == node_type or query_type == "_"
+            ]
+            table[node_type] = queries
+        return queries
+
     def find_match_with_gpt_tweaks(self, node: Node) -> Optional[NodeMatch]:
-        for label, node_type, query in self.gpt_queries:
-            if node_type and node.type != node_type and node_type != "_":
-                continue
+        for label, node_type, query in self._queries_for(node.type, gpt_queries=True):
             match = self._find_match(node, query, label, capture_from_parent=True)
             if match:
-                self.debug_log(
-                    f"find_match_with_gpt_tweaks() Found match on node {node.type} with query {label}"
-                )
+                if self.debug:
+                    self.debug_log(
+                        f"find_match_with_gpt_tweaks() Found match on node {node.type} with query {label}"
+                    )
                 if not match.query:
                     match.query = label
                 return match
@@ -426,15 +503,15 @@ class CodeParser:
         return None
 
     def find_match(self, node: Node) -> Optional[NodeMatch]:
-        self.debug_log(f"find_match() node type {node.type}")
-        for label, node_type, query in self.queries:
-            if node_type and node.type != node_type and node_type != "_":
-                continue
+        if self.debug:
+            self.debug_log(f"find_match() node type {node.type}")
+        for label, node_type, query in self._queries_for(node.type):
             match = self._find_match(node, query, label)
             if match:
-                self.debug_log(
-                    f"find_match() Found match on node {node.type} with query {label}"
-                )
+                if self.debug:
+                    self.debug_log(
+                        f"find_match() Found match on node {node.type} with query {label}"
+                    )
                 if not match.query:
                     match.query = label
                 return match
@@ -455,41 +532,52 @@ class CodeParser:
             return None
 
         root_node = None
+        start_byte = node.start_byte
 
         for found_node, tag in captures:
-            self.debug_log(f"[{label}] Found tag {tag} on node {found_node}")
+            if self.debug:
+                self.debug_log(f"[{label}] Found tag {tag} on node {found_node}")
 
             if tag == "root" and not root_node and node == found_node:
-                self.debug_log(f"[{label}] Root node {found_node}")
+                if self.debug:
+                    self.debug_log(f"[{label}] Root node {found_node}")
                 root_node = found_node
 
             if not root_node:
+                # captures come in document order, so once they are past the
+                # start of node none of them can be its root
+                if found_node.start_byte > start_byte:
+                    return None
                 continue
 
             if tag == "no_children" and found_node.children:
                 return None
 
             if tag == "check_child":
-                self.debug_log(f"[{label}] Check child {found_node}")
+                if self.debug:
+                    self.debug_log(f"[{label}] Check child {found_node}")
                 node_match = self.find_match(found_node)
                 if node_match:
                     node_match.check_child = found_node
                 return node_match
 
             if tag == "parse_child":
-                self.debug_log(f"[{label}] Parse child {found_node}")
+                if self.debug:
+                    self.debug_log(f"[{label}] Parse child {found_node}")
 
                 child_match = self.find_match(found_node)
                 if child_match:
                     if child_match.relationships:
-                        self.debug_log(
-                            f"[{label}] Found {len(child_match.relationships)} references on child {found_node}"
-                        )
+                        if self.debug:
+                            self.debug_log(
+                                f"[{label}] Found {len(child_match.relationships)} references on child {found_node}"
+                            )
                         node_match.relationships = child_match.relationships
                     if child_match.parameters:
-                        self.debug_log(
-                            f"[{label}] Found {len(child_match.parameters)} parameters on child {found_node}"
-                        )
+                        if self.debug:
+                            self.debug_log(
+                                f"[{label}] Found {len(child_match.parameters)} parameters on child {found_node}"
+                            )
                         node_match.parameters.extend(child_match.parameters)
                     if child_match.first_child:
                         node_match.first_child = child_match.first_child
@@ -516,9 +604,10 @@ class CodeParser:
                 node_match.block_type = CodeBlockType.from_string(tag)
 
         if node_match.block_type:
-            self.debug_log(
-                f"[{label}] Return match with type {node_match.block_type} for node {node}"
-            )
+            if self.debug:
+                self.debug_log(
+                    f"[{label}] Return match with type {node_match.block_type} for node {node}"
+                )
             return node_match
 
         return None
@@ -630,6 +719,32 @@ class CodeParser:
                 references.append(reference)
         return parameters
 
+    def _add_block(
+        self,
+        code_block: CodeBlock,
+        parent_block: Optional[CodeBlock],
+        pre_start: int,
+        start: int,
+        stop: int,
+    ) -> Optional[int]:
+        if self._blocks is None:
+            return None
+
+        parent = self._block_indices[id(parent_block)] if parent_block else -1
+        index = self._blocks.add(code_block, parent, pre_start, start, stop)
+        self._block_indices[id(code_block)] = index
+        return index
+
+    def _close_block(self, code_block: CodeBlock, index: Optional[int]):
+        if index is None:
+            return
+
+        self._blocks.close(index, code_block)
+        del self._block_indices[id(code_block)]
+        if self._lean:
+            # the children are in the block tree, which is all that is kept
+            code_block.children = []
+
     def add_to_index(self, codeblock: CodeBlock):
         if self.index_callback:
             self.index_callback(codeblock)
@@ -651,12 +766,14 @@ class CodeParser:
             return node.start_byte
 
     def get_parent_next(self, node: Node, orig_node: Node):
-        self.debug_log(f"get_parent_next: {node.type} - {orig_node.type}")
+        if self.debug:
+            self.debug_log(f"get_parent_next: {node.type} - {orig_node.type}")
         if node != orig_node:
             if node.next_sibling:
-                self.debug_log(
-                    f"get_parent_next: node.next_sibling -> {node.next_sibling}"
-                )
+                if self.debug:
+                    self.debug_log(
+                        f"get_parent_next: node.next_sibling -> {node.next_sibling}"
+                    )
                 return node.next_sibling
             else:
                 return self.get_parent_next(node.parent, orig_node)
@@ -669,22 +786,36 @@ class CodeParser:
             return any(self.has_error(child) for child in node.children)
         return False
 
-    def parse(self, content, file_path: Optional[str] = None) -> Module:
+    def _content_bytes(self, content) -> bytes:
         if isinstance(content, str):
-            content_in_bytes = bytes(content, self.encoding)
+            return bytes(content, self.encoding)
         elif isinstance(content, bytes):
-            content_in_bytes = content
+            return content
         else:
             raise ValueError("Content must be either a string or bytes")
 
+    def _reset(self):
         # TODO: make thread safe?
+        # parsers are reused across files, so all per file state is reset
         self.spans_by_id = {}
+        self.comments_with_no_span = []
         self._span_counter = {}
+        self._previous_block = None
+        self._graph = None
 
+    def parse(
+        self, content, file_path: Optional[str] = None, tree: Optional[Tree] = None
+    ) -> Module:
+        content_in_bytes = self._content_bytes(content)
+
+        self._reset()
         # TODO: Should me moved to a central CodeGraph
-        self._graph = nx.DiGraph()
+        if not self._lean:
+            self._graph = nx.DiGraph()
 
-        tree = self.tree_parser.parse(content_in_bytes)
+        # callers that already parsed the file can hand over the tree
+        if tree is None:
+            tree = self._get_tree_parser().parse(content_in_bytes)
         module, _, _ = self.parse_code(
             content_in_bytes, tree.walk().node, file_path=file_path
         )
@@ -694,6 +825,35 @@ class CodeParser:
         module._graph = self._graph
         return module
 
+    def parse_blocks(
+        self,
+        content,
+        file_path: Optional[str] = None,
+        tree: Optional[Tree] = None,
+        lean: bool = True,
+    ) -> BlockTree:
+        """
+        Parses content into a BlockTree. With lean, the CodeBlocks of a subtree
+        are released as soon as it is parsed and relationships, parameters and
+        the block graph are not built, so only the blocks along the current path
+        are held in memory. Without it, the CodeBlocks are complete when passed
+        to the index callback
+        """
+        content_in_bytes = self._content_bytes(content)
+        self._blocks = BlockTree(content_in_bytes, file_path, self.encoding)
+        self._lean = lean
+        try:
+            self.parse(content_in_bytes, file_path=file_path, tree=tree)
+            return self._blocks
+        finally:
+            self._blocks = None
+            self._block_indices = {}
+            self._lean = False
+            self._reset()
+
+    def _get_tree_parser(self) -> Parser:
+        return self.tree_parser
+
     def get_content(self, node: Node, content_bytes: bytes) -> str:
         return content_bytes[node.start_byte : node.end_byte].decode(self.encoding)
 
@@ -854,6 +1014,8 @@ class CodeParser:
         return span_id
 
     def _count_tokens(self, content: str):
+        if self.token_counter:
+            return self.token_counter(content)
         if not self.tokenizer:
             return 0
         return len(self.tokenizer(content))
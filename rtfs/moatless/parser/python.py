@@ -1,8 +1,8 @@
 import logging
 
-import tree_sitter_python as tspython
-from tree_sitter import Language
+from tree_sitter import Parser
 
+from rtfs.languages import PythonParse
 
 from rtfs.moatless.codeblocks import (
     CodeBlockType,
@@ -27,9 +27,7 @@ logger = logging.getLogger(__name__)
 class PythonParser(CodeParser):
 
     def __init__(self, **kwargs):
-        language = Language(tspython.language())
-
-        super().__init__(language, **kwargs)
+        super().__init__(PythonParse.language(), **kwargs)
 
         self.queries = []
         self.queries.extend(self._build_queries("python.scm"))
@@ -41,6 +39,9 @@ class PythonParser(CodeParser):
     def language(self):
         return "python"
 
+    def _get_tree_parser(self) -> Parser:
+        return PythonParse.parser()
+
     def pre_process(self, codeblock: CodeBlock, node_match: NodeMatch):
         if (
             codeblock.type == CodeBlockType.FUNCTION
@@ -4,6 +4,8 @@ from enum import Enum
 
 from pydantic import BaseModel, Field
 
+from rtfs.tokens import TokenCountMode
+
 
 class CommentStrategy(Enum):
 
@@ -36,10 +38,15 @@ class IndexSettings(BaseModel):
         default=CommentStrategy.ASSOCIATE,
         description="Strategy on how comments will be indexed.",
     )
+    token_count_mode: TokenCountMode = Field(
+        default=TokenCountMode.EXACT,
+        description="Exact, cached or approximate token counts for chunking.",
+    )
 
     def to_serializable_dict(self):
         data = self.dict()
         data["comment_strategy"] = data["comment_strategy"].value
+        data["token_count_mode"] = data["token_count_mode"].value
         return data
 
     def persist(self, persist_dir: str):
@@ -1,5 +1,6 @@
 import logging
 import asyncio
+import functools
 import os
 import yaml
 
@@ -16,6 +17,8 @@ from tenacity import (
 import tiktoken
 import yaml
 
+from rtfs.tokens import TokenCounter, TokenCountMode, token_counter
+
 # from typing import Optional
 
 from openai import AsyncOpenAI
@@ -74,11 +77,20 @@ class CostLimitExceededError(Exception):
     pass
 
 
-def num_tokens_from_string(string: str, encoding_name: str = "cl100k_base") -> int:
+def num_tokens_from_string(
+    string: str,
+    encoding_name: str = "cl100k_base",
+    mode: TokenCountMode = TokenCountMode.EXACT,
+) -> int:
     """Returns the number of tokens in a text string."""
-    encoding = tiktoken.get_encoding(encoding_name)
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
+    return _token_counter(encoding_name, TokenCountMode(mode))(string)
+
+
+@functools.lru_cache(maxsize=None)
+def _token_counter(encoding_name: str, mode: TokenCountMode) -> TokenCounter:
+    # one counter per encoding and mode, so cached counts outlive a single call
+    # NOTE: the approximate counter is calibrated for cl100k_base
+    return token_counter(mode, tiktoken.get_encoding(encoding_name).encode)
 
 
 class BaseModel:
@@ -384,11 +396,13 @@ class OpenAIModel(BaseModel):
             for entry in history
         ]
 
-    def calc_input_cost(self, prompt: str) -> int:
+    def calc_input_cost(
+        self, prompt: str, mode: TokenCountMode = TokenCountMode.EXACT
+    ) -> int:
         """
         Calculate the cost of the input prompt in tokens
         """
-        num_tokens = num_tokens_from_string(prompt)
+        num_tokens = num_tokens_from_string(prompt, mode=mode)
 
         return num_tokens, self.input_cost(num_tokens)
 
@@ -23,6 +23,25 @@ class RepoNode(Node):
         return f"{self.name}"
 
 
+@dataclass(frozen=True)
+class ExportScope:
+    """
+    Immutable copy of the export RepoNode an import scope resolves to, as cached
+    by RepoGraph and shared between lookups
+    """
+
+    id: RepoNodeID
+    file_path: str
+    scope: ScopeID
+
+    @property
+    def name(self):
+        return f"{os.path.basename(self.file_path)}::{self.scope}"
+
+    def __str__(self):
+        return f"{self.name}"
+
+
 class EdgeKind(str, Enum):
     ImportToExport = "ImportToExport"
 
@@ -83,13 +83,7 @@ def import_stmt_to_import(
             module_type = ModuleType.UNKNOWN
 
         # resolve refs to this import
-        # TODO_PERF: store static references here?
-        ref_scopes = []
-        for scope in g.scopes():
-            for ref in g.references_by_origin(scope):
-                ref_node = g.get_node(ref)
-                if ref_node.name == ns.child:
-                    ref_scopes.append(scope)
+        ref_scopes = sorted(g.refs_by_name.get(ns.child, ()))
 
         imports.append(
             LocalImport(
@@ -1,8 +1,12 @@
-from typing import Any, List, Dict, Tuple
+from typing import Any, Iterable, List, Dict, Optional, Set, Tuple
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import pickle
 from networkx import DiGraph
 
+from rtfs.cache import ParseCache
 from rtfs.fs import RepoFs
+from rtfs.ingest import ParsedFile, ingest
 from rtfs.scope_resolution.scope_graph import ScopeGraph
 from rtfs.scope_resolution.graph_types import ScopeID
 from rtfs.build_scopes import build_scope_graph
@@ -11,7 +15,7 @@ from rtfs.utils import SysModules, ThirdPartyModules
 from rtfs.config import LANGUAGE
 
 from .imports import LocalImport, ModuleType, import_stmt_to_import
-from .graph import EdgeKind, RepoNode, RepoNodeID, RefEdge
+from .graph import EdgeKind, ExportScope, RepoNode, RepoNodeID, RefEdge
 from rtfs.graph import CodeGraph
 
 from collections import defaultdict
@@ -24,6 +28,179 @@ def repo_node_id(file: Path, scope_id: ScopeID):
     return "".join([str(file), "::", str(scope_id)])
 
 
+# (ref file, ref scope, export file, def scope, name, import namespace)
+ImportEdge = Tuple[Path, ScopeID, Path, ScopeID, str, str]
+
+
+# ultimately the output should be 3-tuple
+# (import_stmt, path, import_type)
+def construct_imports(
+    g: ScopeGraph,
+    file: Path,
+    fs: RepoFs,
+    sys_modules: SysModules,
+    third_party_modules: ThirdPartyModules,
+) -> List[LocalImport]:
+    """
+    Returns a list of file imports
+    """
+    imports = []
+    for scope in g.scopes():
+        for imp in g.imports(scope):
+            imp_node = g.get_node(imp)
+            imp_stmt = LocalImportStmt(imp_node.range, **imp_node.data)
+            imp_blocks = import_stmt_to_import(
+                import_stmt=imp_stmt,
+                filepath=file,
+                g=g,
+                fs=fs,
+                sys_modules=sys_modules,
+                third_party_modules=third_party_modules,
+            )
+            imports.extend(imp_blocks)
+
+    return imports
+
+
+# NOTE: this would need to be handled differently for other langs
+def get_exports(g: ScopeGraph) -> List[Tuple[str, ScopeID]]:
+    """
+    Constructs a map from file to its exports (unreferenced definitions)
+    """
+    exports = []
+
+    # have to do this because class/func defs are tied to the same scope
+    # they open, so they are child of root instead of being defined at root
+    outer_scopes = [g.root_idx] + [s for s in g.child_scopes(g.root_idx)]
+
+    for scope in outer_scopes:
+        for def_node in g.definitions(scope):
+            # dont want to pick up non class/func defs in the root - 1 scope
+            if scope != g.root_idx and (
+                def_node.data["def_type"] == "class"
+                or def_node.data["def_type"] == "function"
+            ):
+                exports.append((def_node.name, scope))
+
+    return exports
+
+
+class ImportResolver:
+    """
+    Resolves the imports of a file into import -> export edges. Only reads from
+    scopes_map and fs, so files can be resolved independently of each other
+    """
+
+    def __init__(self, scopes_map: Dict[Path, ScopeGraph], fs: RepoFs):
+        self.scopes_map = scopes_map
+        self.fs = fs
+        # lists for checking if python module is system or third party
+        self.sys_modules = SysModules(LANGUAGE)
+        self.third_party_modules = ThirdPartyModules(LANGUAGE)
+        self._imports: Dict[Path, List[LocalImport]] = {}
+
+    def invalidate(self, paths: Iterable[Path]):
+        """
+        Drops the memoized imports of paths
+        """
+        for path in paths:
+            self._imports.pop(path, None)
+
+    def imports(self, path: Path) -> List[LocalImport]:
+        if path not in self._imports:
+            self._imports[path] = construct_imports(
+                self.scopes_map[path],
+                path,
+                self.fs,
+                self.sys_modules,
+                self.third_party_modules,
+            )
+        return self._imports[path]
+
+    def resolve(self, path: Path) -> Tuple[List[LocalImport], List[ImportEdge]]:
+        """
+        Returns the imports of path and the edges from their ref scopes to the
+        export scopes they resolve to
+        """
+        imports = self.imports(path)
+        local_imports = [
+            local_imp
+            for local_imp in imports
+            if local_imp.module_type == ModuleType.LOCAL
+        ]
+
+        edges = []
+        for imp, def_scope, name, export_file in self.map_local_to_exports(
+            path, local_imports
+        ):
+            for ref_scope in imp.ref_scopes:
+                edges.append(
+                    (path, ref_scope, export_file, def_scope, name, str(imp.namespace))
+                )
+
+        return imports, edges
+
+    # TODO: make this language dependent function implemented outside of
+    # repo_graph
+    def map_local_to_exports(
+        self, path: Path, imports: List[LocalImport]
+    ) -> List[Tuple[LocalImport, ScopeID, str, Path]]:
+        """
+        Given an import namespace, map it to the local (export) definitions in
+        the resolved import namespace path
+        """
+        imp2def = []
+
+        for imp in imports:
+            export_file = self.fs.match_file(imp.namespace.to_path())
+            if export_file:
+                # TODO: make this a PythonLang Extension
+                if "__init__.py" in str(export_file):
+                    for init_imp in self.imports(export_file):
+                        init_file = self.fs.match_file(init_imp.namespace.to_path())
+                        if not init_file:
+                            continue
+
+                        for name, def_scope in get_exports(self.scopes_map[init_file]):
+                            if imp.namespace.child == name:
+                                # TODO: currently mapping connections to actual imported file
+                                # but could potentially also map it to __init__.py
+                                imp2def.append((imp, def_scope, name, init_file))
+
+                else:
+                    # match with exports
+                    for name, def_scope in get_exports(self.scopes_map[export_file]):
+                        if imp.namespace.child == name:
+                            imp2def.append((imp, def_scope, name, export_file))
+
+        return imp2def
+
+
+# per-process resolver used by the import resolution pool
+_import_resolver: Optional[ImportResolver] = None
+
+
+def _init_import_resolver(scopes_map: Dict[Path, ScopeGraph], fs: RepoFs):
+    global _import_resolver
+    _import_resolver = ImportResolver(scopes_map, fs)
+
+
+def _resolve_imports_worker(
+    path: Path,
+) -> Tuple[List[LocalImport], List[ImportEdge]]:
+    return _import_resolver.resolve(path)
+
+
+def _build_scope_graph_worker(item: Tuple[Path, bytes]) -> Tuple[Path, ScopeGraph]:
+    """
+    Process pool entrypoint for building a single file's ScopeGraph. Trees cannot be
+    pickled so the file is reparsed in the worker; the ScopeGraph is sent back in
+    its compact transport format
+    """
+    path, src = item
+    return path, build_scope_graph(src, language=LANGUAGE)
+
+
 # rename to import graph?
 # probably not, since we do want struct to hold repo level info
 
@@ -34,14 +211,31 @@ class RepoGraph(CodeGraph):
     Constructs a graph of relation between the scopes of a repo
     """
 
-    def __init__(self, path: Path):
+    def __init__(
+        self,
+        path: Path,
+        parsed_files: Optional[Dict[Path, ParsedFile]] = None,
+        workers: int = 1,
+        cache: Optional[ParseCache] = None,
+    ):
         super().__init__(node_types=[RepoNode])
         if not path.exists():
             raise FileNotFoundError(f"Path {path} does not exist")
 
         self.fs = RepoFs(path)
+        self._workers = workers
+        self._cache = cache
+        self._import_resolver: Optional[ImportResolver] = None
         self._graph = DiGraph()
-        self.scopes_map: Dict[Path, ScopeGraph] = self._construct_scopes(self.fs)
+        # every file is parsed once here and the trees are reused downstream
+        self.parsed_files: Dict[Path, ParsedFile] = (
+            parsed_files if parsed_files is not None else ingest(self.fs)
+        )
+        # contents of files whose trees were dropped when the graph was saved
+        self._sources: Dict[Path, bytes] = {}
+        self.scopes_map: Dict[Path, ScopeGraph] = self._construct_scopes(
+            self.parsed_files
+        )
 
         self._imports: Dict[Path, List[LocalImport]] = {}
 
@@ -50,66 +244,248 @@ class RepoGraph(CodeGraph):
         self._resolved_import_refs: Dict[Path, List[str]] = defaultdict(list)
         self.total_scopes = set()
 
-        # TODO_PERF: Parallelizable
-        # TODO: put everything into a function that can be measured with TQDM
-        # construct imports
-        # Original code commented out for reference
-        for path, g in self.scopes_map.items():
-            self._imports[path] = self._construct_import(g, path, self.fs)
-            self._missing_import_refs[path] = [
-                str(imp.namespace) for imp in self._imports[path]
-            ]
-
-        # map import ref to export scope
-        for path, imports in self._imports.items():
-            imp2def: List[Tuple[LocalImport, str, ScopeID, Path]] = []
-
-            # resolve the different types of imports
-            local_imports = [
-                local_imp
-                for local_imp in imports
-                if local_imp.module_type == ModuleType.LOCAL
-            ]
-            # TODO_PERF: check perf for this
-            imp2def.extend(self.map_local_to_exports(path, local_imports))
-
-            for imp, def_scope, name, export_file in imp2def:
-                if imp.module_type == ModuleType.LOCAL:
-                    # establish an edge between all refs from all local scopes to the
-                    # def scope in import_file
-                    for ref_scope in imp.ref_scopes:
-
-                        ref_node_id = repo_node_id(path, ref_scope)
-                        ref_node = self.get_node(ref_node_id)
-                        if not ref_node:
-                            ref_node = RepoNode(
-                                id=ref_node_id, file_path=path, scope=ref_scope
-                            )
-                            self.total_scopes.add(ref_node_id)
-                            self.add_node(ref_node)
-
-                        # self._missing_import_refs[path] = [
-                        #     ref
-                        #     for ref in self._missing_import_refs[path]
-                        #     if ref != str(imp.namespace)
-                        # ]
-                        # self._resolved_import_refs[path].append(name)
-
-                        imp_node_id = repo_node_id(export_file, def_scope)
-                        imp_node = self.get_node(imp_node_id)
-                        if not imp_node:
-                            imp_node = RepoNode(
-                                id=imp_node_id, file_path=export_file, scope=def_scope
-                            )
-                            self.total_scopes.add(imp_node_id)
-                            self.add_node(imp_node)
-
-                        self.add_edge(
-                            ref_node_id,
-                            imp_node_id,
-                            name,
-                            str(imp.namespace),
-                        )
+        # resolve stage: per-file work that only reads scopes_map and fs
+        resolved = self._resolve_imports()
+
+        # merge stage: insert the resolved edges in file order
+        for path, (imports, edges) in resolved.items():
+            self._imports[path] = imports
+            self._missing_import_refs[path] = [str(imp.namespace) for imp in imports]
+            self._merge_import_edges(edges)
+
+        self._export_lookup = self._build_export_lookup()
+
+    def __getstate__(self):
+        # trees cannot be pickled, keep the file contents so files can be
+        # reparsed on demand; the import resolver is rebuilt lazily
+        state = self.__dict__.copy()
+        state["_sources"] = self.sources()
+        state["parsed_files"] = {}
+        state["_import_resolver"] = None
+        state["_cache"] = None
+        return state
+
+    def save(self, path: Path):
+        """
+        Persist the graph so it can be reloaded without reparsing the repo
+        """
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Path) -> "RepoGraph":
+        with open(path, "rb") as f:
+            repo_graph = pickle.load(f)
+
+        if not isinstance(repo_graph, cls):
+            raise TypeError(f"{path} does not contain a {cls.__name__}")
+        return repo_graph
+
+    def sources(self) -> Dict[Path, bytes]:
+        """
+        Contents of every file in the graph, by full path
+        """
+        sources = dict(self._sources)
+        for path, parsed_file in self.parsed_files.items():
+            sources[path] = parsed_file.src
+        return sources
+
+    def parsed_file(self, path: Path) -> ParsedFile:
+        """
+        Returns the parsed file for path, reparsing it if the graph was loaded
+        from disk
+        """
+        parsed_file = self.parsed_files.get(path)
+        if parsed_file is None:
+            parsed_file = ParsedFile.from_bytes(path, self._sources[path])
+            self.parsed_files[path] = parsed_file
+        return parsed_file
+
+    def update(self, changed: List[Path], deleted: List[Path] = []) -> Set[Path]:
+        """
+        Incrementally updates the graph after the files in changed were modified
+        or created and the files in deleted were removed. Only the scope graphs of
+        changed files are rebuilt, and only the files whose imports point into
+        touched files (or whose imports now resolve differently) are re-resolved.
+        Returns the set of re-resolved files
+        """
+        changed = {path for path in map(self._normalize_path, changed) if path}
+        deleted = {path for path in map(self._normalize_path, deleted) if path}
+        # a changed file that no longer exists was deleted
+        deleted |= {path for path in changed if not path.exists()}
+        changed -= deleted
+        deleted &= set(self.scopes_map)
+        touched = changed | deleted
+
+        old_fs = self.fs
+        old_deps = {path: self._file_dependencies(path) for path in self.scopes_map}
+
+        # the module index only has to be rebuilt if files were added or removed
+        if deleted or changed - set(self.scopes_map):
+            self.fs = RepoFs(old_fs.repo_path, old_fs._skip_tests)
+
+        for path in deleted:
+            self.parsed_files.pop(path, None)
+            self._sources.pop(path, None)
+            del self.scopes_map[path]
+            self._imports.pop(path, None)
+            self._missing_import_refs.pop(path, None)
+
+        parsed = {}
+        for path in sorted(changed):
+            parsed[path] = ParsedFile.from_bytes(path, path.read_bytes(), LANGUAGE)
+            self._sources.pop(path, None)
+        self.parsed_files.update(parsed)
+        self.scopes_map.update(self._construct_scopes(parsed))
+
+        # files whose imports now match different files
+        rematched = set()
+        if self.fs is not old_fs:
+            for path, imports in self._imports.items():
+                if path not in touched and any(
+                    old_fs.match_file(imp.namespace.to_path())
+                    != self.fs.match_file(imp.namespace.to_path())
+                    for imp in imports
+                    if imp.module_type in (ModuleType.LOCAL, ModuleType.UNKNOWN)
+                ):
+                    rematched.add(path)
+
+        dirty = touched | rematched
+        resolve = (changed | rematched) | {
+            path
+            for path, deps in old_deps.items()
+            if path not in deleted and deps & dirty
+        }
+
+        resolver = self._resolver()
+        resolver.fs = self.fs
+        resolver.invalidate(touched | rematched)
+
+        # drop the nodes of touched files and the edges of re-resolved files,
+        # along with the nodes this leaves without any edges
+        stale_nodes = set()
+        stale_edges = []
+        for node_id, file_path in self._graph.nodes(data="file_path"):
+            if file_path in touched:
+                stale_nodes.add(node_id)
+            elif file_path in resolve:
+                stale_edges.extend(self._graph.out_edges(node_id))
+
+        orphans = {node for edge in stale_edges for node in edge}
+        for node_id in stale_nodes:
+            orphans.update(self._graph.predecessors(node_id))
+            orphans.update(self._graph.successors(node_id))
+
+        self._graph.remove_edges_from(stale_edges)
+        self._graph.remove_nodes_from(stale_nodes)
+        for node_id in orphans - stale_nodes:
+            if self._graph.has_node(node_id) and not self._graph.degree(node_id):
+                stale_nodes.add(node_id)
+                self._graph.remove_node(node_id)
+        self.total_scopes -= stale_nodes
+
+        for path in [path for path in self.scopes_map if path in resolve]:
+            imports, edges = resolver.resolve(path)
+            self._imports[path] = imports
+            self._missing_import_refs[path] = [str(imp.namespace) for imp in imports]
+            self._merge_import_edges(edges)
+
+        self._export_lookup = self._build_export_lookup()
+        return resolve
+
+    def _normalize_path(self, path: Path) -> Optional[Path]:
+        """
+        Full path of a source file the graph indexes, None for any other file
+        """
+        path = Path(path)
+        if not path.is_absolute():
+            path = self.fs.repo_path / path
+        path = path.resolve()
+
+        if path.suffix != ".py":
+            return None
+        if self.fs._skip_tests and path.name.startswith("test_"):
+            return None
+        return path
+
+    def _file_dependencies(self, path: Path) -> Set[Path]:
+        """
+        Files whose scopes the import edges of path depend on: the files its local
+        imports resolve to, and for __init__.py files the files they import from
+        """
+        deps = set()
+        for imp in self._imports.get(path, []):
+            if imp.module_type != ModuleType.LOCAL:
+                continue
+
+            export_file = self.fs.match_file(imp.namespace.to_path())
+            if not export_file:
+                continue
+
+            deps.add(export_file)
+            if "__init__.py" in str(export_file):
+                for init_imp in self._imports.get(export_file, []):
+                    init_file = self.fs.match_file(init_imp.namespace.to_path())
+                    if init_file:
+                        deps.add(init_file)
+
+        return deps
+
+    def _resolve_imports(
+        self,
+    ) -> Dict[Path, Tuple[List[LocalImport], List[ImportEdge]]]:
+        """
+        Resolves the imports of every file into import -> export edges, fanning the
+        files out over a process pool when workers > 1
+        """
+        paths = list(self.scopes_map.keys())
+        if self._workers > 1 and len(paths) > 1:
+            chunksize = max(1, len(paths) // (self._workers * 4))
+            with ProcessPoolExecutor(
+                max_workers=self._workers,
+                initializer=_init_import_resolver,
+                initargs=(self.scopes_map, self.fs),
+            ) as executor:
+                return dict(
+                    zip(
+                        paths,
+                        executor.map(
+                            _resolve_imports_worker, paths, chunksize=chunksize
+                        ),
+                    )
+                )
+
+        resolver = self._resolver()
+        return {path: resolver.resolve(path) for path in paths}
+
+    def _resolver(self) -> "ImportResolver":
+        if self._import_resolver is None:
+            self._import_resolver = ImportResolver(self.scopes_map, self.fs)
+        return self._import_resolver
+
+    def _merge_import_edges(self, edges: List[ImportEdge]):
+        """
+        Establish an edge between the ref scopes of an import and the def scope
+        in the exporting file
+        """
+        for path, ref_scope, export_file, def_scope, name, namespace in edges:
+            ref_node_id = repo_node_id(path, ref_scope)
+            ref_node = self.get_node(ref_node_id)
+            if not ref_node:
+                ref_node = RepoNode(id=ref_node_id, file_path=path, scope=ref_scope)
+                self.total_scopes.add(ref_node_id)
+                self.add_node(ref_node)
+
+            imp_node_id = repo_node_id(export_file, def_scope)
+            imp_node = self.get_node(imp_node_id)
+            if not imp_node:
+                imp_node = RepoNode(
+                    id=imp_node_id, file_path=export_file, scope=def_scope
+                )
+                self.total_scopes.add(imp_node_id)
+                self.add_node(imp_node)
+
+            self.add_edge(ref_node_id, imp_node_id, name, namespace)
 
     def get_node(self, node_id: RepoNodeID) -> RepoNode:
         return super().get_node(node_id)
@@ -132,132 +508,102 @@ class RepoGraph(CodeGraph):
             if v == exp_node_id
         ]
 
-    def import_to_export_scope(self, ref_node_id: RepoNodeID, ref: str) -> RepoNode:
+    def import_to_export_scope(
+        self, ref_node_id: RepoNodeID, ref: str
+    ) -> ExportScope:
         """
-        Returns the export (def) scopes that are tied to the import (ref) scope
+        Returns the export (def) scopes that are tied to the import (ref) scope.
+        The returned ExportScope is frozen, since it is shared between lookups
         """
+        return self._export_lookup.get((ref_node_id, ref), [])
 
-        possible_exports = [
-            self.get_node(v)
-            for _, v, attrs in self._graph.edges(ref_node_id, data=True)
-            if attrs["type"] == EdgeKind.ImportToExport and attrs["ref"] == ref
-        ]
+    def _build_export_lookup(self) -> Dict[Tuple[RepoNodeID, str], ExportScope]:
+        """
+        Maps each (import scope, ref) to the first export scope it has an edge to
+        """
+        export_lookup = {}
+        for u, v, attrs in self._graph.edges(data=True):
+            if attrs["type"] != EdgeKind.ImportToExport:
+                continue
 
-        if not possible_exports:
-            return []
+            key = (u, attrs["ref"])
+            if key in export_lookup:
+                logger.debug(f"Multiple exports for {attrs['ref']} in {u}")
+                continue
 
-        if len(possible_exports) > 1:
-            print("WTF ...")
+            node = self.get_node(v)
+            export_lookup[key] = ExportScope(
+                id=v, file_path=node.file_path, scope=node.scope
+            )
 
-        return possible_exports[0]
+        return export_lookup
 
-    # TODO: make this language dependent function implemented outside of
-    # repo_graph
     def map_local_to_exports(
         self, path: Path, imports: List[LocalImport]
-    ) -> List[Tuple[LocalImport, str, ScopeID, Path]]:
+    ) -> List[Tuple[LocalImport, ScopeID, str, Path]]:
         """
         Given an import namespace, map it to the local (export) definitions in
         the resolved import namespace path
         """
-        imp2def = []
-
-        for imp in imports:
-            export_file = self.fs.match_file(imp.namespace.to_path())
-            if export_file:
-                # TODO: make this a PythonLang Extension
-                if "__init__.py" in str(export_file):
-                    g = self.scopes_map[export_file]
-                    init_imports = self._construct_import(g, export_file, self.fs)
-
-                    for init_imp in init_imports:
-                        init_file = self.fs.match_file(init_imp.namespace.to_path())
-                        # print("Init file: ", init_file)
-
-                        if not init_file:
-                            continue
-
-                        for name, def_scope in self._get_exports(
-                            self.scopes_map[init_file], export_file
-                        ):
-                            if imp.namespace.child == name:
-                                # TODO: currently mapping connections to actual imported file
-                                # but could potentially also map it to __init__.py
-                                imp2def.append((imp, def_scope, name, init_file))
-
-                else:
-                    # match with exports
-                    for name, def_scope in self._get_exports(
-                        self.scopes_map[export_file], export_file
-                    ):
-                        if imp.namespace.child == name:
-                            imp2def.append((imp, def_scope, name, export_file))
-
-        return imp2def
+        return self._resolver().map_local_to_exports(path, imports)
 
     # TODO: add some sort of hierarchal structure to the scopes?
-    def _construct_scopes(self, fs: RepoFs) -> Dict[Path, ScopeGraph]:
+    def _construct_scopes(
+        self, parsed_files: Dict[Path, ParsedFile]
+    ) -> Dict[Path, ScopeGraph]:
         """
         Returns all the scopes associated with the files in the directory
         """
-        scope_map = {}
-        for path, file_content in fs.get_files_content():
-            # index by full path
-            sg = build_scope_graph(file_content, language=LANGUAGE)
-            scope_map[path.resolve()] = sg
+        scope_map: Dict[Path, Optional[ScopeGraph]] = {}
+        cache_keys = {}
+        for path, parsed_file in parsed_files.items():
+            scope_map[path] = None
+            if self._cache is not None:
+                cache_keys[path] = self._cache.key("scopes", parsed_file.src)
+                scope_map[path] = self._cache.get(cache_keys[path])
+
+        # only files that missed the cache are built
+        missing = [path for path, sg in scope_map.items() if sg is None]
+        if self._workers > 1 and len(missing) > 1:
+            items = [(path, parsed_files[path].src) for path in missing]
+            chunksize = max(1, len(items) // (self._workers * 4))
+            with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                # map preserves input order so scope_map matches the serial build
+                built = dict(
+                    executor.map(_build_scope_graph_worker, items, chunksize=chunksize)
+                )
+        else:
+            built = {}
+            for path in missing:
+                parsed_file = parsed_files[path]
+                # index by full path
+                built[path] = build_scope_graph(
+                    parsed_file.src, language=LANGUAGE, tree=parsed_file.tree
+                )
+
+        for path, sg in built.items():
+            scope_map[path] = sg
+            if self._cache is not None:
+                self._cache.put(cache_keys[path], sg)
 
         return scope_map
 
-    # ultimately the output should be 3-tuple
-    # (import_stmt, path, import_type)
     def _construct_import(
         self, g: ScopeGraph, file: Path, fs: RepoFs
     ) -> List[LocalImport]:
         """
         Returns a list of file imports
         """
-        # lists for checking if python module is system or third party
-        sys_modules_list = SysModules(LANGUAGE)
-        third_party_modules_list = ThirdPartyModules(LANGUAGE)
-
-        imports = []
-        for scope in g.scopes():
-            for imp in g.imports(scope):
-                imp_node = g.get_node(imp)
-                imp_stmt = LocalImportStmt(imp_node.range, **imp_node.data)
-                imp_blocks = import_stmt_to_import(
-                    import_stmt=imp_stmt,
-                    filepath=file,
-                    g=g,
-                    fs=fs,
-                    sys_modules=sys_modules_list,
-                    third_party_modules=third_party_modules_list,
-                )
-                imports.extend(imp_blocks)
-
-        return imports
+        resolver = self._resolver()
+        return construct_imports(
+            g, file, fs, resolver.sys_modules, resolver.third_party_modules
+        )
 
-    # NOTE: this would need to be handled differently for other langs
     def _get_exports(self, g: ScopeGraph, file: Path) -> List[Tuple[str, ScopeID]]:
         """
         Constructs a map from file to its exports (unreferenced definitions)
         """
-        exports = []
-
-        # have to do this because class/func defs are tied to the same scope
-        # they open, so they are child of root instead of being defined at root
-        outer_scopes = [g.root_idx] + [s for s in g.child_scopes(g.root_idx)]
-
-        for scope in outer_scopes:
-            for def_node in g.definitions(scope):
-                # dont want to pick up non class/func defs in the root - 1 scope
-                if scope != g.root_idx and (
-                    def_node.data["def_type"] == "class"
-                    or def_node.data["def_type"] == "function"
-                ):
-                    exports.append((def_node.name, scope))
-
-        return exports
+        return get_exports(g)
 
     def to_str(self):
         repr = ""
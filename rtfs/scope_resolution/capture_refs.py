@@ -1,18 +1,47 @@
 from rtfs.languages import LANG_PARSER
-from rtfs.config import PYTHON_REFS
+from rtfs.config import PYTHON_SCM
 
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+from tree_sitter import Tree
 
 from rtfs.utils import TextRange
 from rtfs.scope_resolution.reference import Reference
 
 
-def capture_refs(src_bytes: bytearray, language: str = "python") -> List[Reference]:
+def capture_refs(
+    src_bytes: bytearray,
+    language: str = "python",
+    tree: Optional[Tree] = None,
+    byte_range: Optional[Tuple[int, int]] = None,
+) -> List[Reference]:
+    """
+    Captures all the references in src_bytes. If a parsed tree is given, it is
+    reused, and byte_range restricts the captures to refs starting inside
+    [start, end) so a chunk can be queried without reparsing its text
+    """
     parser = LANG_PARSER[language]
-    query, root_node = parser._build_query(src_bytes, PYTHON_REFS)
+    if tree is None:
+        tree = parser.parse(src_bytes)
+    root_node = tree.root_node
+    # NOTE: refs have always been captured with the full python.scm query;
+    # python_refs.scm is missing several ref patterns (assert, raise, del, ...)
+    query = parser.query(PYTHON_SCM)
+
+    if byte_range:
+        start_byte, end_byte = byte_range
+        captures = [
+            (node, capture_name)
+            for node, capture_name in query.captures(
+                root_node, start_byte=start_byte, end_byte=end_byte
+            )
+            if start_byte <= node.start_byte < end_byte
+        ]
+    else:
+        captures = query.captures(root_node)
 
     refs = []
-    for i, (node, capture_name) in enumerate(query.captures(root_node)):
+    for i, (node, capture_name) in enumerate(captures):
         if capture_name == "local.reference":
             range = TextRange(
                 start_byte=node.start_byte,
@@ -1,4 +1,5 @@
-from intervaltree import IntervalTree
+from bisect import bisect_right
+from typing import List, Optional, Tuple
 
 from rtfs.utils import TextRange
 
@@ -12,46 +13,131 @@ class Scope:
         self.node_id = node_id
 
 
+def _line_interval(range: TextRange) -> Tuple[float, float]:
+    start, end = range.line_range()
+
+    # need to do this or else single line ranges are empty intervals
+    # its fine, since min(end-start) = 1 anyways
+    if start == end:
+        end += epsilon
+
+    return start, end
+
+
 class IntervalGraph:
+    """
+    Index over the line intervals of the scopes in a file, answering "smallest
+    scope that contains this range" queries.
+
+    Scopes are nested, so the intervals are kept sorted by (begin, -end) with a
+    pointer from each interval to its smallest enclosing interval. The smallest
+    scope containing a range is then found by bisecting for the last interval that
+    begins before the range and walking up its parents. Scopes with identical
+    line ranges are treated as nested in insertion order, so the innermost
+    (latest inserted) one is returned. If a partial overlap ever breaks the
+    nesting, queries fall back to a linear scan with the same semantics
+    """
+
     def __init__(self, range: TextRange, root_id: str):
-        self._interval_tree = IntervalTree()
+        # sorted (begin, -end, seq) keys and their aligned interval data
+        self._keys: List[Tuple[float, float, int]] = []
+        self._begins: List[float] = []
+        self._scopes: List[Scope] = []
+        # index of the smallest enclosing interval, or -1
+        self._parents: List[int] = []
+
+        # open chain of intervals, innermost last, for in order appends
+        self._stack: List[int] = []
+        self._dirty = False
+        self._nested = True
+
         self.add_scope(range, root_id)
 
     def add_scope(self, range: TextRange, node_id: str):
         scope = Scope(range, node_id)
-        start, end = range.line_range()
-        if start == end:
-            end += epsilon
+        start, end = _line_interval(range)
+        key = (start, -end, len(self._keys))
+
+        if self._keys and key < self._keys[-1]:
+            # out of order insert, the parents are recomputed on the next query
+            i = bisect_right(self._keys, key)
+            self._keys.insert(i, key)
+            self._begins.insert(i, start)
+            self._scopes.insert(i, scope)
+            self._parents.insert(i, -1)
+            self._dirty = True
+        else:
+            self._keys.append(key)
+            self._begins.append(start)
+            self._scopes.append(scope)
+            parent = -1 if self._dirty else self._push(len(self._keys) - 1)
+            self._parents.append(parent)
 
-        self._interval_tree[start:end] = scope
         return scope
 
-    def all_intervals(self):
-        return self._interval_tree.items()
+    def all_intervals(self) -> List[Tuple[float, float, Scope]]:
+        return [
+            (begin, -neg_end, scope)
+            for (begin, neg_end, _), scope in zip(self._keys, self._scopes)
+        ]
 
-    def contains(self, range: TextRange, overlap=False):
-        start, end = range.line_range()
-        intervals = self.all_intervals()
+    def contains(self, range: TextRange, overlap=False) -> Optional[str]:
+        start, end = _line_interval(range)
 
-        # need to do this or else it throws an error if start == end
-        # its fine, since min(end-start) = 1 anyways
-        if start == end:
-            end += epsilon
+        if self._dirty:
+            self._rebuild()
 
-        if overlap:
-            intervals = self._interval_tree[start:end]
-            # print("Overlapping: ", intervals)
-            if not intervals:
-                return None
-        else:
-            intervals = [
-                interval
-                for interval in self._interval_tree[start:end]
-                if interval.begin <= start and end <= interval.end
-            ]
+        if overlap or not self._nested:
+            return self._scan(start, end, overlap)
+
+        i = bisect_right(self._begins, start) - 1
+        while i >= 0:
+            if end <= -self._keys[i][1]:
+                return self._scopes[i].node_id
+            i = self._parents[i]
+
+        return None
+
+    def _push(self, i: int) -> int:
+        """
+        Pops the intervals on the open chain that do not contain interval i, and
+        returns the one that does (its parent)
+        """
+        begin, neg_end, _ = self._keys[i]
+        while self._stack and -self._keys[self._stack[-1]][1] < -neg_end:
+            popped_end = -self._keys[self._stack.pop()][1]
+            # popped interval ends inside this one: they partially overlap
+            if popped_end > begin:
+                self._nested = False
+
+        parent = self._stack[-1] if self._stack else -1
+        self._stack.append(i)
+        return parent
+
+    def _rebuild(self):
+        self._stack = []
+        self._nested = True
+        for i in range(len(self._keys)):
+            self._parents[i] = self._push(i)
+
+        self._dirty = False
+
+    def _scan(self, start: float, end: float, overlap: bool) -> Optional[str]:
+        """
+        Linear scan for the smallest interval containing (or overlapping, if
+        overlap is set) the query, ties going to the latest inserted interval
+        """
+        best = None
+        for (begin, neg_end, seq), scope in zip(self._keys, self._scopes):
+            iv_end = -neg_end
+            if overlap:
+                if not (begin < end and iv_end > start):
+                    continue
+            elif not (begin <= start and end <= iv_end):
+                continue
 
-        if not intervals:
-            return None
+            candidate = (iv_end - begin, -seq)
+            if best is None or candidate < best[0]:
+                best = (candidate, scope)
 
-        smallest_scope = min(intervals, key=lambda x: x.end - x.begin)
-        return smallest_scope.data.node_id
+        return best[1].node_id if best else None
@@ -1,5 +1,6 @@
+from bisect import bisect_left, insort
 from networkx import DiGraph, dfs_postorder_nodes
-from typing import Dict, Optional, Iterator, List, NewType, Tuple
+from typing import Dict, Optional, Iterator, List, NewType, Set, Tuple
 from enum import Enum
 from collections import defaultdict
 
@@ -18,6 +19,30 @@ from rtfs.scope_resolution.graph_types import NodeKind, EdgeKind, ScopeNode, Sco
 from rtfs.scope_resolution.interval_tree import IntervalGraph
 
 
+# index based encodings of the enums used by the transport format
+_NODE_KINDS = list(NodeKind)
+_NODE_KIND_IDX = {kind: i for i, kind in enumerate(_NODE_KINDS)}
+_EDGE_KINDS = list(EdgeKind)
+_EDGE_KIND_IDX = {kind: i for i, kind in enumerate(_EDGE_KINDS)}
+
+
+def _range_to_tuple(range: TextRange) -> Tuple[int, int, int, int, int, int]:
+    return (
+        range.start_byte,
+        range.end_byte,
+        range.start_point[0],
+        range.start_point[1],
+        range.end_point[0],
+        range.end_point[1],
+    )
+
+
+def _tuple_to_range(t: Tuple[int, int, int, int, int, int]) -> TextRange:
+    return TextRange(
+        start_byte=t[0], end_byte=t[1], start_point=t[2:4], end_point=t[4:6]
+    )
+
+
 class ScopeGraph(CodeGraph):
     def __init__(self, range: TextRange):
         super().__init__(node_types=[ScopeNode])
@@ -34,6 +59,23 @@ class ScopeGraph(CodeGraph):
         # lookup tables for faster lookups, especially for references resolution
         self.defn_dict: Dict[str, List[Tuple[TextRange, ScopeID]]] = defaultdict(list)
         self.imp_dict: Dict[str, List[Tuple[TextRange, ScopeID]]] = defaultdict(list)
+        # ref name -> scopes that the ref originates from
+        self.refs_by_name: Dict[str, Set[ScopeID]] = defaultdict(set)
+
+        # adjacency maintained alongside _graph so the accessors below don't have
+        # to filter edges: edge kind -> target -> sources, in insertion order
+        self._in_adj: Dict[EdgeKind, Dict[int, List[int]]] = {
+            kind: defaultdict(list) for kind in EdgeKind
+        }
+        self._parents: Dict[ScopeID, ScopeID] = {}
+        self._scopes: List[ScopeID] = [self.root_idx]
+
+        # reference line intervals as (start_row, id, end_row), sorted, for all refs
+        # and per ref name; answers "which refs does this range contain" queries
+        self._ref_lines: List[Tuple[int, int, int]] = []
+        self._ref_lines_by_name: Dict[str, List[Tuple[int, int, int]]] = defaultdict(
+            list
+        )
 
         # use this to faster resolve range -> scope queries
         self._ig = IntervalGraph(range, self.root_idx)
@@ -46,7 +88,8 @@ class ScopeGraph(CodeGraph):
         if parent_scope is not None:
             new_node = ScopeNode(range=new.range, type=NodeKind.SCOPE)
             new_idx = self.add_node(new_node)
-            self._graph.add_edge(new_idx, parent_scope, type=EdgeKind.ScopeToScope)
+            self._scopes.append(new_idx)
+            self._add_edge(new_idx, parent_scope, EdgeKind.ScopeToScope)
             self._ig.add_scope(new.range, new_idx)
 
             self.scope2range[new_idx] = new.range
@@ -68,7 +111,7 @@ class ScopeGraph(CodeGraph):
                 },
             )
             new_idx = self.add_node(new_node)
-            self._graph.add_edge(new_idx, parent_scope, type=EdgeKind.ImportToScope)
+            self._add_edge(new_idx, parent_scope, EdgeKind.ImportToScope)
 
             for names in new.names:
                 self.imp_dict[names].append((new.range, new_idx))
@@ -86,7 +129,7 @@ class ScopeGraph(CodeGraph):
                 data={"def_type": new.symbol},
             )
             new_idx = self.add_node(new_def)
-            self._graph.add_edge(new_idx, defining_scope, type=EdgeKind.DefToScope)
+            self._add_edge(new_idx, defining_scope, EdgeKind.DefToScope)
 
             self.defn_dict[new.name].append((new.range, new_idx))
 
@@ -107,7 +150,7 @@ class ScopeGraph(CodeGraph):
             # insert into the defining scope
             parent_scope = self.parent_scope(defining_scope)
             target_scope = parent_scope if parent_scope is not None else defining_scope
-            self._graph.add_edge(new_idx, target_scope, type=EdgeKind.DefToScope)
+            self._add_edge(new_idx, target_scope, EdgeKind.DefToScope)
 
             self.defn_dict[new.name].append((new.range, new_idx))
 
@@ -121,7 +164,7 @@ class ScopeGraph(CodeGraph):
             type=NodeKind.DEFINITION,
         )
         new_idx = self.add_node(new_def)
-        self._graph.add_edge(new_idx, self.root_idx, type=EdgeKind.DefToScope)
+        self._add_edge(new_idx, self.root_idx, EdgeKind.DefToScope)
 
         self.defn_dict[new.name].append((new.range, new_idx))
 
@@ -148,13 +191,15 @@ class ScopeGraph(CodeGraph):
             ref_idx = self.add_node(new_ref)
 
             for _, def_idx in possible_defs:
-                self._graph.add_edge(ref_idx, def_idx, type=EdgeKind.RefToDef)
+                self._add_edge(ref_idx, def_idx, EdgeKind.RefToDef)
 
             for _, imp_idx in possible_imports:
-                self._graph.add_edge(ref_idx, imp_idx, type=EdgeKind.RefToImport)
+                self._add_edge(ref_idx, imp_idx, EdgeKind.RefToImport)
 
             # add an edge back to the originating scope of the reference
-            self._graph.add_edge(ref_idx, local_scope_idx, type=EdgeKind.RefToOrigin)
+            self._add_edge(ref_idx, local_scope_idx, EdgeKind.RefToOrigin)
+            self.refs_by_name[new.name].add(local_scope_idx)
+            self._index_ref(ref_idx, new.name, new.range)
 
     def insert_local_call(self, call: LocalCall):
         call_node = ScopeNode(
@@ -165,96 +210,90 @@ class ScopeGraph(CodeGraph):
         )
         call_idx = self.add_node(call_node)
 
-        # Find the reference node that matches the call name
-        found = False
-        for ref_idx, node_attrs in self._graph.nodes(data=True):
-            if (
-                node_attrs["type"] == NodeKind.REFERENCE
-                and node_attrs["name"] == call.name
-            ):
-                ref_node = self.get_node(ref_idx)
-                if call_node.range.contains_line(ref_node.range):
-                    found = True
-                    break
+        # Find the first reference node that matches the call name
+        ref_idx = min(
+            self._refs_in_lines(
+                self._ref_lines_by_name.get(call.name, []), call_node.range
+            ),
+            default=None,
+        )
 
-        if not found:
+        if ref_idx is None:
             # print(f"Could not find reference for call {call.name}")
             return
 
         # Add an edge from the call to the refeaddrenc
-        self._graph.add_edge(call_idx, ref_idx, type=EdgeKind.CallToRef)
+        self._add_edge(call_idx, ref_idx, EdgeKind.CallToRef)
+
+    def _add_edge(self, u: int, v: int, kind: EdgeKind):
+        self._graph.add_edge(u, v, type=kind)
+        self._in_adj[kind][v].append(u)
+        if kind == EdgeKind.ScopeToScope:
+            self._parents.setdefault(u, v)
 
     def scopes(self) -> List[ScopeID]:
         """
         Return all scopes in the graph
         """
-        return [
-            u
-            for u, attrs in self._graph.nodes(data=True)
-            if attrs["type"] == NodeKind.SCOPE
-        ]
+        return list(self._scopes)
 
     def imports(self, start: int) -> List[int]:
         """
         Get all imports in the scope
         """
-        return [
-            u
-            for u, v, attrs in self._graph.in_edges(start, data=True)
-            if attrs["type"] == EdgeKind.ImportToScope
-        ]
+        return list(self._in_adj[EdgeKind.ImportToScope].get(start, []))
 
     def definitions(self, start: int) -> List[ScopeNode]:
         """
         Get all definitions in the scope and child scope
         """
         return [
-            self.get_node(u)
-            for u, v, attrs in self._graph.in_edges(start, data=True)
-            if attrs["type"] == EdgeKind.DefToScope
+            self.get_node(u) for u in self._in_adj[EdgeKind.DefToScope].get(start, [])
         ]
 
     def references_by_origin(self, start: int) -> List[int]:
         """
         Get all references in the scope and child scope
         """
-        return [
-            u
-            for u, v, attrs in self._graph.in_edges(start, data=True)
-            if attrs["type"] == EdgeKind.RefToOrigin
-        ]
+        return list(self._in_adj[EdgeKind.RefToOrigin].get(start, []))
 
     def child_scopes(self, start: ScopeID) -> List[ScopeID]:
         """
         Get all child scopes of the given scope
         """
-        return [
-            u
-            for u, v, attrs in self._graph.edges(data=True)
-            if attrs["type"] == EdgeKind.ScopeToScope and v == start
-        ]
+        return list(self._in_adj[EdgeKind.ScopeToScope].get(start, []))
 
     def parent_scope(self, start: ScopeID) -> Optional[ScopeID]:
         """
         Produce the parent scope of a given scope
         """
-        if self.get_node(start).type == NodeKind.SCOPE:
-            for src, dst, attrs in self._graph.out_edges(start, data=True):
-                if attrs["type"] == EdgeKind.ScopeToScope:
-                    return dst
-        return None
+        return self._parents.get(start, None)
 
     def is_call_ref(self, range: TextRange) -> bool:
         """
         Checks that the call range matches the ref range
         """
-        for node, attrs in self._graph.nodes(data=True):
-            if attrs["type"] == NodeKind.REFERENCE:
-                ref_node = self.get_node(node)
-                if range.contains_line(ref_node.range):
-                    return True
+        return next(self._refs_in_lines(self._ref_lines, range), None) is not None
 
-        return False
+    def _index_ref(self, idx: int, name: str, range: TextRange):
+        entry = (range.start_point.row, idx, range.end_point.row)
+        insort(self._ref_lines, entry)
+        insort(self._ref_lines_by_name[name], entry)
+
+    @staticmethod
+    def _refs_in_lines(
+        ref_lines: List[Tuple[int, int, int]], range: TextRange
+    ) -> Iterator[int]:
+        """
+        Yields the refs whose lines are contained by range, ie. range.contains_line(ref)
+        """
+        end_row = range.end_point.row
+        i = bisect_left(ref_lines, (range.start_point.row,))
+        while i < len(ref_lines) and ref_lines[i][0] <= end_row:
+            _, idx, ref_end = ref_lines[i]
+            if ref_end <= end_row:
+                yield idx
+            i += 1
 
     def scope_by_range(
         self, range: TextRange, start: ScopeID = None
@@ -301,6 +340,81 @@ class ScopeGraph(CodeGraph):
         self._node_counter += 1
         return node.id
 
+    def to_transport(self) -> Tuple[List[Tuple], List[Tuple]]:
+        """
+        Compact representation of the graph made of plain tuples, used to ship
+        ScopeGraphs between processes. Lookup tables are derived data and are
+        rebuilt by from_transport instead of being serialized
+        """
+        nodes = [
+            (
+                _NODE_KIND_IDX[attrs["type"]],
+                attrs["name"],
+                _range_to_tuple(attrs["range"]),
+                attrs["data"] or None,
+            )
+            for _, attrs in self._graph.nodes(data=True)
+        ]
+        # NOTE: edges are always added right after their source node is created,
+        # so replaying them in source order also reproduces the in-edge order
+        edges = [
+            (u, v, _EDGE_KIND_IDX[attrs["type"]])
+            for u, v, attrs in self._graph.edges(data=True)
+        ]
+
+        return nodes, edges
+
+    @classmethod
+    def from_transport(
+        cls, transport: Tuple[List[Tuple], List[Tuple]]
+    ) -> "ScopeGraph":
+        nodes, edges = transport
+
+        # node ids are assigned sequentially starting with the root scope; the
+        # attrs are written directly to skip building a ScopeNode per node
+        sg = cls(_tuple_to_range(nodes[0][2]))
+        for idx, (kind, name, range, data) in enumerate(nodes[1:], start=1):
+            sg._graph.add_node(
+                idx,
+                kind=ScopeNode.kind,
+                range=_tuple_to_range(range),
+                type=_NODE_KINDS[kind],
+                name=name,
+                data=data or {},
+            )
+        sg._node_counter = len(nodes)
+
+        for u, v, kind in edges:
+            sg._add_edge(u, v, _EDGE_KINDS[kind])
+
+        sg._rebuild_indexes()
+        return sg
+
+    def __reduce__(self):
+        return (ScopeGraph.from_transport, (self.to_transport(),))
+
+    def _rebuild_indexes(self):
+        """
+        Rebuilds the lookup tables from the nodes in the graph, in insertion order
+        """
+        for idx, attrs in self._graph.nodes(data=True):
+            range = attrs["range"]
+            if attrs["type"] == NodeKind.SCOPE and idx != self.root_idx:
+                self._scopes.append(idx)
+                self.scope2range[idx] = range
+                self._ig.add_scope(range, idx)
+            elif attrs["type"] == NodeKind.DEFINITION:
+                self.defn_dict[attrs["name"]].append((range, idx))
+            elif attrs["type"] == NodeKind.IMPORT:
+                for name in attrs["data"]["names"]:
+                    self.imp_dict[name].append((range, idx))
+            elif attrs["type"] == NodeKind.REFERENCE:
+                self._index_ref(idx, attrs["name"], range)
+
+        for v, refs in self._in_adj[EdgeKind.RefToOrigin].items():
+            for u in refs:
+                self.refs_by_name[self._graph.nodes[u]["name"]].add(v)
+
     # def get_node(self, idx: int) -> ScopeNode:
     #     return ScopeNode(**self._graph.nodes(data=True)[idx])
 
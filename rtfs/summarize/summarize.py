@@ -14,6 +14,7 @@ from ..chunk_resolution.graph import (
 from rtfs.graph import CodeGraph
 from rtfs.utils import dfs_json, VerboseSafeDumper
 from rtfs.models import OpenAIModel
+from rtfs.tokens import TokenCountMode
 
 SUMMARY_FIRST_PASS = """
 The following chunks of code are grouped into the same feature.
@@ -69,9 +70,15 @@ class LLMException(Exception):
 class Summarizer:
     accepted_nodes: List[str] = ["ClusterNode", "ChunkNode"]
 
-    def __init__(self, graph: CodeGraph):
+    def __init__(
+        self,
+        graph: CodeGraph,
+        token_count_mode: TokenCountMode = TokenCountMode.EXACT,
+    ):
         self._model = OpenAIModel()
         self._graph = graph
+        # an estimate is enough for the cost shown before summarizing
+        self._token_count_mode = token_count_mode
 
         for node_type in self._graph.node_types:
             if node_type.__name__ not in self.accepted_nodes:
@@ -82,16 +89,16 @@ class Summarizer:
     # can only parallelize one whole depth level at a time
     def iterate_clusters_with_text(self, cg: ChunkGraph):
         for cluster in [
-            node
-            for node, data in self._graph.nodes(data=True)
-            if data["kind"] == NodeKind.Cluster
+            node.id for node in self._graph.iter_nodes(kind=NodeKind.Cluster)
         ]:
+            children = [
+                self._graph.get_node(c, view=True) for c in self._graph.children(cluster)
+            ]
             child_content = "\n".join(
                 [
-                    self._graph.get_node(c).get_content()
-                    for c in self._graph.children(cluster)
-                    if self._graph.get_node(c).kind == NodeKind.Chunk
-                    or self._graph.get_node(c).kind == NodeKind.Cluster
+                    child.get_content()
+                    for child in children
+                    if child.kind == NodeKind.Chunk or child.kind == NodeKind.Cluster
                 ]
             )
             yield (cluster, child_content)
@@ -162,7 +169,9 @@ class Summarizer:
         for _, child_content in self.iterate_clusters_with_text(self._graph):
             agg_chunks += child_content
 
-        tokens, cost = self._model.calc_input_cost(agg_chunks)
+        tokens, cost = self._model.calc_input_cost(
+            agg_chunks, mode=self._token_count_mode
+        )
         user_input = input(
             f"The summarization will cost ${cost} and use {tokens} tokens. Do you want to proceed? (yes/no): "
         )
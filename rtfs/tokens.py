@@ -0,0 +1,129 @@
+import hashlib
+import re
+from collections import OrderedDict
+from enum import Enum
+from functools import partial
+from typing import Callable, List, Optional
+
+import tiktoken
+from llama_index.core.utils import get_tokenizer
+
+
+class TokenCountMode(str, Enum):
+    # run the tokenizer on every text
+    EXACT = "exact"
+    # tokenizer counts memoized by content hash
+    CACHED = "cached"
+    # calibrated estimate, never runs the tokenizer
+    APPROXIMATE = "approximate"
+
+
+TokenCounter = Callable[[str], int]
+
+
+class ExactTokenCounter:
+    def __init__(self, tokenizer: Optional[Callable[[str], List]] = None):
+        self.tokenizer = tokenizer or get_tokenizer()
+
+    def __call__(self, text: str) -> int:
+        return len(self.tokenizer(text))
+
+
+class CachedTokenCounter:
+    """
+    Exact counts kept in an LRU cache keyed by a hash of the text, so repeated
+    blocks (and repeated runs over the same content) are only encoded once
+    """
+
+    def __init__(
+        self, tokenizer: Optional[Callable[[str], List]] = None, maxsize: int = 2**16
+    ):
+        self._count = ExactTokenCounter(tokenizer)
+        self.maxsize = maxsize
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+
+    def __call__(self, text: str) -> int:
+        key = hashlib.blake2b(
+            text.encode("utf-8", "surrogatepass"), digest_size=16
+        ).digest()
+        count = self._counts.get(key)
+        if count is not None:
+            self._counts.move_to_end(key)
+            return count
+
+        count = self._count(text)
+        self._counts[key] = count
+        if len(self._counts) > self.maxsize:
+            self._counts.popitem(last=False)
+        return count
+
+
+# the cl100k_base pre-tokenizer, with \p{L} as [^\W\d_] and \p{N} as \d
+_PRETOKEN = re.compile(
+    r"'(?i:s|t|re|ve|m|ll|d)"
+    r"|(?:[^\r\n\w]|_)?[^\W\d_]+"
+    r"|\d{1,3}"
+    r"| ?(?:[^\s\w]|_)+[\r\n]*"
+    r"|\s*[\r\n]+"
+    r"|\s+(?!\S)"
+    r"|\s+"
+)
+# long words are split further by the encoder, roughly one extra token per
+# this many non space characters
+_CHARS_PER_EXTRA_TOKEN = 40
+
+
+class ApproximateTokenCounter:
+    """
+    Estimates cl100k_base counts by splitting the text like the encoder's
+    pre-tokenizer. Calibrated on Python source: within about 1-2% of the exact
+    count over a whole repo, and a median error of ~3% for blocks over 50 tokens
+    """
+
+    def __call__(self, text: str) -> int:
+        if not text:
+            return 0
+
+        pretokens = len(_PRETOKEN.findall(text))
+        return round(
+            pretokens + (len(text) - text.count(" ")) / _CHARS_PER_EXTRA_TOKEN
+        )
+
+
+def tokenizer_id(
+    tokenizer: Optional[Callable[[str], List]] = None,
+) -> Optional[str]:
+    """
+    Identifies tokenizer (default the global llama_index one) for cache keys:
+    tiktoken encoders by their encoding name, plain functions by their module
+    and qualified name. None for tokenizers that cannot be told apart that way,
+    ie. methods of other tokenizer objects
+    """
+    func = tokenizer or get_tokenizer()
+    while isinstance(func, partial):
+        func = func.func
+
+    owner = getattr(func, "__self__", None)
+    if isinstance(owner, tiktoken.Encoding):
+        return f"tiktoken:{owner.name}"
+    if owner is not None or not hasattr(func, "__qualname__"):
+        return None
+    if "<locals>" in func.__qualname__ or func.__qualname__ == "<lambda>":
+        return None
+    return f"{func.__module__}:{func.__qualname__}"
+
+
+def token_counter(
+    mode: TokenCountMode = TokenCountMode.EXACT,
+    tokenizer: Optional[Callable[[str], List]] = None,
+) -> TokenCounter:
+    """
+    Returns the token counter for mode. tokenizer defaults to the global
+    llama_index tokenizer and is not used in approximate mode
+    """
+    mode = TokenCountMode(mode)
+    if mode == TokenCountMode.CACHED:
+        return CachedTokenCounter(tokenizer)
+    if mode == TokenCountMode.APPROXIMATE:
+        return ApproximateTokenCounter()
+    return ExactTokenCounter(tokenizer)
@@ -1,7 +1,6 @@
-from pydantic import BaseModel
 from tree_sitter import Point
 from collections import deque
-from typing import TypeAlias, Tuple, List
+from typing import Dict, TypeAlias, Tuple, List
 import json
 from rtfs.config import SYS_MODULES_LIST, THIRD_PARTY_MODULES_LIST
 from pathlib import Path
@@ -38,11 +37,14 @@ def dfs_json(json_data):
             stack.append((child, depth + 1))
 
 
-class TextRange(BaseModel):
-    start_byte: int
-    end_byte: int
-    start_point: Point
-    end_point: Point
+class TextRange:
+    """
+    Byte and point span of a node in a source file. This is a plain slotted class
+    rather than a pydantic model since tens of thousands of them are created per
+    file; use dict() at serialization boundaries
+    """
+
+    __slots__ = ("start_byte", "end_byte", "start_point", "end_point")
 
     def __init__(
         self,
@@ -52,11 +54,40 @@ class TextRange(BaseModel):
         start_point: Tuple[int, int],
         end_point: Tuple[int, int],
     ):
-        super().__init__(
-            start_byte=start_byte,
-            end_byte=end_byte,
-            start_point=start_point,
-            end_point=end_point,
+        self.start_byte = start_byte
+        self.end_byte = end_byte
+        self.start_point = (
+            start_point if type(start_point) is Point else Point(*start_point)
+        )
+        self.end_point = end_point if type(end_point) is Point else Point(*end_point)
+
+    def dict(self) -> Dict:
+        return {
+            "start_byte": self.start_byte,
+            "end_byte": self.end_byte,
+            "start_point": tuple(self.start_point),
+            "end_point": tuple(self.end_point),
+        }
+
+    model_dump = dict
+
+    def __eq__(self, other):
+        if not isinstance(other, TextRange):
+            return NotImplemented
+
+        return (
+            self.start_byte == other.start_byte
+            and self.end_byte == other.end_byte
+            and self.start_point == other.start_point
+            and self.end_point == other.end_point
+        )
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (
+            f"TextRange(start_byte={self.start_byte}, end_byte={self.end_byte}, "
+            f"start_point={self.start_point!r}, end_point={self.end_point!r})"
         )
 
     def add_offset(self, start_offset: int, end_offset: int):
@@ -0,0 +1,36 @@
+import pickle
+
+from rtfs.chunker import chunk
+
+from tests.data import IMPORT_REPO
+
+
+def edges(cg):
+    return [
+        (u, v, d["kind"], d["ref"], d["weight"])
+        for u, v, d in cg._graph.edges(data=True)
+    ]
+
+
+def test_sharded_chunk_edges(make_repo):
+    tmp_path = make_repo(IMPORT_REPO)
+
+    serial = chunk(str(tmp_path))
+    parallel = chunk(str(tmp_path), workers=2)
+
+    assert edges(serial)
+    assert list(parallel._graph.nodes) == list(serial._graph.nodes)
+    assert edges(parallel) == edges(serial)
+
+
+def test_resolver_pickle(make_repo):
+    tmp_path = make_repo(IMPORT_REPO)
+    cg = chunk(str(tmp_path))
+
+    resolver = cg._resolver()
+    restored = pickle.loads(pickle.dumps(resolver))
+
+    # the copy reparses the files it needs from their contents
+    assert restored.parsed_files == {}
+    for path in cg._chunk_index.paths():
+        assert restored.file_edge_rows(path) == resolver.file_edge_rows(path)
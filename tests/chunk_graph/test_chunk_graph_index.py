@@ -0,0 +1,102 @@
+from pathlib import Path
+
+from networkx import MultiDiGraph
+
+from rtfs.chunk_resolution.chunk_graph import ChunkGraph
+from rtfs.chunk_resolution.graph import (
+    ChunkEdgeKind,
+    ChunkMetadata,
+    ChunkNode,
+    ClusterEdge,
+    ClusterEdgeKind,
+    ClusterNode,
+    ImportEdge,
+)
+
+
+def chunk(id: str, content: str) -> ChunkNode:
+    metadata = ChunkMetadata(
+        file_path="a.py",
+        file_name="a.py",
+        file_type="text/x-python",
+        category="implementation",
+        tokens=0,
+        span_ids=[],
+        start_line=0,
+        end_line=1,
+    )
+    return ChunkNode(id=id, og_id=id, metadata=metadata, content=content)
+
+
+def make_graph(tmp_path: Path) -> ChunkGraph:
+    (tmp_path / "a.py").write_text("x = 1\n")
+    cg = ChunkGraph(tmp_path, MultiDiGraph())
+
+    cg.add_node(chunk("a.py#1", "x = 1"))
+    cg.add_node(chunk("a.py#2", "y = x"))
+    cg.add_edge(ImportEdge(src="a.py#2", dst="a.py#1", ref="x"))
+    for cluster in ["c1", "c2", "top"]:
+        cg.add_node(ClusterNode(id=cluster, title=cluster.upper()))
+
+    cg.add_edge(ClusterEdge(src="a.py#1", dst="c1", kind=ClusterEdgeKind.ChunkToCluster))
+    cg.add_edge(ClusterEdge(src="a.py#2", dst="c2", kind=ClusterEdgeKind.ChunkToCluster))
+    cg.add_edge(ClusterEdge(src="c1", dst="top", kind=ClusterEdgeKind.ClusterToCluster))
+    return cg
+
+
+def test_cluster_indexes(tmp_path: Path):
+    cg = make_graph(tmp_path)
+
+    assert cg._get_cluster_roots() == ["c2", "top"]
+    assert cg.find_cluster_node_by_title("C1").id == "c1"
+    assert cg.find_cluster_node_by_title("missing") is None
+    assert cg.get_chunks() == {"c1": ["x = 1"], "c2": ["y = x"], "top": []}
+    assert cg.get_chunk_imports()["c2"] == {"x": 1}
+    assert {c: [n.id for n in ns] for c, ns in cg.get_chunks_attached_to_clusters().items()} == {
+        "c1": ["a.py#1"],
+        "c2": ["a.py#2"],
+    }
+    assert [c["title"] for c in cg.clusters_to_json()] == ["C2", "TOP"]
+
+    # retitling a cluster through update_node moves it in the title map
+    cg.update_node(ClusterNode(id="c2", title="renamed"))
+    assert cg.find_cluster_node_by_title("C2") is None
+    assert cg.find_cluster_node_by_title("renamed").id == "c2"
+
+    # removing a parent turns its child clusters back into roots
+    cg.remove_node("top")
+    assert cg._get_cluster_roots() == ["c1", "c2"]
+    assert "top" not in cg.get_chunks()
+
+
+def test_indexes_from_existing_graph(tmp_path: Path):
+    cg = make_graph(tmp_path)
+    restored = ChunkGraph(tmp_path, cg._graph.copy())
+
+    assert restored._get_cluster_roots() == cg._get_cluster_roots()
+    assert restored.get_chunks() == cg.get_chunks()
+    assert restored.find_cluster_node_by_title("TOP").id == "top"
+
+
+def test_add_edge_rows(tmp_path: Path):
+    cg = make_graph(tmp_path)
+    cg.add_edge_rows(
+        [
+            ("a.py#2", "a.py#1", ChunkEdgeKind.CallTo, "x"),
+            ("a.py#2", "a.py#1", ChunkEdgeKind.ImportFrom, "x"),
+            ("a.py#2", "a.py#1", ChunkEdgeKind.ImportFrom, "x"),
+        ]
+    )
+
+    edges = [
+        (d["kind"], d["ref"], d.get("weight", 1))
+        for _, _, d in cg._graph.edges("a.py#2", data=True)
+        if d["kind"] in (ChunkEdgeKind.CallTo, ChunkEdgeKind.ImportFrom)
+    ]
+    assert edges == [
+        (ChunkEdgeKind.ImportFrom, "x", 1),
+        (ChunkEdgeKind.CallTo, "x", 1),
+        (ChunkEdgeKind.ImportFrom, "x", 2),
+    ]
+    # repeated refs count through the edge weights
+    assert cg.get_chunk_imports()["c2"] == {"x": 3}
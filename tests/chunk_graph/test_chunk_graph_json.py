@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from rtfs.chunker import chunk
+from rtfs.chunk_resolution.chunk_graph import ChunkGraph
+from rtfs.chunk_resolution.graph import (
+    ClusterEdge,
+    ClusterEdgeKind,
+    ClusterNode,
+    NodeKind,
+)
+
+
+def edge_rows(cg: ChunkGraph):
+    return [
+        cg._chunk_edge_rows(chunk_node)
+        for chunk_node in cg.iter_nodes(kind=NodeKind.Chunk, view=False)
+    ]
+
+
+def test_from_json_is_lazy(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("class A:\n    def f(self):\n        return 1\n")
+    (repo / "b.py").write_text("from a import A\n\n\ndef g():\n    return A().f()\n")
+
+    cg = chunk(str(repo))
+    cg.to_json(tmp_path / "cg.json", repo_graph_path=tmp_path / "rg.pkl")
+    json_data = json.loads((tmp_path / "cg.json").read_text())
+
+    # nothing is parsed or resolved until it is needed
+    loaded = ChunkGraph.from_json(repo, json_data)
+    assert "_repo_graph" not in loaded.__dict__
+    assert "_lm" not in loaded.__dict__
+    assert list(loaded._graph.edges) == list(cg._graph.edges)
+    assert edge_rows(loaded) == edge_rows(cg)
+
+    # the saved RepoGraph is used instead of rebuilding it
+    loaded = ChunkGraph.from_json(repo, json_data, repo_graph_path=tmp_path / "rg.pkl")
+    assert loaded._repo_graph.parsed_files == {}
+    assert edge_rows(loaded) == edge_rows(cg)
+
+
+def test_save_load(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("import os\n\n\ndef f():\n    return os.sep\n")
+    (repo / "b.py").write_text("from a import f\n\n\ndef g():\n    return f()\n")
+
+    cg = chunk(str(repo))
+    # one chunk whose content is not a verbatim slice of its file
+    node_id = next(iter(cg._chunk_ids))
+    cg._graph.nodes[node_id]["content"] = "# collapsed ...\n"
+    cg.add_node(ClusterNode(id="c1", title="title", key_variables=["f"]))
+    cg.add_edge(ClusterEdge(src=node_id, dst="c1", kind=ClusterEdgeKind.ChunkToCluster))
+
+    cg.save(tmp_path / "graph")
+    loaded = ChunkGraph.load(repo, tmp_path / "graph")
+
+    assert "_repo_graph" not in loaded.__dict__
+    assert list(loaded._graph.nodes) == list(cg._graph.nodes)
+    for n, data in cg._graph.nodes(data=True):
+        loaded_data = dict(loaded._graph.nodes[n])
+        if data["kind"] == NodeKind.Chunk:
+            # contents are only read when asked for
+            assert "content" not in loaded_data
+            assert loaded.get_node(n).get_content() == data["content"]
+            assert loaded.get_node(n, view=True).get_content() == data["content"]
+            loaded_data["content"] = loaded_data.pop("content_ref").read()
+        assert loaded_data == data
+    assert list(loaded._graph.edges(data=True)) == list(cg._graph.edges(data=True))
+    assert loaded._get_cluster_roots() == ["c1"]
+    assert edge_rows(loaded) == edge_rows(cg)
+
+    # a loaded graph saves and serializes the same as the original
+    loaded.save(tmp_path / "graph2")
+    for name in ("nodes.jsonl", "edges.jsonl", "content.bin", "meta.json"):
+        assert (tmp_path / "graph2" / name).read_bytes() == (
+            tmp_path / "graph" / name
+        ).read_bytes()
+    loaded.to_json(tmp_path / "loaded.json")
+    cg.to_json(tmp_path / "cg.json")
+    assert (tmp_path / "loaded.json").read_text() == (tmp_path / "cg.json").read_text()
+
+    # contents stored by reference are checked against their file when read
+    b_chunks = [
+        node
+        for node in loaded.iter_nodes(kind=NodeKind.Chunk)
+        if node.metadata.file_path.endswith("b.py") and node.id != node_id
+    ]
+    assert b_chunks
+    (repo / "b.py").write_text("def g():\n    return 2\n")
+    with pytest.raises(ValueError):
+        b_chunks[0].get_content()
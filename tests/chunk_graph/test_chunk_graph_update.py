@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from rtfs.chunker import chunk
+
+from tests.data import IMPORT_REPO
+
+
+def chunk_edges(cg):
+    # chunk ids depend on the build order, so compare by file and content
+    def key(node_id):
+        node = cg._graph.nodes[node_id]
+        return Path(node["metadata"].file_path).name, node["content"]
+
+    return {
+        (key(u), key(v), d["kind"], d["ref"], d["weight"])
+        for u, v, d in cg._graph.edges(data=True)
+    }
+
+
+def test_update(make_repo):
+    tmp_path = make_repo(IMPORT_REPO)
+    cg = chunk(str(tmp_path))
+
+    (tmp_path / "b.py").write_text(
+        "from a import A\n\n\ndef g():\n    return A()\n\n\ndef g2():\n    return 2\n"
+    )
+    (tmp_path / "c.py").unlink()
+    (tmp_path / "d.py").write_text("from b import g2\n\n\ndef k():\n    return g2()\n")
+    cg.update([tmp_path / "b.py", tmp_path / "d.py"], [tmp_path / "c.py"])
+
+    fresh = chunk(str(tmp_path))
+    assert sorted(
+        cg._graph.nodes[n]["content"] for n in cg._chunk_ids
+    ) == sorted(fresh._graph.nodes[n]["content"] for n in fresh._chunk_ids)
+    assert chunk_edges(fresh)
+    assert chunk_edges(cg) == chunk_edges(fresh)
+    assert not any(
+        Path(n.metadata.file_path).name == "c.py" for n in cg.get_all_nodes()
+    )
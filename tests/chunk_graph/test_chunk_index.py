@@ -0,0 +1,47 @@
+import random
+from pathlib import Path
+
+from rtfs.chunk_resolution.chunk_index import ChunkIndex
+from rtfs.chunk_resolution.graph import ChunkMetadata, ChunkNode
+
+from conftest import range as line_range
+
+
+def chunk(i: int, start_line: int, end_line: int) -> ChunkNode:
+    metadata = ChunkMetadata(
+        file_path="a.py",
+        file_name="a.py",
+        file_type="text/x-python",
+        category="implementation",
+        tokens=0,
+        span_ids=[],
+        start_line=start_line,
+        end_line=end_line,
+    )
+    return ChunkNode(id=f"a.py#{i}", og_id=str(i), metadata=metadata, content="")
+
+
+def linear_find_chunk(chunks, range):
+    for c in chunks:
+        if c.range.contains_line(range, overlap=True):
+            return c
+    return None
+
+
+def test_find_chunk_matches_linear_scan():
+    rand = random.Random(0)
+    chunks = []
+    for i in range(60):
+        start = rand.randint(1, 300)
+        chunks.append(chunk(i, start, start + rand.choice([0, 3, 10, 40])))
+
+    index = ChunkIndex({Path("a.py"): chunks})
+    queries = []
+    for _ in range(500):
+        start = rand.randint(0, 350)
+        queries.append(line_range(start, start + rand.choice([0, 1, 5, 60])))
+
+    expected = [linear_find_chunk(chunks, q) for q in queries]
+    assert [index.find_chunk(Path("a.py"), q) for q in queries] == expected
+    assert index.find_chunks(Path("a.py"), queries) == expected
+    assert index.find_chunks(Path("b.py"), queries[:2]) == [None, None]
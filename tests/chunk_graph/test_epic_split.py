@@ -0,0 +1,267 @@
+from itertools import product
+from pathlib import Path
+
+from llama_index.core import SimpleDirectoryReader
+
+from rtfs.chunker import _splitter, file_metadata_func
+from rtfs.moatless import codeblocks, epic_split
+from rtfs.moatless.codeblocks import CodeBlockType
+from rtfs.moatless.epic_split import EpicSplitter, TokenChunk
+from rtfs.moatless.parser.parser import NodeMatch
+from rtfs.moatless.parser.python import PythonParser
+from rtfs.tokens import TokenCountMode, token_counter
+
+
+FILES = {
+    "a.py": "# a comment\nclass A:\n    def f(self):\n        return 1\n",
+    "b.py": "from a import A\n\n\ndef g():\n    return A().f()\n",
+    "c.py": "def h(x):\n    # negate\n    return -x\n",
+}
+
+
+def load_docs(path: Path):
+    return SimpleDirectoryReader(
+        input_dir=str(path),
+        file_metadata=file_metadata_func,
+        filename_as_id=True,
+        recursive=True,
+    ).load_data()
+
+
+def chunks(nodes):
+    return [(n.id_, n.text, n.metadata) for n in nodes]
+
+
+def test_parallel_split(make_repo):
+    tmp_path = make_repo(FILES)
+    docs = load_docs(tmp_path)
+
+    serial = _splitter(str(tmp_path)).get_nodes_from_documents(docs)
+    parallel = _splitter(str(tmp_path), workers=2).get_nodes_from_documents(docs)
+
+    assert serial
+    assert chunks(parallel) == chunks(serial)
+
+
+def test_parallel_split_tokenizer(make_repo, words):
+    tmp_path = make_repo(FILES)
+    (tmp_path / "d.py").write_text(
+        "".join(f"def f{i}(x):\n    return x + {i}\n\n\n" for i in range(40))
+    )
+    docs = load_docs(tmp_path)
+
+    def split(**kwargs):
+        splitter = EpicSplitter(
+            repo_path=str(tmp_path), chunk_size=200, min_chunk_size=50, **kwargs
+        )
+        return chunks(splitter.get_nodes_from_documents(docs))
+
+    serial = split(tokenizer=words)
+    assert serial != split()
+    assert split(tokenizer=words, workers=2) == serial
+
+    # tokenizers that cannot be pickled are used in this process
+    assert split(tokenizer=lambda text: text.split(), workers=2) == serial
+
+
+def test_parser_reuse(make_repo):
+    tmp_path = make_repo(FILES)
+    srcs = [p.read_text() for p in sorted(tmp_path.glob("*.py"))]
+
+    parser = PythonParser()
+    reused = [parser.parse(src).to_tree(show_spans=True) for src in srcs]
+    assert reused == [PythonParser().parse(src).to_tree(show_spans=True) for src in srcs]
+
+
+def test_token_counts(make_repo):
+    tmp_path = make_repo(FILES)
+    blocks = PythonParser().parse_blocks((tmp_path / "a.py").read_text())
+
+    chunk = TokenChunk(blocks, [0, 1])
+    chunk.append(2)
+    merged = chunk + range(3, len(blocks))
+    assert chunk.tokens == sum(blocks.tokens[:3])
+    assert merged.tokens == blocks.sum_tokens(0) == sum(blocks.tokens)
+
+
+class EditingParser(PythonParser):
+    # edits content lines, like the assignment line break fix in pre_process
+    def pre_process(self, codeblock, node_match):
+        super().pre_process(codeblock, node_match)
+        if codeblock.type == CodeBlockType.ASSIGNMENT:
+            codeblock.content_lines[0] += " \\"
+
+
+def test_block_tree(make_repo):
+    tmp_path = make_repo(FILES)
+    (tmp_path / "d.py").write_text(
+        "x = \\\n    1\n\n\nclass B(A):\n    def __init__(self):\n"
+        "        # ... other code\n        self.y = 2\n\n\n"
+    )
+
+    for path, parser_cls in product(
+        sorted(tmp_path.glob("*.py")), [PythonParser, EditingParser]
+    ):
+        src = path.read_text()
+        module = parser_cls().parse(src)
+        codeblocks = [module] + module.get_all_child_blocks()
+
+        for lean in [True, False]:
+            blocks = parser_cls().parse_blocks(src, lean=lean)
+            assert len(blocks) == len(codeblocks)
+            for i, block in enumerate(codeblocks):
+                assert blocks.types[i] == block.type
+                assert blocks.full_path(i) == block.full_path()
+                assert blocks.content(i) == block.content
+                assert blocks.pre_code(i) == block.pre_code
+                assert blocks.content_lines(i) == block.content_lines
+                assert blocks.indentation(i) == block.indentation
+                assert blocks.sum_tokens(i) == block.sum_tokens()
+                assert blocks.span_ids[i] == (
+                    block.belongs_to_span.span_id if block.belongs_to_span else None
+                )
+                assert [codeblocks[c] for c in blocks.children(i)] == block.children
+                assert blocks.block_string(i) + "".join(
+                    child.to_string() for child in block.children
+                ) == block.to_string()
+
+
+def test_token_count_modes(make_repo):
+    tmp_path = make_repo(FILES)
+    src = "\n".join(p.read_text() for p in sorted(tmp_path.glob("*.py")))
+    texts = [src, *src.split("\n\n"), ""]
+
+    exact = token_counter(TokenCountMode.EXACT)
+    cached = token_counter(TokenCountMode.CACHED)
+    approximate = token_counter(TokenCountMode.APPROXIMATE)
+
+    assert [cached(t) for t in texts + texts] == [exact(t) for t in texts + texts]
+    assert approximate("") == 0
+    assert abs(approximate(src) - exact(src)) <= 0.1 * exact(src)
+
+
+def test_approximate_split(make_repo):
+    tmp_path = make_repo(FILES)
+    docs = load_docs(tmp_path)
+
+    exact_nodes = EpicSplitter(repo_path=str(tmp_path)).get_nodes_from_documents(docs)
+    approx_nodes = EpicSplitter(
+        repo_path=str(tmp_path), token_count_mode=TokenCountMode.APPROXIMATE
+    ).get_nodes_from_documents(docs)
+
+    # the files are well under the chunk sizes, so only the counts differ
+    assert [n.text for n in approx_nodes] == [n.text for n in exact_nodes]
+    for a, e in zip(approx_nodes, exact_nodes):
+        assert abs(a.metadata["tokens"] - e.metadata["tokens"]) <= max(
+            2, 0.15 * e.metadata["tokens"]
+        )
+
+
+class ReferenceParser(PythonParser):
+    """
+    Matches nodes as the parser did before queries were dispatched by node
+    type: every query is tried on every node and captures before the root are
+    skipped instead of ending the match
+    """
+
+    def _match_any(self, node, queries, capture_from_parent=False):
+        for label, node_type, query in queries:
+            if node_type and node.type != node_type and node_type != "_":
+                continue
+            match = self._find_match(node, query, label, capture_from_parent)
+            if match:
+                if not match.query:
+                    match.query = label
+                return match
+        return None
+
+    def find_match_with_gpt_tweaks(self, node):
+        return self._match_any(node, self.gpt_queries, capture_from_parent=True)
+
+    def find_match(self, node):
+        return self._match_any(node, self.queries)
+
+    def _find_match(self, node, query, label, capture_from_parent=False):
+        captures = query.captures(node.parent if capture_from_parent else node)
+        node_match = NodeMatch()
+        root_node = None
+
+        for found_node, tag in captures:
+            if tag == "root" and not root_node and node == found_node:
+                root_node = found_node
+            if not root_node:
+                continue
+
+            if tag == "no_children" and found_node.children:
+                return None
+
+            if tag == "check_child":
+                node_match = self.find_match(found_node)
+                if node_match:
+                    node_match.check_child = found_node
+                return node_match
+
+            if tag == "parse_child":
+                child_match = self.find_match(found_node)
+                if child_match:
+                    if child_match.relationships:
+                        node_match.relationships = child_match.relationships
+                    if child_match.parameters:
+                        node_match.parameters.extend(child_match.parameters)
+                    if child_match.first_child:
+                        node_match.first_child = child_match.first_child
+
+            if tag == "identifier" and not node_match.identifier_node:
+                node_match.identifier_node = found_node
+            if tag == "child.first" and not node_match.first_child:
+                node_match.first_child = found_node
+            if tag == "child.last" and not node_match.last_child:
+                node_match.last_child = found_node
+            if tag == "parameter.identifier":
+                node_match.parameters.append((found_node, None))
+            if tag == "parameter.type" and node_match.parameters:
+                node_match.parameters[-1] = (node_match.parameters[-1][0], found_node)
+            if tag.startswith("reference"):
+                node_match.relationships.append((found_node, tag))
+            if not node_match.block_type:
+                node_match.block_type = CodeBlockType.from_string(tag)
+
+        return node_match if node_match.block_type else None
+
+
+def test_query_dispatch(make_repo):
+    tmp_path = make_repo(FILES)
+    (tmp_path / "d.py").write_text(
+        "import os\nfrom a import A as B\n\n\n"
+        "@decorator(1)\nclass C(B):\n    \"\"\"Docs\"\"\"\n\n"
+        "    class Meta:\n        x: int = 1\n\n"
+        "    @property\n    def p(self) -> int:\n        return super().f()\n\n"
+        "    @staticmethod\n    def s(a: str, *args, **kwargs):\n"
+        "        for i in range(3):\n            if i:\n                yield i\n"
+        "            else:\n                pass  # ... rest of the code\n\n\n"
+        "def outer():\n    class Inner:\n        def g(self):\n"
+        "            self.y = [x for x in os.listdir()]\n"
+        "            return lambda: self.y\n\n    try:\n        return Inner()\n"
+        "    except Exception as e:\n        raise ValueError() from e\n"
+        "    finally:\n        pass\n"
+    )
+    repo_files = [Path(epic_split.__file__), Path(codeblocks.__file__)]
+
+    for path in [*sorted(tmp_path.glob("*.py")), *repo_files]:
+        src = path.read_text()
+        for gpt in [False, True]:
+            assert PythonParser(apply_gpt_tweaks=gpt).parse(src).to_tree(
+                show_spans=True, include_references=True
+            ) == ReferenceParser(apply_gpt_tweaks=gpt).parse(src).to_tree(
+                show_spans=True, include_references=True
+            )
+
+    # debug logging only changes what is logged
+    for path in sorted(tmp_path.glob("*.py")):
+        src = path.read_text()
+        debug_parser = PythonParser(apply_gpt_tweaks=True, debug=True)
+        assert debug_parser.parse(src).to_tree(
+            show_spans=True, include_references=True
+        ) == PythonParser(apply_gpt_tweaks=True).parse(src).to_tree(
+            show_spans=True, include_references=True
+        )
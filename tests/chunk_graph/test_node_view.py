@@ -0,0 +1,52 @@
+import pytest
+
+from rtfs.chunk_resolution.graph import ChunkMetadata, ChunkNode, ClusterNode, NodeKind
+from rtfs.graph import CodeGraph, NodeView
+
+
+def make_graph() -> CodeGraph:
+    g = CodeGraph(node_types=[ChunkNode, ClusterNode])
+    metadata = ChunkMetadata(
+        file_path="a.py",
+        file_name="a.py",
+        file_type="text/x-python",
+        category="implementation",
+        tokens=0,
+        span_ids=[],
+        start_line=3,
+        end_line=7,
+    )
+    g.add_node(ChunkNode(id="a.py#1", og_id="1", metadata=metadata, content="x = 1"))
+    g.add_node(ClusterNode(id="c1", title="cluster", summary="summary"))
+    return g
+
+
+def test_node_view():
+    g = make_graph()
+
+    view = g.get_node("a.py#1", view=True)
+    node = g.get_node("a.py#1")
+    assert isinstance(view, NodeView)
+    assert view.id == node.id and view.content == node.content
+    # properties and methods are bound to the view
+    assert view.range == node.range
+    assert view.get_content() == "x = 1"
+    assert str(view) == str(node)
+    assert view.node() == node
+
+    # views read the graph's attributes without copying them
+    assert view.metadata is g._graph.nodes["a.py#1"]["metadata"]
+    with pytest.raises(AttributeError):
+        view.content = "y = 2"
+    with pytest.raises(AttributeError):
+        view.missing
+
+
+def test_iter_nodes():
+    g = make_graph()
+
+    assert [n.id for n in g.iter_nodes()] == ["a.py#1", "c1"]
+    assert [n.title for n in g.iter_nodes(kind=NodeKind.Cluster)] == ["cluster"]
+    assert [type(n) for n in g.iter_nodes(kind=NodeKind.Chunk, view=False)] == [
+        ChunkNode
+    ]
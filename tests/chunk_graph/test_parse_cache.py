@@ -0,0 +1,89 @@
+from pathlib import Path
+
+import tiktoken
+from llama_index.core.schema import Document
+
+from rtfs.cache import ParseCache
+from rtfs.chunker import chunk
+from rtfs.moatless.epic_split import EpicSplitter
+from rtfs.tokens import tokenizer_id
+
+
+def graph_data(cg):
+    return list(cg._graph.nodes(data=True)), list(cg._graph.edges(data=True))
+
+
+def test_parse_cache_keys(tmp_path: Path):
+    cache = ParseCache(tmp_path)
+    key = cache.key("scopes", b"x = 1\n")
+
+    assert cache.get(key) is None
+    cache.put(key, [1, 2])
+    assert cache.get(key) == [1, 2]
+    assert key in cache
+
+    # the key covers the namespace, the content and any extra inputs
+    assert cache.key("refs", b"x = 1\n") != key
+    assert cache.key("scopes", b"x = 2\n") != key
+    assert cache.key("scopes", b"x = 1\n", "settings") != key
+
+    # so do the query files
+    query = tmp_path / "q.scm"
+    query.write_text("(identifier) @ref")
+    other = ParseCache(tmp_path, query_files=[query])
+    assert other.key("scopes", b"x = 1\n") != key
+
+    # corrupt entries are misses
+    cache._path(key).write_bytes(b"not a pickle")
+    assert cache.get(key) is None
+
+
+def test_chunk_with_cache(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("class A:\n    def f(self):\n        return 1\n")
+    (repo / "b.py").write_text("from a import A\n\n\ndef g():\n    return A().f()\n")
+    cache_dir = tmp_path / "cache"
+
+    expected = graph_data(chunk(str(repo)))
+    assert graph_data(chunk(str(repo), cache_dir=str(cache_dir))) == expected
+    entries = sorted(cache_dir.rglob("*.pkl"))
+    assert entries
+
+    # a warm run loads everything from the cache and writes nothing new
+    assert graph_data(chunk(str(repo), cache_dir=str(cache_dir))) == expected
+    assert sorted(cache_dir.rglob("*.pkl")) == entries
+
+    # changed files miss the cache
+    (repo / "b.py").write_text("from a import A\n\n\ndef h():\n    return A()\n")
+    assert graph_data(chunk(str(repo), cache_dir=str(cache_dir))) == graph_data(
+        chunk(str(repo))
+    )
+
+
+def test_split_cache_tokenizer(tmp_path: Path, words):
+    src = "".join(f"def f{i}(x):\n    return x + {i}\n\n\n" for i in range(40))
+    docs = [Document(text=src, metadata={"file_path": "a.py"})]
+    cache = ParseCache(tmp_path)
+
+    def split(**kwargs):
+        splitter = EpicSplitter(chunk_size=200, min_chunk_size=50, **kwargs)
+        nodes = splitter._parse_nodes(docs, cache=cache)
+        return [(n.text, n.metadata) for n in nodes]
+
+    default = split()
+    assert split(tokenizer=words) != default
+    assert split(tokenizer=words) == [
+        (n.text, n.metadata)
+        for n in EpicSplitter(
+            chunk_size=200, min_chunk_size=50, tokenizer=words
+        )._parse_nodes(docs)
+    ]
+    assert split() == default
+
+    assert tokenizer_id() == "tiktoken:cl100k_base"
+    encoding = tiktoken.get_encoding("cl100k_base")
+    assert tokenizer_id(encoding.encode) == "tiktoken:cl100k_base"
+    assert tokenizer_id(words) == f"{words.__module__}:split_words"
+    # other bound methods are not told apart, so they are not cached
+    assert tokenizer_id(src.split) is None
@@ -1,6 +1,6 @@
 from pathlib import Path
 import os
-from typing import Dict
+from typing import Callable, Dict
 import mimetypes
 import fnmatch
 
@@ -85,3 +85,33 @@ def chunk_graph(request, chunk_nodes):
 def repo_graph(request):
     repo_path = request.param
     return RepoGraph(Path(repo_path))
+
+
+def split_words(text: str):
+    return text.split()
+
+
+@pytest.fixture
+def words():
+    """
+    A tokenizer other than the default one, which can be pickled and is told
+    apart by tokenizer_id
+    """
+    return split_words
+
+
+@pytest.fixture
+def make_repo(tmp_path: Path) -> Callable[[Dict[str, str]], Path]:
+    """
+    Returns a function that writes files, given as {relative path: source},
+    into tmp_path and returns tmp_path as the repo root
+    """
+
+    def make(files: Dict[str, str]) -> Path:
+        for name, src in files.items():
+            path = tmp_path / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(src)
+        return tmp_path
+
+    return make
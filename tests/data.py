@@ -118,3 +118,11 @@ ClusterNode: 1:6
   ChunkNode: strats/prompt.py#207.31
   ChunkNode: augment_test/types.py#212.29
 """
+
+
+# a small repo with an import chain c -> b -> a
+IMPORT_REPO = {
+    "a.py": "class A:\n    def f(self):\n        return 1\n",
+    "b.py": "from a import A\n\n\ndef g():\n    return A().f()\n",
+    "c.py": "from a import A\nfrom b import g\n\n\ndef h():\n    return g(), A()\n",
+}
@@ -0,0 +1,43 @@
+from dataclasses import FrozenInstanceError
+from pathlib import Path
+
+import pytest
+
+from rtfs.repo_resolution.repo_graph import RepoGraph, repo_node_id
+
+
+def test_resolve_import_edges(tmp_path: Path):
+    (tmp_path / "a.py").write_text("def f():\n    return 1\n")
+    (tmp_path / "b.py").write_text(
+        "import os\nfrom a import f\n\ndef g():\n    return f()\n"
+    )
+
+    repo_graph = RepoGraph(tmp_path)
+    a, b = (tmp_path / "a.py").resolve(), (tmp_path / "b.py").resolve()
+
+    imports, edges = repo_graph._resolver().resolve(b)
+    assert [str(imp.namespace) for imp in imports] == ["os.", "a.f"]
+    assert [(e[0], e[2], e[4], e[5]) for e in edges] == [(b, a, "f", "a.f")]
+
+    ref_scope, def_scope = edges[0][1], edges[0][3]
+    assert repo_graph.import_to_export_scope(
+        repo_node_id(b, ref_scope), "f"
+    ).file_path == a
+    assert repo_graph._graph.has_edge(repo_node_id(b, ref_scope), repo_node_id(a, def_scope))
+
+
+def test_export_lookup_is_cached(tmp_path: Path):
+    (tmp_path / "a.py").write_text("def f():\n    return 1\n")
+    (tmp_path / "b.py").write_text("from a import f\n\ndef g():\n    return f()\n")
+
+    repo_graph = RepoGraph(tmp_path)
+    b = (tmp_path / "b.py").resolve()
+    _, edges = repo_graph._resolver().resolve(b)
+    ref_node_id = repo_node_id(b, edges[0][1])
+
+    export = repo_graph.import_to_export_scope(ref_node_id, "f")
+    assert export is repo_graph.import_to_export_scope(ref_node_id, "f")
+    with pytest.raises(FrozenInstanceError):
+        export.scope = 0
+    assert repo_graph.import_to_export_scope(ref_node_id, "missing") == []
+    assert repo_graph.import_to_export_scope("missing::0", "f") == []
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from rtfs.fs import RepoFs
+
+
+def linear_match_file(fs: RepoFs, ns_path: Path):
+    """
+    Reference implementation: the linear scan match_file used to do
+    """
+    for path in fs._all_paths:
+        if path.name.startswith("test_"):
+            continue
+
+        path_name = path.name.replace(".py", "")
+        match_path = list(path.parts[-len(ns_path.parts) : -1]) + [path_name]
+        if match_path == list(ns_path.parts):
+            if path.suffix == ".py":
+                return path.resolve()
+            elif path.is_dir() and (path / "__init__.py").exists():
+                return (path / "__init__.py").resolve()
+
+    return None
+
+
+def test_match_file(tmp_path: Path):
+    for file in [
+        "pkg/__init__.py",
+        "pkg/mod.py",
+        "pkg/sub/__init__.py",
+        "pkg/sub/mod.py",
+        "pkg/test_mod.py",
+        "nopkg/util.py",
+        "other/pkg/mod.py",
+        "mod.py",
+    ]:
+        (tmp_path / file).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / file).write_text("")
+
+    fs = RepoFs(tmp_path)
+    namespaces = [
+        "mod",
+        "pkg",
+        "pkg/mod",
+        "pkg/sub",
+        "sub/mod",
+        "pkg/sub/mod",
+        "nopkg",
+        "nopkg/util",
+        "test_mod",
+        "other/pkg/mod",
+        "missing/mod",
+        tmp_path.name + "/mod",
+    ]
+    for ns in namespaces:
+        assert fs.match_file(Path(ns)) == linear_match_file(fs, Path(ns)), ns
+
+    assert fs.match_file(Path("pkg/sub")) == (tmp_path / "pkg/sub/__init__.py").resolve()
+    assert fs.match_file(Path("nopkg")) is None
+    assert fs.match_file(Path("test_mod")) is None
@@ -0,0 +1,28 @@
+from pathlib import Path
+
+from rtfs.repo_resolution.repo_graph import RepoGraph
+
+
+def test_save_load(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("def f():\n    return 1\n")
+    (repo / "b.py").write_text("from a import f\n\ndef g():\n    return f()\n")
+
+    rg = RepoGraph(repo)
+    rg.save(tmp_path / "rg.pkl")
+    loaded = RepoGraph.load(tmp_path / "rg.pkl")
+
+    assert list(loaded._graph.edges(data=True)) == list(rg._graph.edges(data=True))
+    assert list(loaded.scopes_map) == list(rg.scopes_map)
+    for path, sg in rg.scopes_map.items():
+        assert loaded.scopes_map[path].to_str() == sg.to_str()
+    assert loaded._export_lookup == rg._export_lookup
+
+    # trees are dropped on save and reparsed from the saved contents
+    assert loaded.parsed_files == {}
+    path = next(iter(rg.parsed_files))
+    assert loaded.parsed_file(path).src == rg.parsed_files[path].src
+    assert str(loaded.parsed_file(path).tree.root_node) == str(
+        rg.parsed_files[path].tree.root_node
+    )
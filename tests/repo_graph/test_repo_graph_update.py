@@ -0,0 +1,54 @@
+from pathlib import Path
+
+from rtfs.repo_resolution.repo_graph import RepoGraph
+
+
+FILES = {
+    "pkg/__init__.py": "from pkg.core import Core\n",
+    "pkg/core.py": "class Core:\n    pass\n",
+    "a.py": "def f():\n    return 1\n",
+    "b.py": "from a import f\n\ndef g():\n    return f()\n",
+    "c.py": "from pkg import Core\n\ndef h():\n    return Core()\n",
+}
+
+
+def edges(rg: RepoGraph):
+    return {(u, v, d["ref"], d["defn"]) for u, v, d in rg._graph.edges(data=True)}
+
+
+def assert_same(rg: RepoGraph, fresh: RepoGraph):
+    assert edges(rg) == edges(fresh)
+    assert set(rg._graph.nodes) == set(fresh._graph.nodes)
+    assert set(rg.scopes_map) == set(fresh.scopes_map)
+    assert rg._export_lookup == fresh._export_lookup
+
+
+def test_update(make_repo):
+    repo = make_repo(FILES).resolve()
+    rg = RepoGraph(repo)
+    assert edges(rg)
+
+    # rename the definition b imports and add a file importing the new name
+    (repo / "a.py").write_text("def f2():\n    return 1\n")
+    (repo / "d.py").write_text("from a import f2\n\ndef k():\n    return f2()\n")
+    resolved = rg.update([repo / "a.py", Path("d.py")])
+
+    assert resolved == {repo / "a.py", repo / "b.py", repo / "d.py"}
+    assert_same(rg, RepoGraph(repo))
+
+    # files imported through __init__.py are tracked through it
+    (repo / "pkg" / "core.py").unlink()
+    resolved = rg.update([], [repo / "pkg" / "core.py"])
+
+    assert repo / "c.py" in resolved
+    assert_same(rg, RepoGraph(repo))
+
+
+def test_update_skips_other_files(make_repo):
+    repo = make_repo(FILES).resolve()
+    rg = RepoGraph(repo)
+
+    (repo / "test_a.py").write_text("from a import f\n")
+    (repo / "notes.txt").write_text("a")
+    assert rg.update([repo / "test_a.py", repo / "notes.txt"]) == set()
+    assert_same(rg, RepoGraph(repo))
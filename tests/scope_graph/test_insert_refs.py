@@ -3,6 +3,7 @@ from rtfs.languages import PythonParse
 from rtfs.scope_resolution.definition import LocalDef
 from rtfs.scope_resolution.scope import LocalScope
 from rtfs.scope_resolution.scope_graph import ScopeGraph
+from rtfs.scope_resolution.graph_types import NodeKind
 from rtfs.utils import TextRange
 
 
@@ -59,3 +60,66 @@ def debug_log(self, message: str):
     g = build_scope_graph(bytearray(test, encoding="utf-8"), language="python")
 
     print([g.get_node(r).name for r in g.references_by_origin(1)])
+
+
+def test_refs_by_name():
+    test = """
+import abc
+from os import path
+
+def func1():
+    abc()
+    return path.join(abc)
+
+class A:
+    def method(self):
+        return path
+"""
+
+    g = build_scope_graph(bytearray(test, encoding="utf-8"), language="python")
+
+    expected = {}
+    for scope in g.scopes():
+        for ref in g.references_by_origin(scope):
+            expected.setdefault(g.get_node(ref).name, set()).add(scope)
+
+    assert g.refs_by_name == expected
+
+
+def test_call_refs():
+    test = """
+import abc
+
+def func1():
+    return abc(
+        1,
+    )
+
+def func2():
+    x = func1()
+    return abc
+"""
+
+    g = build_scope_graph(bytearray(test, encoding="utf-8"), language="python")
+
+    refs = [
+        (idx, attrs)
+        for idx, attrs in g._graph.nodes(data=True)
+        if attrs["type"] == NodeKind.REFERENCE
+    ]
+    for idx, attrs in g._graph.nodes(data=True):
+        if attrs["type"] == NodeKind.CALL:
+            # each call points at the first ref of its name within its lines
+            expected = next(
+                ref_idx
+                for ref_idx, ref in refs
+                if ref["name"] == attrs["name"]
+                and attrs["range"].contains_line(ref["range"])
+            )
+            assert list(g._graph.successors(idx)) == [expected]
+
+    for _, attrs in refs:
+        assert g.is_call_ref(attrs["range"])
+    assert not g.is_call_ref(
+        TextRange(start_byte=0, end_byte=0, start_point=(2, 0), end_point=(3, 0))
+    )
@@ -0,0 +1,48 @@
+from rtfs.scope_resolution.interval_tree import IntervalGraph
+
+from conftest import range
+
+
+def test_smallest_enclosing_scope():
+    ig = IntervalGraph(range(0, 20), 0)
+    ig.add_scope(range(1, 10), 1)
+    ig.add_scope(range(2, 5), 2)
+    ig.add_scope(range(3, 3), 3)
+    ig.add_scope(range(6, 9), 4)
+    ig.add_scope(range(12, 15), 5)
+
+    assert ig.contains(range(3, 3)) == 3
+    assert ig.contains(range(3, 4)) == 2
+    assert ig.contains(range(5, 6)) == 1
+    assert ig.contains(range(7, 7)) == 4
+    assert ig.contains(range(11, 11)) == 0
+    assert ig.contains(range(13, 14)) == 5
+    # single line queries are not contained by a scope ending on that line
+    assert ig.contains(range(15, 15)) == 0
+    assert ig.contains(range(19, 21)) is None
+
+
+def test_identical_ranges_resolve_to_innermost():
+    ig = IntervalGraph(range(0, 20), 0)
+    ig.add_scope(range(4, 4), 1)
+    ig.add_scope(range(4, 4), 2)
+
+    assert ig.contains(range(4, 4)) == 2
+
+
+def test_out_of_order_and_overlapping_scopes():
+    ig = IntervalGraph(range(0, 20), 0)
+    ig.add_scope(range(10, 15), 1)
+    ig.add_scope(range(2, 8), 2)
+    ig.add_scope(range(3, 4), 3)
+
+    assert ig.contains(range(3, 3)) == 3
+    assert ig.contains(range(5, 6)) == 2
+    assert ig.contains(range(11, 12)) == 1
+
+    # partially overlapping scopes fall back to a scan for the smallest
+    ig.add_scope(range(7, 12), 4)
+    assert ig.contains(range(6, 8)) == 2
+    assert ig.contains(range(7, 8)) == 4
+    assert ig.contains(range(10, 12)) == 4
+    assert ig.contains(range(9, 9)) == 4
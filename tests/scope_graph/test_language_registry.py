@@ -0,0 +1,33 @@
+import threading
+
+from rtfs.config import PYTHON_SCM
+from rtfs.languages import PythonParse
+from rtfs.scope_resolution.capture_refs import capture_refs
+
+
+def test_query_compiled_once():
+    assert PythonParse.query(PYTHON_SCM) is PythonParse.query(PYTHON_SCM)
+
+
+def test_parser_per_thread():
+    parsers = []
+    t = threading.Thread(target=lambda: parsers.append(PythonParse.parser()))
+    t.start()
+    t.join()
+
+    assert PythonParse.parser() is PythonParse.parser()
+    assert parsers[0] is not PythonParse.parser()
+
+
+def test_parse_and_capture_refs():
+    code = b"""
+import os
+
+def func():
+    assert os.path
+"""
+    tree = PythonParse.parse(code)
+    assert tree.root_node.type == "module"
+
+    refs = capture_refs(code)
+    assert [r.name for r in refs] == ["os"]
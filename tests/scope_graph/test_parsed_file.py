@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from rtfs.ingest import ParsedFile
+from rtfs.scope_resolution.capture_refs import capture_refs
+
+
+CODE = b"""import os
+
+def func1():
+    return os.path
+
+def func2():
+    return os.sep
+"""
+
+
+def test_line_index():
+    pf = ParsedFile.from_bytes(Path("a.py"), CODE)
+
+    assert pf.line_to_byte(0) == 0
+    assert CODE[pf.line_to_byte(2) :].startswith(b"def func1")
+    assert pf.byte_to_line(pf.line_to_byte(5)) == 5
+    assert pf.line_range_to_bytes(6, 6) == (pf.line_to_byte(6), len(CODE))
+
+
+def test_capture_refs_in_byte_range():
+    pf = ParsedFile.from_bytes(Path("a.py"), CODE)
+
+    refs = capture_refs(
+        pf.src, tree=pf.tree, byte_range=pf.line_range_to_bytes(5, 6)
+    )
+
+    assert [(r.name, r.range.start_point.row) for r in refs] == [("os", 6)]
+    assert len(capture_refs(pf.src, tree=pf.tree)) == 2
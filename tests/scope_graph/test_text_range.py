@@ -0,0 +1,23 @@
+import pickle
+
+from tree_sitter import Point
+
+from rtfs.utils import TextRange
+
+
+def test_text_range():
+    r = TextRange(start_byte=1, end_byte=5, start_point=(0, 1), end_point=(2, 3))
+
+    assert isinstance(r.start_point, Point) and r.start_point.row == 0
+    assert r.line_range() == (0, 2)
+    assert r.dict() == {
+        "start_byte": 1,
+        "end_byte": 5,
+        "start_point": (0, 1),
+        "end_point": (2, 3),
+    }
+    assert pickle.loads(pickle.dumps(r)) == r
+    assert r.add_offset(1, 2).line_range() == (1, 4)
+    assert r.contains_line(r.add_offset(1, 0))
+    assert not r.contains_line(r.add_offset(1, 1))
+    assert r.contains_line(r.add_offset(1, 1), overlap=True)
@@ -0,0 +1,55 @@
+import pickle
+from pathlib import Path
+
+from rtfs.build_scopes import build_scope_graph
+from rtfs.repo_resolution.repo_graph import RepoGraph
+
+
+CODE = b"""import os
+from typing import List as L
+
+class A:
+    def method(self, x):
+        y = x + 1
+        return os.path.join(y)
+
+def func(a: L):
+    for i in a:
+        A().method(i)
+    return a
+"""
+
+
+def test_transport_roundtrip():
+    sg = build_scope_graph(CODE)
+    restored = pickle.loads(pickle.dumps(sg))
+
+    assert restored.to_str() == sg.to_str()
+    assert list(restored._graph.nodes(data=True)) == list(sg._graph.nodes(data=True))
+    assert list(restored._graph.edges(data=True)) == list(sg._graph.edges(data=True))
+    assert restored.scope2range == sg.scope2range
+    assert restored.defn_dict == sg.defn_dict
+    assert restored.imp_dict == sg.imp_dict
+    assert restored.refs_by_name == sg.refs_by_name
+    assert restored.scopes() == sg.scopes()
+    for scope in sg.scopes():
+        range = sg.get_node(scope).range
+        assert restored.scope_by_range(range) == sg.scope_by_range(range)
+        assert restored.parent_scope(scope) == sg.parent_scope(scope)
+        assert restored.child_scopes(scope) == sg.child_scopes(scope)
+        assert restored.imports(scope) == sg.imports(scope)
+        assert restored.definitions(scope) == sg.definitions(scope)
+        assert restored.references_by_origin(scope) == sg.references_by_origin(scope)
+
+
+def test_repo_graph_workers(tmp_path: Path):
+    (tmp_path / "a.py").write_text("def f():\n    return 1\n")
+    (tmp_path / "b.py").write_text("from a import f\n\ndef g():\n    return f()\n")
+
+    serial = RepoGraph(tmp_path)
+    parallel = RepoGraph(tmp_path, workers=2)
+
+    assert list(parallel.scopes_map) == list(serial.scopes_map)
+    for path, sg in serial.scopes_map.items():
+        assert parallel.scopes_map[path].to_str() == sg.to_str()
+    assert list(parallel._graph.edges) == list(serial._graph.edges)